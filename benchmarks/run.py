@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Microbenchmarks for the pure hot-path helpers, with a JSON regression gate.
+
+Usage::
+
+    python benchmarks/run.py                  # compare against benchmarks/baseline.json
+    python benchmarks/run.py --save           # record a new baseline
+    python benchmarks/run.py -k players       # only benchmarks whose name contains "players"
+
+Each benchmark reports the best per-call time over ``--repeat`` ``timeit``
+repeats of at least ``--min-time`` seconds each (the best is the least noisy
+estimate). A run exits with status 1 when any benchmark is more than
+``--threshold`` slower than its baseline. Baselines record the interpreter
+and settings they were measured with, and are only comparable on the machine
+and Python build that recorded them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import inspect
+import json
+import platform
+import random
+import string
+import sys
+import timeit
+from collections.abc import Callable, Generator, Iterator
+from dataclasses import replace
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import commands  # noqa: E402
+import context_store  # noqa: E402
+import slp  # noqa: E402
+import utils  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+DEFAULT_THRESHOLD = 0.5  # fail when more than 50% slower; shared CI runners are noisy
+REPEAT = 15
+MIN_TIME = 0.2  # minimum seconds per timing loop
+
+Benchmark = Callable[[], Callable[[], object] | Generator[Callable[[], object], None, None]]
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str) -> Callable[[Benchmark], Benchmark]:
+    """Register a setup function that returns the zero-argument callable to time.
+
+    A setup that changes module state is a generator instead: it yields the
+    callable and restores the state in a ``finally`` once timing is done.
+    """
+
+    def register(setup: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+_rng = random.Random(1234)
+
+
+def _player_names(count: int) -> tuple[str, ...]:
+    alphabet = string.ascii_letters + string.digits + "_"
+    return tuple("".join(_rng.choices(alphabet, k=_rng.randint(3, 16))) for _ in range(count))
+
+
+def _addresses(count: int) -> list[str]:
+    shapes = ("play{}.example.net", "mc{}.example.com:25566", "192.168.{}.10", "srv-{}.hosting.io:19132")
+    return [shapes[i % len(shapes)].format(i) for i in range(count)]
+
+
+def _snapshot(address: str = "play.example.net", players: int = 12) -> commands.ServerSnapshot:
+    names = _player_names(players)
+    return commands.ServerSnapshot(
+        address=address,
+        fetched_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        description="A Minecraft Server_with *markdown* [chars]",
+        version_name="Paper 1.20.4",
+        latency_ms=42,
+        players_online=len(names),
+        players_max=100,
+        player_names=names,
+        query_available=True,
+        query_error=None,
+    )
+
+
+def _status_json(players: int) -> dict:
+    sample = [{"name": name, "id": "00000000-0000-0000-0000-000000000000"} for name in _player_names(players)]
+    return {
+        "version": {"name": "Paper 1.20.4", "protocol": 765},
+        "players": {"online": players, "max": 100, "sample": sample},
+        "description": {"text": "§aWelcome", "extra": [{"text": " to the "}, {"text": "server", "bold": True}]},
+    }
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+
+@benchmark("utils.is_valid_server_address")
+def _bench_is_valid() -> Callable[[], object]:
+    addresses = _addresses(1000) + ["", "bad host!", "x" * 300, "a..b"]
+
+    def run() -> None:
+        for address in addresses:
+            utils.is_valid_server_address(address)
+
+    return run
+
+
+@benchmark("utils.parse_address")
+def _bench_parse_address() -> Callable[[], object]:
+    addresses = _addresses(1000) + ["host:notaport", "[::1]:25565"]
+
+    def run() -> None:
+        for address in addresses:
+            utils.parse_address(address)
+
+    return run
+
+
+@benchmark("_clean_description")
+def _bench_clean_description() -> Callable[[], object]:
+    descriptions = [
+        None,
+        {"text": "§aWelcome §lto §rthe server"},
+        "§6§lSkyblock §7| §fNew season! " * 4,
+        "Plain description without codes",
+    ] * 250
+
+    def run() -> None:
+        for description in descriptions:
+            commands._clean_description(description)
+
+    return run
+
+
+@benchmark("slp._parse[10000]")
+def _bench_slp_parse() -> Callable[[], object]:
+    data = _status_json(10_000)
+    return lambda: slp._parse(data, 12.5)
+
+
+def _format_bench(count: int) -> Benchmark:
+    def setup() -> Callable[[], object]:
+        names = _player_names(count)
+        return lambda: commands._format_player_names(names)
+
+    return setup
+
+
+for _count in (10, 1000, 10_000):
+    benchmark(f"_format_player_names[{_count}]")(_format_bench(_count))
+
+
+@benchmark("_status_message[cached]")
+def _bench_status_cached() -> Callable[[], object]:
+    snapshot = _snapshot()
+    return lambda: commands._status_message(snapshot)
+
+
+@benchmark("_status_message[render]")
+def _bench_status_render() -> Callable[[], object]:
+    snapshot = _snapshot()
+    return lambda: commands._render_status_message(snapshot)
+
+
+@benchmark("_players_message[cached]")
+def _bench_players_cached() -> Callable[[], object]:
+    snapshot = _snapshot(players=10_000)
+    return lambda: commands._players_message(snapshot)
+
+
+@benchmark("_players_message[render,10000]")
+def _bench_players_render() -> Callable[[], object]:
+    snapshot = _snapshot(players=10_000)
+    return lambda: commands._render_players_message(snapshot)
+
+
+@benchmark("_store_message_snapshot[5000 chats]")
+def _bench_store_snapshot() -> Generator[Callable[[], object], None, None]:
+    # A full store at production scale: 5000 chats at the per-chat limit,
+    # sharing 500 distinct snapshots, with the default byte budget.
+    original = commands._message_contexts
+    commands._message_contexts = context_store.MessageContextStore(
+        per_chat_limit=commands.MESSAGE_CONTEXT_LIMIT,
+        max_bytes=commands.MESSAGE_CONTEXT_MAX_BYTES,
+        idle_ttl=commands.MESSAGE_CONTEXT_IDLE_TTL,
+        intern_key=commands._snapshot_intern_key,
+        intern=commands._intern_snapshot,
+        size_of=commands._snapshot_size,
+    )
+    try:
+        base = [_snapshot(address) for address in _addresses(500)]
+        for chat_id in range(5000):
+            for message_id in range(commands.MESSAGE_CONTEXT_LIMIT):
+                commands._store_message_snapshot(chat_id, message_id, base[(chat_id + message_id) % len(base)])
+
+        # Fresh-but-equal copies, as a new probe or cache hit would hand over.
+        incoming = [replace(snapshot) for snapshot in base]
+        counter = iter(range(10**12))
+
+        def run() -> None:
+            step = next(counter)
+            commands._store_message_snapshot(
+                step % 5000, 1000 + step, incoming[step % len(incoming)], rendered="0" * 24
+            )
+
+        yield run
+    finally:
+        commands._message_contexts = original
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+
+def measure(setup: Benchmark, *, repeat: int = REPEAT, min_time: float = MIN_TIME) -> float:
+    """Return the best seconds per call of the callable built by ``setup``."""
+
+    prepared = setup()
+    if not inspect.isgenerator(prepared):
+        return _best_per_call(prepared, repeat, min_time)
+    with contextlib.closing(prepared):  # runs the setup's finally after timing
+        return _best_per_call(next(prepared), repeat, min_time)
+
+
+def _best_per_call(function: Callable[[], object], repeat: int, min_time: float) -> float:
+    timer = timeit.Timer(function)
+    number, elapsed = 1, 0.0
+    while elapsed < min_time:
+        elapsed = timer.timeit(number)
+        if elapsed < min_time:
+            number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(selected: dict[str, Benchmark], *, repeat: int, min_time: float) -> Iterator[tuple[str, float]]:
+    for name, setup in selected.items():
+        yield name, measure(setup, repeat=repeat, min_time=min_time)
+
+
+def _environment() -> dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def _interpreter() -> dict[str, str]:
+    """Build details saved with a baseline; two builds of one version can time differently."""
+
+    return {
+        "build": " ".join(platform.python_build()),
+        "compiler": platform.python_compiler(),
+        "optimize": str(sys.flags.optimize),
+    }
+
+
+def _format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown as a fraction (default 0.5)"
+    )
+    parser.add_argument("-k", dest="pattern", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help=f"timing repeats per benchmark (default {REPEAT})")
+    parser.add_argument(
+        "--min-time", type=float, default=MIN_TIME, help=f"minimum seconds per repeat (default {MIN_TIME:g})"
+    )
+    args = parser.parse_args(argv)
+
+    selected = {name: setup for name, setup in BENCHMARKS.items() if args.pattern in name}
+    if not selected:
+        parser.error(f"no benchmark matches {args.pattern!r}")
+
+    baseline: dict = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if not args.save and baseline.get("environment") != _environment():
+            print(f"warning: baseline was recorded on {baseline.get('environment')}, not {_environment()}")
+        settings = {"repeat": args.repeat, "min_time": args.min_time}
+        if not args.save and baseline.get("settings", settings) != settings:
+            print(f"warning: baseline was recorded with {baseline['settings']}, not {settings}")
+    expected = baseline.get("results", {})
+
+    results: dict[str, float] = {}
+    regressions: list[str] = []
+    width = max(len(name) for name in selected)
+    for name, seconds in run(selected, repeat=args.repeat, min_time=args.min_time):
+        results[name] = seconds
+        line = f"{name:<{width}}  {_format_seconds(seconds):>10}"
+        reference = expected.get(name)
+        if reference:
+            change = seconds / reference - 1
+            line += f"  {change:+7.1%} vs {_format_seconds(reference)}"
+            if change > args.threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line, flush=True)
+
+    if args.save:
+        merged = {**expected, **results} if args.pattern else results
+        recorded = {
+            "environment": _environment(),
+            "interpreter": _interpreter(),
+            "settings": {"repeat": args.repeat, "min_time": args.min_time},
+            "results": merged,
+        }
+        args.baseline.write_text(json.dumps(recorded, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Saved {len(results)} results to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
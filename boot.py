@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Boot-phase timing for cold starts.
+
+``main`` imports this module first, so :data:`STARTED` is as close to
+process start as Python code gets. Each :func:`mark` closes a phase
+(imports, build, listen, initialize, ...); :func:`first_update` closes the
+last one when the first update arrives and logs the whole breakdown once,
+which is the time-to-first-update a scale-from-zero request waits for.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+
+import metrics
+
+__all__ = ["STARTED", "mark", "first_update", "summary"]
+
+logger = logging.getLogger(__name__)
+
+STARTED = time.perf_counter()
+
+_BOOT_SECONDS = metrics.Gauge(
+    "mcstat_boot_seconds",
+    "Seconds this process spent in each boot phase, up to its first update.",
+    ("phase",),
+)
+
+_phases: list[tuple[str, float]] = []
+_last = STARTED
+_first_update_seen = False
+
+
+def mark(phase: str) -> float:
+    """Close ``phase`` (time since the previous mark) and return its seconds."""
+
+    global _last
+    now = time.perf_counter()
+    seconds = now - _last
+    _last = now
+    _phases.append((phase, seconds))
+    _BOOT_SECONDS.set(seconds, phase)
+    return seconds
+
+
+def summary() -> str:
+    total = _last - STARTED
+    phases = ", ".join(f"{phase}={seconds * 1000:.0f}ms" for phase, seconds in _phases)
+    return f"{total * 1000:.0f}ms ({phases})"
+
+
+def first_update() -> None:
+    """Record the first update of this process and log the boot breakdown."""
+
+    global _first_update_seen
+    if _first_update_seen:
+        return
+    _first_update_seen = True
+    mark("first_update")
+    _BOOT_SECONDS.set(_last - STARTED, "total")
+    logger.info("Time to first update: %s", summary())
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Per-endpoint circuit breakers for unreachable Minecraft servers.
+
+A breaker opens after ``failure_threshold`` failures inside ``failure_window``
+seconds. While open, calls fail fast with :class:`CircuitOpenError`; once
+``reset_timeout`` has passed a single half-open probe is let through, and its
+outcome either closes the breaker or re-opens it for another period.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+import metrics
+
+__all__ = ["CircuitBreaker", "CircuitOpenError"]
+
+_FAILURES = metrics.Counter(
+    "mcstat_breaker_failures_total",
+    "Probe failures recorded by circuit breakers.",
+    ("breaker",),
+)
+_REJECTIONS = metrics.Counter(
+    "mcstat_breaker_rejections_total",
+    "Calls answered immediately because the breaker was open.",
+    ("breaker",),
+)
+_TRANSITIONS = metrics.Counter(
+    "mcstat_breaker_transitions_total",
+    "Breaker state changes by target state.",
+    ("breaker", "state"),
+)
+_OPEN = metrics.Gauge(
+    "mcstat_breaker_open_endpoints",
+    "Endpoints whose breaker is currently open or half-open.",
+    ("breaker",),
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of probing an endpoint whose breaker is open."""
+
+
+@dataclass(slots=True)
+class _EndpointState:
+    state: str = CLOSED
+    failures: int = 0
+    first_failure_at: float = 0.0
+    opened_at: float = 0.0
+    probing: bool = False
+
+
+class CircuitBreaker:
+    """Track recent failures per endpoint key and short-circuit dead endpoints."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int,
+        failure_window: float,
+        reset_timeout: float,
+        max_entries: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.failure_window = failure_window
+        self.reset_timeout = reset_timeout
+        self.max_entries = max_entries
+        self._clock = clock
+        self._endpoints: OrderedDict[str, _EndpointState] = OrderedDict()
+        self._open_count = 0
+
+    def state(self, key: str) -> str:
+        entry = self._endpoints.get(key)
+        return entry.state if entry else CLOSED
+
+    def failures(self, key: str) -> int:
+        entry = self._endpoints.get(key)
+        return entry.failures if entry else 0
+
+    def is_open(self, key: str) -> bool:
+        """Return whether calls to ``key`` would currently be rejected."""
+
+        entry = self._endpoints.get(key)
+        if entry is None or entry.state == CLOSED:
+            return False
+        if entry.state == OPEN:
+            return self._clock() - entry.opened_at < self.reset_timeout
+        return entry.probing
+
+    def _transition(self, entry: _EndpointState, state: str) -> None:
+        was_open = entry.state != CLOSED
+        entry.state = state
+        is_open = state != CLOSED
+        if was_open != is_open:
+            self._open_count += 1 if is_open else -1
+            _OPEN.set(self._open_count, self.name)
+        _TRANSITIONS.inc(self.name, state)
+
+    def before_call(self, key: str) -> None:
+        """Raise :class:`CircuitOpenError` unless a call to ``key`` may proceed."""
+
+        entry = self._endpoints.get(key)
+        if entry is None or entry.state == CLOSED:
+            return
+
+        if entry.state == OPEN and self._clock() - entry.opened_at >= self.reset_timeout:
+            self._transition(entry, HALF_OPEN)
+
+        if entry.state == HALF_OPEN and not entry.probing:
+            entry.probing = True
+            return
+
+        _REJECTIONS.inc(self.name)
+        raise CircuitOpenError(f"{key} failed recently; retrying after the breaker cools down")
+
+    def record_success(self, key: str) -> None:
+        entry = self._endpoints.pop(key, None)
+        if entry is not None and entry.state != CLOSED:
+            self._transition(entry, CLOSED)
+
+    def record_failure(self, key: str) -> None:
+        _FAILURES.inc(self.name)
+        now = self._clock()
+        entry = self._endpoints.get(key)
+        if entry is None:
+            entry = _EndpointState(first_failure_at=now)
+            self._endpoints[key] = entry
+            self._trim()
+        self._endpoints.move_to_end(key)
+
+        if entry.state == CLOSED and now - entry.first_failure_at > self.failure_window:
+            entry.failures = 0
+            entry.first_failure_at = now
+
+        entry.failures += 1
+        entry.probing = False
+        if entry.state == HALF_OPEN or entry.failures >= self.failure_threshold:
+            entry.opened_at = now
+            self._transition(entry, OPEN)
+
+    def release(self, key: str) -> None:
+        """Forget an unfinished half-open probe so another one may run."""
+
+        entry = self._endpoints.get(key)
+        if entry is not None:
+            entry.probing = False
+
+    def _trim(self) -> None:
+        while len(self._endpoints) > self.max_entries:
+            _, entry = self._endpoints.popitem(last=False)
+            if entry.state != CLOSED:
+                self._open_count -= 1
+                _OPEN.set(self._open_count, self.name)
+
+    @asynccontextmanager
+    async def guard(self, key: str) -> AsyncIterator[None]:
+        """Run the body as a call to ``key``, recording its outcome."""
+
+        self.before_call(key)
+        try:
+            yield
+        except Exception:
+            self.record_failure(key)
+            raise
+        except BaseException:
+            self.release(key)
+            raise
+        self.record_success(key)
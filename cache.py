@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Process-wide caches shared by every chat talking to the bot."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+import metrics
+import tracing
+import utils
+
+__all__ = ["RenderCache", "SingleFlight", "SnapshotCache"]
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+_CACHE_LOOKUPS = metrics.Counter(
+    "mcstat_snapshot_cache_lookups_total",
+    "Snapshot cache lookups by kind and result.",
+    ("kind", "result"),
+)
+_CACHE_EVICTIONS = metrics.Counter(
+    "mcstat_snapshot_cache_evictions_total",
+    "Snapshot cache entries evicted to stay within the size bound.",
+)
+
+_RENDER_LOOKUPS = metrics.Counter(
+    "mcstat_render_cache_lookups_total",
+    "Rendered message lookups by view and result.",
+    ("view", "result"),
+)
+_RENDER_SECONDS = metrics.Histogram(
+    "mcstat_render_seconds",
+    "Time spent rendering a message on a render cache miss, by view.",
+    ("view",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+)
+
+_FLIGHT_CALLS = metrics.Counter(
+    "mcstat_singleflight_calls_total",
+    "Single-flight calls by whether they started a new task or joined one in flight.",
+    ("result",),
+)
+_FLIGHT_INFLIGHT = metrics.Gauge(
+    "mcstat_singleflight_inflight",
+    "Shared tasks currently in flight.",
+)
+
+
+def _kind(include_query: bool) -> str:
+    return "query" if include_query else "status"
+
+
+class SnapshotCache(Generic[T]):
+    """Size-bounded LRU cache of server snapshots keyed by normalized address.
+
+    Status-only and status+query snapshots are stored separately with their own
+    TTLs. A status+query snapshot is a superset of a status one, so it can also
+    answer status lookups as long as it is younger than the status TTL.
+    Expired entries linger for up to ``max_stale`` seconds so :meth:`latest`
+    can still serve them where an old answer beats a slow one.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        status_ttl: float,
+        query_ttl: float,
+        max_stale: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max(0, max_entries)
+        self.status_ttl = status_ttl
+        self.query_ttl = query_ttl
+        self.max_stale = max_stale
+        self._clock = clock
+        self._entries: OrderedDict[tuple[str, bool], tuple[float, T]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _fresh(self, key: tuple[str, bool], ttl: float, now: float) -> T | None:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+
+        stored_at, value = item
+        age = now - stored_at
+        if age >= ttl:
+            if age >= max(self.query_ttl if key[1] else self.status_ttl, self.max_stale):
+                del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, address: str, *, include_query: bool) -> T | None:
+        """Return a fresh cached value for ``address`` or ``None``."""
+
+        if self.max_entries <= 0:
+            return None
+
+        normalized = utils.normalize_address(address)
+        now = self._clock()
+
+        if include_query:
+            value = self._fresh((normalized, True), self.query_ttl, now)
+        else:
+            value = self._fresh((normalized, False), self.status_ttl, now)
+            if value is None:
+                value = self._fresh((normalized, True), min(self.status_ttl, self.query_ttl), now)
+
+        if value is None:
+            self.misses += 1
+            _CACHE_LOOKUPS.inc(_kind(include_query), "miss")
+        else:
+            self.hits += 1
+            _CACHE_LOOKUPS.inc(_kind(include_query), "hit")
+        return value
+
+    def latest(self, address: str) -> tuple[float, T] | None:
+        """Return ``(age, value)`` of the newest entry for ``address``, stale or not.
+
+        Entries older than both their TTL and ``max_stale`` are not returned.
+        """
+
+        normalized = utils.normalize_address(address)
+        now = self._clock()
+        newest: tuple[float, T] | None = None
+        for include_query in (True, False):
+            item = self._entries.get((normalized, include_query))
+            if item is None:
+                continue
+            age = now - item[0]
+            if age >= max(self.query_ttl if include_query else self.status_ttl, self.max_stale):
+                continue
+            if newest is None or age < newest[0]:
+                newest = (age, item[1])
+        _CACHE_LOOKUPS.inc("latest", "hit" if newest is not None else "miss")
+        return newest
+
+    def put(self, address: str, value: T, *, include_query: bool, age: float = 0.0) -> None:
+        """Store ``value`` for ``address``, evicting the least recently used entries.
+
+        ``age`` backdates the entry, for values that were fetched elsewhere.
+        """
+
+        if self.max_entries <= 0:
+            return
+
+        key = (utils.normalize_address(address), include_query)
+        self._entries[key] = (self._clock() - max(0.0, age), value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+            _CACHE_EVICTIONS.inc()
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss/eviction counters and the current size."""
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }
+
+
+class RenderCache(Generic[T]):
+    """Size-bounded LRU of rendered text keyed by ``(object identity, view)``.
+
+    Meant for values that are never mutated after creation (snapshots are
+    only ever copied with ``replace``). The cached object is held alongside
+    its text, so an ``id`` cannot be reused while its entry is alive.
+    """
+
+    def __init__(self, *, max_entries: int) -> None:
+        self.max_entries = max(0, max_entries)
+        self._entries: OrderedDict[tuple[int, str], tuple[T, str]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def render(self, value: T, view: str, render: Callable[[T], str]) -> str:
+        """Return the cached text of ``view`` for ``value``, rendering it on a miss."""
+
+        if self.max_entries <= 0:
+            with _RENDER_SECONDS.time(view), tracing.span("render", view=view):
+                return render(value)
+
+        key = (id(value), view)
+        item = self._entries.get(key)
+        if item is not None and item[0] is value:
+            self._entries.move_to_end(key)
+            _RENDER_LOOKUPS.inc(view, "hit")
+            return item[1]
+
+        _RENDER_LOOKUPS.inc(view, "miss")
+        with _RENDER_SECONDS.time(view), tracing.span("render", view=view):
+            text = render(value)
+        self._entries[key] = (value, text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return text
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class SingleFlight(Generic[K, T]):
+    """Collapse concurrent calls for the same key into one shared task.
+
+    Every caller awaits the shared task through :func:`asyncio.shield`, so a
+    cancelled waiter only stops waiting; the task keeps running for the others
+    and still completes (and populates any caches) if nobody is left.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: dict[K, asyncio.Task[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def in_flight(self, key: K) -> bool:
+        return key in self._tasks
+
+    async def run(self, key: K, factory: Callable[[], Awaitable[T]]) -> T:
+        """Await the task running for ``key``, starting it with ``factory`` if needed."""
+
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            _FLIGHT_INFLIGHT.inc()
+            _FLIGHT_CALLS.inc("started")
+        else:
+            _FLIGHT_CALLS.inc("joined")
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: K, task: asyncio.Task[T]) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        _FLIGHT_INFLIGHT.dec()
+        if not task.cancelled():
+            task.exception()  # mark as retrieved when every waiter went away
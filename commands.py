@@ -7,30 +7,74 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import ipaddress
+import json
 import os
 import logging
 import re
-from collections import deque
-from collections.abc import Sequence
-from typing import Any, cast
-from dataclasses import dataclass, replace
-from datetime import datetime, timezone
+import sys
+import time
+import warnings
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, cast
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 from functools import lru_cache
 
-from mcstatus import JavaServer
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram import (
+    CallbackQuery,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+    LinkPreviewOptions,
+    Update,
+)
 from telegram.constants import ChatAction
-from telegram.error import BadRequest
-from telegram.ext import ContextTypes
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from telegram.ext import Application, ContextTypes
 from telegram.helpers import escape_markdown
 
+import breaker
+import cache
+import context_store
+import debounce
+import history
+import metrics
+import persistence
+import resolver
+import shared_cache
+import slp
+import tracing
 import utils
+import watch
+from deadline import Deadline, DeadlineExceeded
+
+if TYPE_CHECKING:
+    from mcstatus import JavaServer
 
 __all__ = [
     "cmd_start",
     "cmd_status",
     "cmd_players",
+    "cmd_statusall",
+    "cmd_watch",
+    "cmd_unwatch",
+    "cmd_history",
+    "cmd_uptime",
+    "inline_status",
+    "setup_history",
+    "warm_render_cache",
+    "preload_probe_modules",
+    "setup_watch",
+    "setup_persistence",
+    "shutdown_persistence",
+    "setup_shared_cache",
+    "shutdown_shared_cache",
     "cb_status",
     "cb_players",
     "cb_about",
@@ -40,19 +84,94 @@ __all__ = [
 logger = logging.getLogger(__name__)
 
 DEFAULT_TIMEOUT = 10.0  # seconds
+# End-to-end budget per request kind; every lookup/status/query fallback shares it.
+DEADLINES = {
+    "status": utils.env_float("DEADLINE_STATUS", 12.0),
+    "players": utils.env_float("DEADLINE_PLAYERS", 15.0),
+    "callback": utils.env_float("DEADLINE_CALLBACK", 8.0),
+    "batch": utils.env_float("DEADLINE_BATCH", 20.0),
+    "inline": utils.env_float("DEADLINE_INLINE", 6.0),
+}
 MAX_PLAYER_NAMES_DISPLAY = 25
 
 AFFILIATE_URL_ENV = "AFFILIATE_URL"
 AFFILIATE_LABEL_ENV = "AFFILIATE_LABEL"
 AFFILIATE_BLURB_ENV = "AFFILIATE_BLURB"
 
-MESSAGE_CONTEXT_KEY = "message_context"
-MESSAGE_CONTEXT_ORDER_KEY = "message_context_order"
-MESSAGE_CONTEXT_LIMIT = 20
+MESSAGE_CONTEXT_LIMIT = utils.env_int("MESSAGE_CONTEXT_LIMIT", 20)  # per chat
+MESSAGE_CONTEXT_MAX_BYTES = utils.env_int("MESSAGE_CONTEXT_MAX_BYTES", 64 * 1024 * 1024)
+MESSAGE_CONTEXT_IDLE_TTL = utils.env_float("MESSAGE_CONTEXT_IDLE_TTL", 7 * 24 * 3600.0)  # seconds
+MESSAGE_CONTEXT_DB = (os.getenv("MESSAGE_CONTEXT_DB") or "").strip()
+MESSAGE_CONTEXT_FLUSH_INTERVAL = utils.env_float("MESSAGE_CONTEXT_FLUSH_INTERVAL", 2.0)  # seconds
+SAVED_ADDRESSES_KEY = "saved_addresses"
+
+BATCH_MAX_ADDRESSES = utils.env_int("BATCH_MAX_ADDRESSES", 50)
+BATCH_CONCURRENCY = utils.env_int("BATCH_CONCURRENCY", 8)
+BATCH_ADDRESS_WIDTH = 28
+
+WATCH_INTERVAL = utils.env_float("WATCH_INTERVAL", 60.0)  # seconds between polls of one server
+WATCH_JITTER = utils.env_float("WATCH_JITTER", 0.2)  # +/- fraction of the interval
+WATCH_CONCURRENCY = utils.env_int("WATCH_CONCURRENCY", 16)
+WATCH_TICK = utils.env_float("WATCH_TICK", 5.0)  # seconds between scheduler passes
+WATCH_MAX_PER_CHAT = utils.env_int("WATCH_MAX_PER_CHAT", 10)
+WATCH_DB = (os.getenv("WATCH_DB") or "").strip()  # SQLite file that keeps watches across restarts
+WATCH_SEND_RATE = utils.env_float("WATCH_SEND_RATE", 20.0)  # watch notifications per second, across chats
+WATCH_RETRY_DELAY = utils.env_float("WATCH_RETRY_DELAY", 2.0)  # seconds before resending after a network error
+
+BUTTON_COOLDOWN = utils.env_float("BUTTON_COOLDOWN", 5.0)  # seconds a refreshed message is served from its last result
+
+INLINE_DEBOUNCE = utils.env_float("INLINE_DEBOUNCE", 0.4)  # seconds to wait for more keystrokes
+INLINE_CACHE_TIME = utils.env_int("INLINE_CACHE_TIME", 10)  # seconds Telegram may reuse an answer
+INLINE_QUERY_KEY = "inline_query_id"
+
+HISTORY_SAMPLES = utils.env_int("HISTORY_SAMPLES", 1440)  # per server
+HISTORY_MIN_INTERVAL = utils.env_float("HISTORY_MIN_INTERVAL", 120.0)  # seconds between samples
+HISTORY_MAX_SERVERS = utils.env_int("HISTORY_MAX_SERVERS", 5000)
+HISTORY_WIDTH = 24  # sparkline columns
+ROLLUP_MINUTES = utils.env_int("ROLLUP_MINUTES", 360)  # 1-minute buckets kept per server
+ROLLUP_HOURS = utils.env_int("ROLLUP_HOURS", 744)  # 1-hour buckets
+ROLLUP_DAYS = utils.env_int("ROLLUP_DAYS", 365)  # 1-day buckets
+ROLLUP_INTERVAL = utils.env_float("ROLLUP_INTERVAL", 60.0)  # seconds between rollup passes
+UPTIME_DEFAULT_WINDOW = "7d"
 
 DEFAULT_AFFILIATE_LABEL = "Create your own MC server"
 DEFAULT_AFFILIATE_BLURB = "Sponsored by our hosting partner\nClick to support the bot!"
 
+SNAPSHOT_CACHE_SIZE = utils.env_int("SNAPSHOT_CACHE_SIZE", 2048)
+SNAPSHOT_CACHE_STATUS_TTL = utils.env_float("SNAPSHOT_CACHE_STATUS_TTL", 15.0)  # seconds
+SNAPSHOT_CACHE_QUERY_TTL = utils.env_float("SNAPSHOT_CACHE_QUERY_TTL", 30.0)  # seconds
+RENDER_CACHE_SIZE = utils.env_int("RENDER_CACHE_SIZE", 4096)  # rendered messages kept, all views together
+SNAPSHOT_CACHE_MAX_STALE = utils.env_float("SNAPSHOT_CACHE_MAX_STALE", 600.0)  # seconds, inline answers only
+
+SHARED_CACHE = (os.getenv("SHARED_CACHE") or "").strip()  # sqlite:///path or unix:///path; empty disables
+SHARED_PROBE_POLL = utils.env_float("SHARED_PROBE_POLL", 0.1)  # seconds between checks for another worker's probe
+SHARED_NEGATIVE_TTL = utils.env_float("SHARED_NEGATIVE_TTL", 5.0)  # seconds other workers reuse a failed probe
+
+RESOLVER_CACHE_SIZE = utils.env_int("RESOLVER_CACHE_SIZE", 4096)
+RESOLVER_MIN_TTL = utils.env_float("RESOLVER_MIN_TTL", 60.0)  # seconds
+RESOLVER_MAX_TTL = utils.env_float("RESOLVER_MAX_TTL", 3600.0)  # seconds
+RESOLVER_NEGATIVE_TTL = utils.env_float("RESOLVER_NEGATIVE_TTL", 30.0)  # seconds
+
+BREAKER_FAILURE_THRESHOLD = utils.env_int("BREAKER_FAILURE_THRESHOLD", 2)
+BREAKER_FAILURE_WINDOW = utils.env_float("BREAKER_FAILURE_WINDOW", 120.0)  # seconds
+BREAKER_RESET_TIMEOUT = utils.env_float("BREAKER_RESET_TIMEOUT", 60.0)  # seconds
+
+_PROBE_SECONDS = metrics.Histogram(
+    "mcstat_probe_phase_seconds",
+    "Time spent in each probe phase (DNS lookup, status ping, query).",
+    ("phase",),
+)
+_PROBE_OUTCOMES = metrics.Counter(
+    "mcstat_probe_outcomes_total",
+    "Probe phases by outcome: ok or the exception type that ended them.",
+    ("phase", "outcome"),
+)
+_PROBES_IN_FLIGHT = metrics.Gauge(
+    "mcstat_probes_in_flight",
+    "Probe phases currently running.",
+    ("phase",),
+)
+
 DEVELOPER_CHANNEL_URL = "https://t.me/GSiesto"
 DEVELOPER_HANDLE = "@GSiesto"
 
@@ -65,6 +184,14 @@ class CallbackData(str, Enum):
     ABOUT = "pattern_about"
 
 
+class BatchMiss(str, Enum):
+    """Why a row of a multi-server table has no snapshot."""
+
+    OFFLINE = "offline"
+    TIMEOUT = "timeout"  # the probe ran out of its share of the batch budget
+    SKIPPED = "not checked"  # breaker open, or no batch time left to start the probe
+
+
 WELCOME_TEXT = (
     "👋 *Welcome to MCServerStatBot!*\n"
     "I can check Minecraft Java servers for uptime, ping, and connected players.\n\n"
@@ -84,6 +211,33 @@ PLAYERS_HINT_TEXT = (
     "Run `/players host.example.com` first; once the bot has a server, the buttons can refresh the player list."
 )
 
+STATUSALL_HINT_TEXT = (
+    "ℹ️ *How to check several servers*\n"
+    "Save a list with `/statusall lobby.example.com survival.example.com`, "
+    "then run `/statusall` anytime to check all of them at once."
+)
+
+WATCH_HINT_TEXT = (
+    "ℹ️ *How to watch a server*\n"
+    "Use `/watch host.example.com` to get a message when it goes offline or comes back, "
+    "or `/watch host.example.com 50` to also hear when it reaches 50 players.\n"
+    "Stop with `/unwatch host.example.com`."
+)
+
+HISTORY_HINT_TEXT = (
+    "ℹ️ *How to see server history*\n"
+    "Use `/history host.example.com`. History is recorded whenever the bot checks a server, "
+    "so `/watch` it to build up a steady record."
+)
+
+UPTIME_HINT_TEXT = (
+    "ℹ️ *How to get an uptime report*\n"
+    "Use `/uptime host.example.com 30d` (or `12h`, `7d`, `4w`). "
+    "Reports cover the checks the bot has made, so `/watch` a server to keep its record complete."
+)
+
+NO_CHANGE_TOAST = "No changes since the last check."
+
 ABOUT_TEXT = (
     "🤖 *MCServerStatBot*\n"
     "• Built for quick Minecraft Java status checks\n"
@@ -115,6 +269,47 @@ class MessageContextEntry:
 
     address: str | None
     snapshot: ServerSnapshot | None
+    addresses: tuple[str, ...] = ()
+    rendered: str | None = None  # digest of the text and markup the message currently shows
+
+
+_snapshot_cache: cache.SnapshotCache[ServerSnapshot] = cache.SnapshotCache(
+    max_entries=SNAPSHOT_CACHE_SIZE,
+    status_ttl=SNAPSHOT_CACHE_STATUS_TTL,
+    query_ttl=SNAPSHOT_CACHE_QUERY_TTL,
+    max_stale=SNAPSHOT_CACHE_MAX_STALE,
+)
+_resolver = resolver.ResolverCache(
+    max_entries=RESOLVER_CACHE_SIZE,
+    min_ttl=RESOLVER_MIN_TTL,
+    max_ttl=RESOLVER_MAX_TTL,
+    negative_ttl=RESOLVER_NEGATIVE_TTL,
+)
+_shared: shared_cache.SharedCache | None = None
+_status_breaker = breaker.CircuitBreaker(
+    "status",
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    failure_window=BREAKER_FAILURE_WINDOW,
+    reset_timeout=BREAKER_RESET_TIMEOUT,
+)
+_query_breaker = breaker.CircuitBreaker(
+    "query",
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    failure_window=BREAKER_FAILURE_WINDOW,
+    reset_timeout=BREAKER_RESET_TIMEOUT,
+)
+_refresh_gate = debounce.RefreshGate(cooldown=BUTTON_COOLDOWN)
+_render_cache: cache.RenderCache[ServerSnapshot] = cache.RenderCache(max_entries=RENDER_CACHE_SIZE)
+_probe_flights: cache.SingleFlight[tuple[str, str], Any] = cache.SingleFlight()
+_watch_scheduler: watch.WatchScheduler[ServerSnapshot] | None = None
+_context_store: persistence.SQLiteContextStore | None = None
+_watch_store: persistence.SQLiteWatchStore | None = None
+_history = history.HistoryStore(
+    capacity=HISTORY_SAMPLES,
+    min_interval=HISTORY_MIN_INTERVAL,
+    max_series=HISTORY_MAX_SERVERS,
+    rollup_capacities=(ROLLUP_MINUTES, ROLLUP_HOURS, ROLLUP_DAYS),
+)
 
 
 # ==========================
@@ -137,24 +332,13 @@ def _clean_description(raw_description: object | None) -> str:
     return text or "No description provided."
 
 
-def _extract_player_names_from_status(status: object) -> tuple[str, ...]:
-    players = getattr(status, "players", None)
-    sample = getattr(players, "sample", None)
-    if not sample:
-        return tuple()
-
-    names: list[str] = []
-    for entry in sample:
-        name = getattr(entry, "name", None)
-        if name is None and isinstance(entry, dict):
-            name = entry.get("name")
-        if name:
-            names.append(str(name))
-    return tuple(names)
-
-
+@lru_cache(maxsize=1)
 def build_main_keyboard() -> InlineKeyboardMarkup:
-    """Create the primary inline keyboard with fresh button instances."""
+    """Return the primary inline keyboard.
+
+    Telegram objects are immutable, so one instance is built and shared by
+    every send and edit.
+    """
 
     rows: list[list[InlineKeyboardButton]] = [
         [
@@ -191,6 +375,7 @@ def _get_affiliate_config() -> tuple[str, str, str] | None:
     return url, label, blurb
 
 
+@lru_cache(maxsize=1)
 def _affiliate_button() -> InlineKeyboardButton | None:
     config = _get_affiliate_config()
     if not config:
@@ -200,6 +385,13 @@ def _affiliate_button() -> InlineKeyboardButton | None:
     return InlineKeyboardButton(f"🙌 {label}", url=url)
 
 
+@lru_cache(maxsize=1)
+def _affiliate_markup() -> InlineKeyboardMarkup | None:
+    affiliate_button = _affiliate_button()
+    return InlineKeyboardMarkup([[affiliate_button]]) if affiliate_button else None
+
+
+@lru_cache(maxsize=1)
 def _affiliate_hint() -> str | None:
     config = _get_affiliate_config()
     if not config:
@@ -212,6 +404,13 @@ def _affiliate_hint() -> str | None:
     return f"🙌 {safe_blurb}"
 
 
+def warm_render_cache() -> None:
+    """Build the static keyboards and affiliate texts once, before the first update."""
+
+    build_main_keyboard()
+    _affiliate_markup()
+    _affiliate_hint()
+
 
 def _chat_data(context: ContextTypes.DEFAULT_TYPE) -> dict[str, Any]:
     return cast(dict[str, Any], context.chat_data)
@@ -222,129 +421,601 @@ def _clear_last_context(chat_data: dict[str, Any]) -> None:
     chat_data.pop("last_snapshot", None)
 
 
+def _snapshot_size(entry: MessageContextEntry) -> int:
+    snapshot = entry.snapshot
+    if snapshot is None:
+        return 0
+    strings = (snapshot.address, snapshot.description, snapshot.version_name, snapshot.query_error or "")
+    return (
+        sys.getsizeof(snapshot)
+        + sum(sys.getsizeof(text) for text in strings)
+        + sys.getsizeof(snapshot.player_names)
+        + sum(sys.getsizeof(name) for name in snapshot.player_names)
+    )
+
+
+def _snapshot_intern_key(entry: MessageContextEntry) -> tuple[Any, ...] | None:
+    snapshot = entry.snapshot
+    if snapshot is None:
+        return None
+    # Snapshots from one probe share their fetch time; the rest guards collisions.
+    return (snapshot.address, snapshot.fetched_at, snapshot.players_online, len(snapshot.player_names))
+
+
+def _intern_snapshot(entry: MessageContextEntry, canonical: MessageContextEntry) -> MessageContextEntry:
+    if entry.snapshot is canonical.snapshot or entry.snapshot != canonical.snapshot:
+        return entry
+    return replace(entry, snapshot=canonical.snapshot)
+
+
+_message_contexts: context_store.MessageContextStore[MessageContextEntry] = context_store.MessageContextStore(
+    per_chat_limit=MESSAGE_CONTEXT_LIMIT,
+    max_bytes=MESSAGE_CONTEXT_MAX_BYTES,
+    idle_ttl=MESSAGE_CONTEXT_IDLE_TTL,
+    intern_key=_snapshot_intern_key,
+    intern=_intern_snapshot,
+    size_of=_snapshot_size,
+)
+
+
 def _store_message_snapshot(
-    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
     message_id: int,
     snapshot: ServerSnapshot | None,
     *,
     address: str | None = None,
+    addresses: Sequence[str] = (),
+    rendered: str | None = None,
 ) -> None:
-    chat_data = _chat_data(context)
-    store = cast(dict[int, MessageContextEntry], chat_data.setdefault(MESSAGE_CONTEXT_KEY, {}))
-    order = cast(deque[int], chat_data.setdefault(MESSAGE_CONTEXT_ORDER_KEY, deque()))
+    entry = MessageContextEntry(
+        address=address or (snapshot.address if snapshot else None),
+        snapshot=snapshot,
+        addresses=tuple(addresses),
+        rendered=rendered,
+    )
+    entry = _message_contexts.put(chat_id, message_id, entry)
 
-    entry = MessageContextEntry(address=address or (snapshot.address if snapshot else None), snapshot=snapshot)
+    if _context_store is not None:
+        _context_store.record(chat_id, message_id, entry)
 
-    if message_id in store:
-        store[message_id] = entry
-        try:
-            order.remove(message_id)
-        except ValueError:
-            pass
-    else:
-        store[message_id] = entry
 
-    order.append(message_id)
+def _remember_render(chat_id: int, message_id: int, rendered: str) -> None:
+    """Record what a tracked message now shows, keeping the rest of its context."""
 
-    while len(order) > MESSAGE_CONTEXT_LIMIT:
-        old_id = order.popleft()
-        store.pop(old_id, None)
+    entry = _message_contexts.get(chat_id, message_id)
+    if entry is None or entry.rendered == rendered:
+        return
 
+    entry = _message_contexts.put(chat_id, message_id, replace(entry, rendered=rendered))
+    if _context_store is not None:
+        _context_store.record(chat_id, message_id, entry)
 
-def _get_message_context(
-    context: ContextTypes.DEFAULT_TYPE, message_id: int
-) -> MessageContextEntry | None:
-    chat_data = _chat_data(context)
-    store = cast(dict[int, MessageContextEntry] | None, chat_data.get(MESSAGE_CONTEXT_KEY))
-    if not store:
+
+def _get_message_context(chat_id: int, message_id: int) -> MessageContextEntry | None:
+    return _message_contexts.get(chat_id, message_id)
+
+
+def _snapshot_to_dict(snapshot: ServerSnapshot) -> dict[str, Any]:
+    data = asdict(snapshot)
+    data["fetched_at"] = snapshot.fetched_at.isoformat()
+    return data
+
+
+def _snapshot_from_dict(data: dict[str, Any]) -> ServerSnapshot:
+    data["fetched_at"] = datetime.fromisoformat(data["fetched_at"])
+    data["player_names"] = tuple(data.get("player_names") or ())
+    return ServerSnapshot(**data)
+
+
+def _encode_context_entry(entry: MessageContextEntry) -> str:
+    data = asdict(entry)
+    if entry.snapshot is not None:
+        data["snapshot"] = _snapshot_to_dict(entry.snapshot)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _decode_context_entry(payload: str) -> MessageContextEntry | None:
+    try:
+        data = json.loads(payload)
+        raw_snapshot = data.get("snapshot")
+        snapshot = _snapshot_from_dict(raw_snapshot) if raw_snapshot else None
+        return MessageContextEntry(
+            address=data.get("address"),
+            snapshot=snapshot,
+            addresses=tuple(data.get("addresses") or ()),
+            rendered=data.get("rendered"),
+        )
+    except (TypeError, ValueError, KeyError) as exc:
+        logger.debug("Ignoring unreadable stored message context (%s)", exc)
         return None
 
-    entry = store.get(message_id)
-    if isinstance(entry, MessageContextEntry):
-        return entry
 
-    if isinstance(entry, ServerSnapshot):  # legacy compatibility
-        converted = MessageContextEntry(address=entry.address, snapshot=entry)
-        store[message_id] = converted
-        return converted
+async def _load_message_context(chat_id: int) -> None:
+    """Merge a chat's durable message context into memory once per residency."""
 
-    return None
+    if _context_store is None or _message_contexts.is_loaded(chat_id):
+        return
+    _message_contexts.mark_loaded(chat_id)
+
+    rows = await _context_store.load_chat(chat_id)
+    # Stored rows are older than anything recorded since the restart.
+    for message_id, payload in reversed(rows):
+        entry = _decode_context_entry(payload)
+        if entry is not None:
+            _message_contexts.backfill(chat_id, message_id, entry)
+
+
+def setup_persistence(application: Application) -> None:
+    """Open the durable message-context store when ``MESSAGE_CONTEXT_DB`` is set."""
+
+    global _context_store
+
+    if not MESSAGE_CONTEXT_DB:
+        return
+
+    store = persistence.SQLiteContextStore(
+        MESSAGE_CONTEXT_DB,
+        encode=_encode_context_entry,
+        per_chat_limit=MESSAGE_CONTEXT_LIMIT,
+    )
+    store.open()
+    _context_store = store
+    logger.info("Persisting message context to %s", store.path)
+
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(
+            job_flush_context,
+            interval=MESSAGE_CONTEXT_FLUSH_INTERVAL,
+            first=MESSAGE_CONTEXT_FLUSH_INTERVAL,
+            name="flush-message-context",
+        )
+
+
+async def job_flush_context(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Write buffered message context to disk."""
+
+    if _context_store is not None:
+        await _context_store.flush()
+
+
+def setup_shared_cache(application: Application) -> None:
+    """Share snapshots and resolver answers with other workers when ``SHARED_CACHE`` is set."""
+
+    global _shared
+
+    if not SHARED_CACHE:
+        return
+
+    _shared = shared_cache.open_shared_cache(SHARED_CACHE)
+    _resolver.shared = _shared
+    logger.info("Sharing probe results through %s", SHARED_CACHE)
+
+
+async def shutdown_shared_cache(application: Application) -> None:
+    """Close the shared cache connection (``post_shutdown`` hook)."""
+
+    global _shared
+
+    if _shared is None:
+        return
+
+    shared, _shared = _shared, None
+    _resolver.shared = None
+    await shared.close()
 
 
-async def _run_in_thread(func, *args, timeout: float = DEFAULT_TIMEOUT):
-    return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout=timeout)
+async def shutdown_persistence(application: Application) -> None:
+    """Flush pending message context and close the stores (``post_shutdown`` hook)."""
 
+    global _context_store, _watch_store
 
-async def _lookup_server(address: str) -> JavaServer:
+    if _watch_store is not None:
+        _watch_store.close()
+        _watch_store = None
+
+    if _context_store is None:
+        return
+
+    written = await _context_store.flush()
+    _context_store.close()
+    _context_store = None
+    logger.info("Flushed %d message context rows on shutdown", written)
+
+
+def _java_server() -> type[JavaServer]:
+    # mcstatus (and the dnspython it pulls in) is imported on first use so a
+    # cold start can serve its first update sooner; see preload_probe_modules.
+    from mcstatus import JavaServer
+
+    return JavaServer
+
+
+def preload_probe_modules() -> None:
+    """Import the probe dependencies ahead of the first probe (safe to call from a thread)."""
+
+    _java_server()
+    resolver.preload()
+
+
+def _socket_timeout(budget: Deadline) -> float:
+    return max(0.1, min(DEFAULT_TIMEOUT, budget.remaining()))
+
+
+@contextmanager
+def _probe_phase(phase: str) -> Iterator[None]:
+    """Time, trace and count one probe phase."""
+
+    _PROBES_IN_FLIGHT.inc(phase)
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        with tracing.span(phase):
+            yield
+    except BaseException as exc:
+        outcome = type(exc).__name__
+        raise
+    finally:
+        _PROBE_SECONDS.observe(time.perf_counter() - started, phase)
+        _PROBE_OUTCOMES.inc(phase, outcome)
+        _PROBES_IN_FLIGHT.dec(phase)
+
+
+async def _lookup_server(address: str, budget: Deadline) -> resolver.ResolvedEndpoint:
+    with _probe_phase("lookup"):
+        return await _lookup_endpoint(address, budget)
+
+
+async def _lookup_endpoint(address: str, budget: Deadline) -> resolver.ResolvedEndpoint:
     try:
-        return await JavaServer.async_lookup(address, timeout=DEFAULT_TIMEOUT)
+        endpoint = await budget.run("lookup", _resolver.resolve(address, lifetime=_socket_timeout(budget)))
+    except (resolver.ResolutionError, DeadlineExceeded):
+        raise
     except Exception as exc:
-        logger.debug("JavaServer.async_lookup failed for %s (%s), trying sync lookup", address, exc)
+        logger.debug("Cached resolver failed for %s (%s), trying sync lookup", address, exc)
+        tracing.annotate(branch="thread", resolver_error=type(exc).__name__)
         try:
-            return await _run_in_thread(JavaServer.lookup, address, timeout=DEFAULT_TIMEOUT)
+            server = await budget.run(
+                "lookup", asyncio.to_thread(_java_server().lookup, address, timeout=_socket_timeout(budget))
+            )
+        except DeadlineExceeded:
+            raise
         except Exception:
+            tracing.annotate(branch="literal")
             host, port = utils.parse_address(address)
-            return JavaServer(host, port)
+        else:
+            host, port = server.address.host, server.address.port
+        # No IPs: the status and query legs resolve the host themselves, which
+        # for the status ping means getaddrinfo on the default executor.
+        srv = (host, port) != utils.parse_address(address)
+        return resolver.ResolvedEndpoint(host=host, port=port, ips=(), srv=srv)
 
+    tracing.annotate(branch="resolver")
+    return endpoint
 
-async def _fetch_status(server: JavaServer):
-    try:
-        return await server.async_status(timeout=DEFAULT_TIMEOUT)
-    except Exception:
-        return await _run_in_thread(server.status, timeout=DEFAULT_TIMEOUT)
 
+def _endpoint_ip(endpoint: resolver.ResolvedEndpoint) -> str | None:
+    return endpoint.ips[0] if endpoint.ips else None
 
-async def _fetch_query(server: JavaServer):
-    try:
-        return await server.async_query(timeout=DEFAULT_TIMEOUT)
-    except Exception:
-        return await _run_in_thread(server.query, timeout=DEFAULT_TIMEOUT)
+
+async def _fetch_status(endpoint: resolver.ResolvedEndpoint, budget: Deadline) -> slp.StatusResponse:
+    """Ping ``endpoint`` with the asyncio SLP client; failures are final.
+
+    The ping stays on the event loop only when the resolver returned an IP.
+    After a resolver fallback ``endpoint.ips`` is empty, and
+    ``asyncio.open_connection`` resolves the host through ``loop.getaddrinfo``,
+    which runs on the default executor.
+    """
+
+    with _probe_phase("status"):
+        tracing.annotate(branch="native")
+        return await budget.run(
+            "status",
+            slp.status(endpoint.host, endpoint.port, ip=_endpoint_ip(endpoint), timeout=_socket_timeout(budget)),
+        )
+
+
+# The socket timeout lives on the JavaServer instance; mcstatus' async helpers
+# do not accept a ``timeout`` keyword. Connection failures and timeouts are
+# final; only unexpected errors are retried through the blocking API, and only
+# with whatever is left of the request budget.
+async def _fetch_query(endpoint: resolver.ResolvedEndpoint, budget: Deadline):
+    # The GS4 query does not carry the hostname, so the resolved IP is queried directly.
+    server = _java_server()(_endpoint_ip(endpoint) or endpoint.host, endpoint.port, timeout=_socket_timeout(budget))
+    with _probe_phase("query"):
+        tracing.annotate(branch="async")
+        try:
+            return await budget.run("query", server.async_query())
+        except (OSError, asyncio.TimeoutError):
+            raise
+        except Exception as exc:
+            tracing.annotate(branch="thread", async_error=type(exc).__name__)
+            return await budget.run("query", asyncio.to_thread(server.query))
 
 
 async def _send_typing(context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> None:
-    await context.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+    with tracing.span("send_typing"):
+        await context.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
 
 
-async def _build_snapshot(address: str, *, include_query: bool) -> ServerSnapshot:
-    server = await _lookup_server(address)
-    status = await _fetch_status(server)
+def _start_typing(update: Update, context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> None:
+    """Send the typing action in the background so the probe is not held up by it."""
 
-    description = _clean_description(getattr(status, "description", None))
-    version_name = str(getattr(getattr(status, "version", None), "name", "Unknown"))
-    latency_ms = int(round(getattr(status, "latency", 0) or 0))
-    players = getattr(status, "players", None)
-    online = int(getattr(players, "online", 0) or 0)
-    maximum = int(getattr(players, "max", 0) or 0)
+    context.application.create_task(_send_typing(context, chat_id), update=update)
 
-    player_names: tuple[str, ...] = _extract_player_names_from_status(status)
-    query_available = False
-    query_error: str | None = None
 
+async def _build_snapshot(
+    address: str, *, include_query: bool, budget: Deadline | None = None
+) -> ServerSnapshot:
+    """Return a snapshot for ``address``, reusing a recent or in-flight probe from any chat.
+
+    Every phase only gets what is left of ``budget``; running out raises
+    :class:`DeadlineExceeded` naming the phase that was in progress.
+    """
+
+    if budget is None:
+        budget = Deadline(DEADLINES["players" if include_query else "status"])
+
+    tracing.tag(address=address)
+    with tracing.span("build_snapshot", address=address, include_query=include_query):
+        cached = _snapshot_cache.get(address, include_query=include_query)
+        if cached is None:
+            kind = "query" if include_query else "status"
+            key = (utils.normalize_address(address), kind)
+            tracing.annotate(cache="miss", joined=_probe_flights.in_flight(key))
+            cached = await _join_flight(
+                key, lambda: _probe_once_per_cluster(address, include_query=include_query, budget=budget), budget, kind
+            )
+        else:
+            tracing.annotate(cache="hit")
+            logger.debug("Snapshot cache hit for %s", address)
+
+    return cached if cached.address == address else replace(cached, address=address)
+
+
+async def _join_flight(key: tuple[str, str], factory, budget: Deadline, phase: str) -> Any:
+    """Await the shared probe for ``key``.
+
+    The caller that starts a probe is bounded by the phases inside it; callers
+    joining someone else's probe bound their wait by their own budget.
+    """
+
+    if _probe_flights.in_flight(key):
+        return await budget.run(phase, _probe_flights.run(key, factory))
+    return await _probe_flights.run(key, factory)
+
+
+def _shared_snapshot_key(address: str, include_query: bool) -> str:
+    return f"snapshot:{'query' if include_query else 'status'}:{utils.normalize_address(address)}"
+
+
+def _encode_shared_failure(exc: BaseException) -> str | None:
+    """Encode a failure worth replaying on other workers, or ``None``.
+
+    Timeouts are not shared: they depend on the budget of the caller that
+    hit them (a batch share can be a fraction of a second), not the server.
+    """
+
+    if isinstance(exc, breaker.CircuitOpenError):
+        kind = "breaker"
+    elif isinstance(exc, asyncio.TimeoutError):
+        return None
+    else:
+        kind = "offline"
+    data = {"error": kind, "detail": str(exc), "fetched_at": datetime.now(timezone.utc).isoformat()}
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _raise_shared_failure(address: str, data: dict[str, Any]) -> None:
+    """Fail the way the worker that probed ``address`` failed."""
+
+    if data.get("error") == "breaker":
+        raise breaker.CircuitOpenError(f"{address} is failing on another worker")
+    raise ConnectionError(f"{address} did not answer another worker's probe ({data.get('detail')})")
+
+
+async def _read_shared_snapshot(address: str, *, include_query: bool) -> ServerSnapshot | None:
+    """Return a fresh snapshot another worker stored, also caching it locally.
+
+    A failure another worker published for the same probe is raised again.
+    """
+
+    assert _shared is not None
+    # Like the local cache, a status+query snapshot also answers status lookups.
     if include_query:
+        candidates = ((True, SNAPSHOT_CACHE_QUERY_TTL),)
+    else:
+        candidates = ((False, SNAPSHOT_CACHE_STATUS_TTL), (True, min(SNAPSHOT_CACHE_STATUS_TTL, SNAPSHOT_CACHE_QUERY_TTL)))
+    for with_query, ttl in candidates:
+        payload = await _shared.get(_shared_snapshot_key(address, with_query))
+        if payload is None:
+            continue
         try:
-            query = await _fetch_query(server)
-            names = getattr(getattr(query, "players", None), "names", None)
-            if names:
-                player_names = tuple(sorted(str(name) for name in names))
-            query_available = True
-        except Exception as exc:  # pragma: no cover - network failures
-            query_error = f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
-            logger.info("Query failed for %s (%s)", address, query_error)
-            logger.debug("Query failure details for %s", address, exc_info=exc)
-            query_available = False
+            data = json.loads(payload)
+            if "error" in data:
+                age = (datetime.now(timezone.utc) - datetime.fromisoformat(data["fetched_at"])).total_seconds()
+                if with_query == include_query and age < SHARED_NEGATIVE_TTL:
+                    tracing.annotate(shared="negative_hit")
+                    _raise_shared_failure(address, data)
+                continue
+            snapshot = _snapshot_from_dict(data)
+        except (TypeError, ValueError, KeyError, AttributeError) as exc:
+            logger.debug("Ignoring unreadable shared snapshot for %s (%s)", address, exc)
+            continue
+        age = (datetime.now(timezone.utc) - snapshot.fetched_at).total_seconds()
+        if age < ttl:
+            _snapshot_cache.put(address, snapshot, include_query=with_query, age=age)
+            return snapshot
+    return None
+
+
+async def _probe_once_per_cluster(address: str, *, include_query: bool, budget: Deadline) -> ServerSnapshot:
+    """Probe ``address`` unless another worker already has, or is about to have, the result.
+
+    The worker that wins the shared lease probes and publishes its snapshot,
+    or for ``SHARED_NEGATIVE_TTL`` seconds how it failed (unreachable or
+    breaker open; timeouts are not shared); the others poll
+    the shared cache until either appears or the lease is gone. Without a
+    shared cache this is just the probe.
+    """
+
+    probe = _probe_query_snapshot if include_query else _probe_status_snapshot
+    if _shared is None:
+        return await probe(address, budget)
+
+    kind = "query" if include_query else "status"
+    snapshot = await _read_shared_snapshot(address, include_query=include_query)
+    if snapshot is not None:
+        tracing.annotate(shared="hit")
+        return snapshot
+
+    key = _shared_snapshot_key(address, include_query)
+    lease = f"probe:{key}"
+    # A holder that dies stops blocking the others once one probe's time is up.
+    lease_ttl = min(budget.remaining(), DEADLINES["players" if include_query else "status"])
+    while not await _shared.claim(lease, lease_ttl):
+        tracing.annotate(shared="wait")
+        await budget.run(kind, asyncio.sleep(SHARED_PROBE_POLL))
+        snapshot = await _read_shared_snapshot(address, include_query=include_query)
+        if snapshot is not None:
+            return snapshot
+        lease_ttl = min(budget.remaining(), DEADLINES["players" if include_query else "status"])
+
+    tracing.annotate(shared="probe")
+    # Publish before releasing the lease so waiters never probe again.
+    try:
+        snapshot = await probe(address, budget)
+    except Exception as exc:
+        failure = _encode_shared_failure(exc)
+        if failure is not None:
+            await _shared.set(key, failure, SHARED_NEGATIVE_TTL)
+        raise
+    else:
+        ttl = SNAPSHOT_CACHE_QUERY_TTL if include_query else SNAPSHOT_CACHE_STATUS_TTL
+        payload = json.dumps(_snapshot_to_dict(snapshot), ensure_ascii=False, separators=(",", ":"))
+        await _shared.set(key, payload, ttl)
+    finally:
+        await _shared.release(lease)
+    return snapshot
+
+
+async def _resolve_shared(address: str, budget: Deadline) -> resolver.ResolvedEndpoint:
+    return await _join_flight(
+        (utils.normalize_address(address), "lookup"), lambda: _lookup_server(address, budget), budget, "lookup"
+    )
+
+
+async def _probe_status_snapshot(address: str, budget: Deadline) -> ServerSnapshot:
+    """Resolve ``address`` and ping it; the status leg shared by every probe."""
+
+    try:
+        async with _status_breaker.guard(utils.normalize_address(address)):
+            endpoint = await _resolve_shared(address, budget)
+            status = await _fetch_status(endpoint, budget)
+    except breaker.CircuitOpenError:
+        raise
+    except Exception:
+        _history.record(address, None)
+        raise
+
+    snapshot = ServerSnapshot(
+        address=address,
+        fetched_at=datetime.now(timezone.utc),
+        description=_clean_description(status.description),
+        version_name=status.version_name,
+        latency_ms=int(round(status.latency)),
+        players_online=status.players_online,
+        players_max=status.players_max,
+        player_names=status.player_names,
+        query_available=False,
+        query_error=None,
+    )
+    _snapshot_cache.put(address, snapshot, include_query=False)
+    _history.record(address, snapshot.latency_ms, snapshot.players_online)
+    return snapshot
+
 
+async def _query_leg(address: str, budget: Deadline) -> tuple[object, int]:
+    """Run the GS4 query once the endpoint is known; returns the response and its latency."""
+
+    endpoint = await _resolve_shared(address, budget)
+    async with _query_breaker.guard(utils.normalize_address(address)):
+        started = time.perf_counter()
+        query = await _fetch_query(endpoint, budget)
+    return query, int(round((time.perf_counter() - started) * 1000))
+
+
+def _snapshot_from_query(address: str, query: object, latency_ms: int) -> ServerSnapshot:
+    """Build a snapshot from a query response alone, used when the status leg failed."""
+
+    players = getattr(query, "players", None)
+    motd = getattr(query, "motd", None)
+    raw_description = motd.to_minecraft() if hasattr(motd, "to_minecraft") else motd
     return ServerSnapshot(
         address=address,
         fetched_at=datetime.now(timezone.utc),
-        description=description,
-        version_name=version_name,
+        description=_clean_description(raw_description),
+        version_name=str(getattr(getattr(query, "software", None), "version", "Unknown")),
         latency_ms=latency_ms,
-        players_online=online,
-        players_max=maximum,
-        player_names=player_names,
-        query_available=query_available,
-        query_error=query_error,
+        players_online=int(getattr(players, "online", 0) or 0),
+        players_max=int(getattr(players, "max", 0) or 0),
+        player_names=tuple(),
+        query_available=False,
+        query_error=None,
+    )
+
+
+async def _probe_query_snapshot(address: str, budget: Deadline) -> ServerSnapshot:
+    """Run the status and query legs side by side and merge whatever finished in time."""
+
+    key = utils.normalize_address(address)
+    if _status_breaker.is_open(key):
+        raise breaker.CircuitOpenError(f"{key} failed recently; retrying after the breaker cools down")
+
+    status_task = asyncio.ensure_future(
+        _join_flight(
+            (key, "status"), lambda: _probe_once_per_cluster(address, include_query=False, budget=budget), budget, "status"
+        )
     )
+    query_task = asyncio.ensure_future(_query_leg(address, budget))
+    try:
+        await asyncio.wait((status_task, query_task))
+    finally:
+        # asyncio.wait leaves its tasks running when the caller is cancelled.
+        # The status leg only waits on a shielded shared probe, which keeps going for its other callers.
+        status_task.cancel()
+        query_task.cancel()
+
+    query_error: str | None = None
+    query_exc = query_task.exception()
+    if isinstance(query_exc, DeadlineExceeded):
+        query_error = "Query timed out"
+    elif isinstance(query_exc, breaker.CircuitOpenError):
+        query_error = "Query failed recently, not retried yet"
+    elif query_exc is not None:
+        query_error = f"{type(query_exc).__name__}: {query_exc}" if str(query_exc) else type(query_exc).__name__
+        logger.info("Query failed for %s (%s)", address, query_error)
+        logger.debug("Query failure details for %s", address, exc_info=query_exc)
+
+    status_exc = status_task.exception()
+    if status_exc is None:
+        snapshot = status_task.result()
+    elif query_error is None:
+        logger.info("Status failed for %s, using query data (%s)", address, status_exc)
+        snapshot = _snapshot_from_query(address, *query_task.result())
+    else:
+        raise status_exc
+
+    if query_error is not None:
+        snapshot = replace(snapshot, query_available=False, query_error=query_error)
+    else:
+        query, _ = query_task.result()
+        names = getattr(getattr(query, "players", None), "names", None)
+        if names:
+            snapshot = replace(snapshot, player_names=tuple(sorted(str(name) for name in names)))
+        snapshot = replace(snapshot, query_available=True)
+
+    _snapshot_cache.put(address, snapshot, include_query=True)
+    return snapshot
 
 
 def _format_player_names(names: Sequence[str]) -> str:
@@ -382,6 +1053,18 @@ def _capacity_info(online: int, max_players: int) -> str:
 
 
 def _status_message(snapshot: ServerSnapshot) -> str:
+    return _render_cache.render(snapshot, "status", _render_status_message)
+
+
+def _players_message(snapshot: ServerSnapshot) -> str:
+    return _render_cache.render(snapshot, "players", _render_players_message)
+
+
+def _players_fallback_message(snapshot: ServerSnapshot) -> str:
+    return _render_cache.render(snapshot, "players_fallback", _render_players_fallback_message)
+
+
+def _render_status_message(snapshot: ServerSnapshot) -> str:
     safe_address = escape_markdown(snapshot.address, version=1)
     
     desc_lines = [line.strip() for line in snapshot.description.split("\n") if line.strip()]
@@ -408,7 +1091,7 @@ def _status_message(snapshot: ServerSnapshot) -> str:
     return _message_with_affiliate_hint(base)
 
 
-def _players_message(snapshot: ServerSnapshot) -> str:
+def _render_players_message(snapshot: ServerSnapshot) -> str:
     safe_address = escape_markdown(snapshot.address, version=1)
     capacity = _capacity_info(snapshot.players_online, snapshot.players_max)
     
@@ -435,7 +1118,7 @@ def _players_message(snapshot: ServerSnapshot) -> str:
     return _players_fallback_message(snapshot)
 
 
-def _players_fallback_message(snapshot: ServerSnapshot) -> str:
+def _render_players_fallback_message(snapshot: ServerSnapshot) -> str:
     safe_address = escape_markdown(snapshot.address, version=1)
     capacity = _capacity_info(snapshot.players_online, snapshot.players_max)
     
@@ -460,34 +1143,207 @@ def _players_fallback_message(snapshot: ServerSnapshot) -> str:
 
 
 
+def _parse_address_args(args: Sequence[str]) -> list[str]:
+    """Split command arguments (spaces or commas) into unique addresses, keeping order."""
+
+    addresses: list[str] = []
+    seen: set[str] = set()
+    for arg in args:
+        for address in arg.split(","):
+            address = address.strip()
+            if not address:
+                continue
+            key = utils.normalize_address(address) if utils.is_valid_server_address(address) else address
+            if key not in seen:
+                seen.add(key)
+                addresses.append(address)
+    return addresses
+
+
+async def _build_batch(
+    addresses: Sequence[str], budget: Deadline
+) -> list[tuple[str, ServerSnapshot | BatchMiss]]:
+    """Probe every address concurrently, at most ``BATCH_CONCURRENCY`` at a time.
+
+    Each probe gets its own deadline: an equal share of what is left of
+    ``budget`` among the rounds still to run, capped at the single-server
+    status deadline. A slow or unreachable server therefore cannot use up
+    the time of the addresses queued behind it.
+    """
+
+    concurrency = max(1, BATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    unfinished = len(addresses)
+
+    async def probe(address: str) -> tuple[str, ServerSnapshot | BatchMiss]:
+        nonlocal unfinished
+        async with semaphore:
+            try:
+                remaining = budget.remaining()
+                if remaining <= 0:
+                    return address, BatchMiss.SKIPPED
+                rounds = -(-unfinished // concurrency)
+                share = Deadline(min(DEADLINES["status"], remaining / rounds))
+                return address, await _build_snapshot(address, include_query=False, budget=share)
+            except DeadlineExceeded as exc:
+                logger.info("Batch probe timed out for %s (%s)", address, exc)
+                return address, BatchMiss.TIMEOUT
+            except breaker.CircuitOpenError:
+                return address, BatchMiss.SKIPPED
+            except Exception as exc:  # pragma: no cover - network failures
+                logger.info("Batch probe failed for %s (%s)", address, exc)
+                return address, BatchMiss.OFFLINE
+            finally:
+                unfinished -= 1
+
+    return list(await asyncio.gather(*(probe(address) for address in addresses)))
+
+
+_BATCH_MISS_ICONS = {BatchMiss.OFFLINE: "🔴", BatchMiss.TIMEOUT: "🟡", BatchMiss.SKIPPED: "⚪"}
+
+
+def _batch_message(results: Sequence[tuple[str, ServerSnapshot | BatchMiss]], ignored: int = 0) -> str:
+    online = sum(1 for _, snapshot in results if isinstance(snapshot, ServerSnapshot))
+    unknown = sum(1 for _, snapshot in results if snapshot in (BatchMiss.TIMEOUT, BatchMiss.SKIPPED))
+    rows: list[str] = []
+    for address, snapshot in results:
+        name = address if len(address) <= BATCH_ADDRESS_WIDTH else f"{address[: BATCH_ADDRESS_WIDTH - 1]}…"
+        name = name.ljust(BATCH_ADDRESS_WIDTH)
+        if isinstance(snapshot, ServerSnapshot):
+            players = f"{snapshot.players_online}/{snapshot.players_max}"
+            rows.append(f"🟢 {name} {players:>9} {snapshot.latency_ms:>5} ms")
+        else:
+            rows.append(f"{_BATCH_MISS_ICONS[snapshot]} {name} {snapshot.value:>9}")
+
+    fetched = escape_markdown(datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC"), version=1)
+    table = "\n".join(rows)
+    notes = ""
+    if unknown:
+        notes += f"⏱ _{unknown} server(s) could not be checked in time; refresh to try again._\n"
+    if ignored:
+        notes += f"⚠️ _{ignored} more address(es) ignored; at most {BATCH_MAX_ADDRESSES} are checked at once._\n"
+    base = (
+        "📋 *SERVER OVERVIEW*\n"
+        f"📊 *Online:* `{online} / {len(results)}`\n\n"
+        f"```\n{table}\n```\n"
+        f"{notes}"
+        f"🕒 _Checked: {fetched}_"
+    )
+    return _message_with_affiliate_hint(base)
+
+
+@lru_cache(maxsize=8)
+def _markup_payload(reply_markup: InlineKeyboardMarkup) -> str:
+    return json.dumps(reply_markup.to_dict(), sort_keys=True, separators=(",", ":"))
+
+
+def _render_digest(text: str, reply_markup: InlineKeyboardMarkup | None) -> str:
+    """Stable fingerprint of what a message shows, comparable across restarts."""
+
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=12)
+    if reply_markup is not None:
+        digest.update(b"\0")
+        digest.update(_markup_payload(reply_markup).encode("utf-8"))
+    return digest.hexdigest()
+
+
+async def _edit_if_changed(
+    query: CallbackQuery,
+    chat_id: int,
+    message_id: int,
+    previous: str | None,
+    text: str,
+    *,
+    reply_markup: InlineKeyboardMarkup | None = None,
+    disable_web_page_preview: bool | None = True,
+) -> bool:
+    """Edit the callback's message unless it already shows ``text`` and ``reply_markup``.
+
+    ``previous`` is the digest recorded for the message, if any. Returns
+    whether an edit was sent; either way the new digest is remembered.
+    """
+
+    rendered = _render_digest(text, reply_markup)
+    changed = rendered != previous
+    if changed:
+        with tracing.span("edit_message"):
+            try:
+                await query.edit_message_text(
+                    text, reply_markup=reply_markup, disable_web_page_preview=disable_web_page_preview
+                )
+            except BadRequest as exc:
+                # Messages sent before digests were recorded can still be unchanged.
+                if "Message is not modified" not in str(exc):
+                    raise
+                changed = False
+                tracing.annotate(branch="not_modified")
+
+    _remember_render(chat_id, message_id, rendered)
+    return changed
+
+
+async def _answer_refresh(query: CallbackQuery, changed: bool) -> None:
+    if changed:
+        await query.answer()
+    else:
+        await query.answer(NO_CHANGE_TOAST)
+
+
+async def _send_batch_status(
+    context: ContextTypes.DEFAULT_TYPE, chat_id: int, addresses: Sequence[str], *, ignored: int = 0
+) -> None:
+    results = await _build_batch(addresses, Deadline(DEADLINES["batch"]))
+    text = _batch_message(results, ignored)
+    reply_markup = build_main_keyboard()
+    with tracing.span("send_message"):
+        message = await context.bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            reply_markup=reply_markup,
+            disable_web_page_preview=True,
+        )
+    _store_message_snapshot(
+        chat_id, message.message_id, None, addresses=addresses, rendered=_render_digest(text, reply_markup)
+    )
+    online = sum(1 for _, snapshot in results if isinstance(snapshot, ServerSnapshot))
+    logger.info("/status batch of %d servers, %d online", len(results), online)
+
+
 async def _send_status_message(
     context: ContextTypes.DEFAULT_TYPE, chat_id: int, snapshot: ServerSnapshot
 ) -> None:
-    message = await context.bot.send_message(
-        chat_id=chat_id,
-        text=_status_message(snapshot),
-        reply_markup=build_main_keyboard(),
-        disable_web_page_preview=True,
-    )
-    _store_message_snapshot(context, message.message_id, snapshot)
+    text = _status_message(snapshot)
+    reply_markup = build_main_keyboard()
+    with tracing.span("send_message"):
+        message = await context.bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            reply_markup=reply_markup,
+            disable_web_page_preview=True,
+        )
+    _store_message_snapshot(chat_id, message.message_id, snapshot, rendered=_render_digest(text, reply_markup))
 
 
 async def _send_players_message(
     context: ContextTypes.DEFAULT_TYPE, chat_id: int, snapshot: ServerSnapshot
 ) -> None:
-    message = await context.bot.send_message(
-        chat_id=chat_id,
-        text=_players_message(snapshot),
-        reply_markup=build_main_keyboard(),
-        disable_web_page_preview=True,
-    )
-    _store_message_snapshot(context, message.message_id, snapshot)
+    text = _players_message(snapshot)
+    reply_markup = build_main_keyboard()
+    with tracing.span("send_message"):
+        message = await context.bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            reply_markup=reply_markup,
+            disable_web_page_preview=True,
+        )
+    _store_message_snapshot(chat_id, message.message_id, snapshot, rendered=_render_digest(text, reply_markup))
 
 
 # ==========================
 # Commands
 # ==========================
 
+@tracing.traced
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Usage: /start"""
 
@@ -496,18 +1352,17 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     chat_id = update.effective_chat.id
     _chat_data(context).clear()
+    _message_contexts.drop_chat(chat_id)
     await _send_typing(context, chat_id)
 
-    affiliate_button = _affiliate_button()
-    affiliate_markup = InlineKeyboardMarkup([[affiliate_button]]) if affiliate_button else None
-
     await update.message.reply_text(
         _message_with_affiliate_hint(WELCOME_TEXT),
-        reply_markup=affiliate_markup,
+        reply_markup=_affiliate_markup(),
         disable_web_page_preview=True,
     )
 
 
+@tracing.traced
 async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Usage: /status <host[:port]>"""
 
@@ -515,25 +1370,33 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         return
 
     chat_id = update.effective_chat.id
-    await _send_typing(context, chat_id)
+    _start_typing(update, context, chat_id)
     logger.info("/status called")
 
     chat_data = _chat_data(context)
 
-    args = context.args or []
-    if len(args) != 1:
+    addresses = _parse_address_args(context.args or [])
+    if not addresses:
         _clear_last_context(chat_data)
         await error_incomplete(context, chat_id)
         logger.info("/status did not provide an address")
         return
 
-    address = args[0].strip()
-    if not utils.is_valid_server_address(address):
-        _clear_last_context(chat_data)
-        await error_url(context, chat_id, address)
-        logger.info("Invalid server address supplied for /status")
+    for address in addresses:
+        if not utils.is_valid_server_address(address):
+            _clear_last_context(chat_data)
+            await error_url(context, chat_id, address)
+            logger.info("Invalid server address supplied for /status")
+            return
+
+    if len(addresses) > 1:
+        await _send_batch_status(
+            context, chat_id, addresses[:BATCH_MAX_ADDRESSES], ignored=max(0, len(addresses) - BATCH_MAX_ADDRESSES)
+        )
         return
 
+    address = addresses[0]
+
     chat_data["last_address"] = address
     chat_data.pop("last_snapshot", None)
 
@@ -552,6 +1415,7 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     logger.info("/status %s online", address)
 
 
+@tracing.traced
 async def cmd_players(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Usage: /players <host[:port]>"""
 
@@ -559,7 +1423,7 @@ async def cmd_players(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         return
 
     chat_id = update.effective_chat.id
-    await _send_typing(context, chat_id)
+    _start_typing(update, context, chat_id)
     logger.info("/players called")
 
     chat_data = _chat_data(context)
@@ -596,13 +1460,573 @@ async def cmd_players(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     logger.info("/players %s online", address)
 
 
-# ==========================
+@tracing.traced
+async def cmd_statusall(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Usage: /statusall [host[:port] ...]
+
+    With addresses, saves them as this chat's server list; either way every
+    server on the saved list is checked and shown in one table.
+    """
+
+    if not update.effective_chat or not update.message:
+        return
+
+    chat_id = update.effective_chat.id
+    _start_typing(update, context, chat_id)
+    logger.info("/statusall called")
+
+    chat_data = _chat_data(context)
+    addresses = _parse_address_args(context.args or [])
+
+    for address in addresses:
+        if not utils.is_valid_server_address(address):
+            await error_url(context, chat_id, address)
+            logger.info("Invalid server address supplied for /statusall")
+            return
+
+    ignored = max(0, len(addresses) - BATCH_MAX_ADDRESSES)
+    if addresses:
+        chat_data[SAVED_ADDRESSES_KEY] = addresses[:BATCH_MAX_ADDRESSES]
+
+    saved = cast(list[str], chat_data.get(SAVED_ADDRESSES_KEY) or [])
+    if not saved:
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text=_message_with_affiliate_hint(STATUSALL_HINT_TEXT),
+            disable_web_page_preview=True,
+        )
+        logger.info("/statusall has no saved servers")
+        return
+
+    await _send_batch_status(context, chat_id, saved, ignored=ignored)
+
+
+# ==========================
+# Watches
+# ==========================
+
+def setup_watch(application: Application) -> None:
+    """Create the shared watch scheduler and drive it from the application's job queue.
+
+    With ``WATCH_DB`` set, subscriptions are kept in SQLite and restored here.
+    """
+
+    global _watch_scheduler, _watch_store
+
+    if application.job_queue is None:
+        logger.warning("Job queue unavailable; /watch is disabled")
+        return
+
+    bot = application.bot
+
+    async def notify(event: watch.WatchEvent[ServerSnapshot]) -> None:
+        await _deliver_watch_event(bot, event)
+
+    _watch_scheduler = watch.WatchScheduler(
+        _probe_for_watch,
+        notify,
+        interval=WATCH_INTERVAL,
+        jitter=WATCH_JITTER,
+        concurrency=WATCH_CONCURRENCY,
+        send_rate=WATCH_SEND_RATE,
+    )
+    application.job_queue.run_repeating(job_watch_tick, interval=WATCH_TICK, first=WATCH_TICK, name="watch")
+
+    if WATCH_DB:
+        _watch_store = persistence.SQLiteWatchStore(WATCH_DB)
+        _watch_store.open()
+        rows = _watch_store.load()
+        for chat_id, address, threshold in rows:
+            _watch_scheduler.subscribe(chat_id, address, threshold)
+        logger.info("Restored %d watches for %d servers from %s", len(rows), len(_watch_scheduler), _watch_store.path)
+
+
+async def job_watch_tick(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Start background probes for every watched server that is due."""
+
+    if _watch_scheduler is not None:
+        _watch_scheduler.tick()
+
+
+async def _probe_for_watch(address: str) -> ServerSnapshot:
+    return await _build_snapshot(address, include_query=False, budget=Deadline(DEADLINES["status"]))
+
+
+def _watch_event_message(event: watch.WatchEvent[ServerSnapshot]) -> str:
+    safe_address = escape_markdown(event.subscription.address, version=1)
+    snapshot = event.snapshot
+
+    if event.kind == watch.WENT_OFFLINE or snapshot is None:
+        return (
+            "🔴 *WATCHED SERVER OFFLINE*\n"
+            f"🌐 `{safe_address}`\n\n"
+            "⚙️ _The server stopped responding. You'll get a message when it is back._"
+        )
+
+    capacity = _capacity_info(snapshot.players_online, snapshot.players_max)
+    if event.kind == watch.CAME_ONLINE:
+        title = "🟢 *WATCHED SERVER BACK ONLINE*"
+    elif event.kind == watch.PLAYERS_ABOVE:
+        title = f"📈 *{event.subscription.threshold}+ PLAYERS ONLINE*"
+    else:
+        title = f"📉 *BELOW {event.subscription.threshold} PLAYERS*"
+
+    return f"{title}\n🌐 `{safe_address}`\n📊 *Online:* `{capacity}`"
+
+
+def _retry_after_seconds(exc: RetryAfter) -> float:
+    with warnings.catch_warnings():
+        # ``retry_after`` becomes a timedelta in a future python-telegram-bot.
+        warnings.simplefilter("ignore")
+        delay = exc.retry_after
+    return delay.total_seconds() if isinstance(delay, timedelta) else float(delay)
+
+
+async def _deliver_watch_event(bot: Any, event: watch.WatchEvent[ServerSnapshot]) -> None:
+    """Send one watch notification, retrying once after a flood wait or network error.
+
+    The state change is already recorded, so a notification that fails
+    twice is lost; a chat that blocked the bot or no longer exists loses its
+    watches instead.
+    """
+
+    chat_id = event.subscription.chat_id
+    text = _watch_event_message(event)
+    for attempt in range(2):
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, disable_web_page_preview=True)
+            return
+        except Forbidden:
+            break
+        except BadRequest as exc:
+            if "chat not found" not in exc.message.lower():
+                raise
+            break
+        except RetryAfter as exc:
+            delay = _retry_after_seconds(exc)
+            if attempt or delay > WATCH_INTERVAL:
+                raise
+            await asyncio.sleep(delay)
+        except NetworkError:
+            if attempt:
+                raise
+            await asyncio.sleep(WATCH_RETRY_DELAY)
+
+    removed = _watch_scheduler.unsubscribe_chat(chat_id) if _watch_scheduler else 0
+    if _watch_store is not None:
+        await _watch_store.delete_chat(chat_id)
+    logger.info("Dropped %d watches for chat %s, which blocked the bot or is gone", removed, chat_id)
+
+
+def _watch_list_message(subscriptions: Sequence[watch.Subscription]) -> str:
+    lines = ["👀 *WATCHED SERVERS*"]
+    for subscription in subscriptions:
+        line = f"• `{escape_markdown(subscription.address, version=1)}`"
+        if subscription.threshold is not None:
+            line += f" (alert at {subscription.threshold} players)"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+@tracing.traced
+async def cmd_watch(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Usage: /watch [host[:port] [players]]"""
+
+    if not update.effective_chat or not update.message:
+        return
+
+    chat_id = update.effective_chat.id
+    logger.info("/watch called")
+
+    if _watch_scheduler is None:
+        await update.message.reply_text("⚠️ _Watching servers is not available right now._")
+        return
+
+    args = context.args or []
+    if not args:
+        subscriptions = _watch_scheduler.subscriptions(chat_id)
+        text = _watch_list_message(subscriptions) if subscriptions else WATCH_HINT_TEXT
+        await update.message.reply_text(_message_with_affiliate_hint(text), disable_web_page_preview=True)
+        return
+
+    address = args[0].strip()
+    if not utils.is_valid_server_address(address):
+        await error_url(context, chat_id, address)
+        logger.info("Invalid server address supplied for /watch")
+        return
+
+    threshold: int | None = None
+    if len(args) > 1:
+        try:
+            threshold = max(1, int(args[1]))
+        except ValueError:
+            await update.message.reply_text(_message_with_affiliate_hint(WATCH_HINT_TEXT))
+            return
+
+    existing = _watch_scheduler.subscriptions(chat_id)
+    normalized = utils.normalize_address(address)
+    already_watched = any(utils.normalize_address(sub.address) == normalized for sub in existing)
+    if not already_watched and len(existing) >= WATCH_MAX_PER_CHAT:
+        await update.message.reply_text(
+            f"⚠️ _This chat already watches {WATCH_MAX_PER_CHAT} servers. Use /unwatch to free a slot._"
+        )
+        return
+
+    _watch_scheduler.subscribe(chat_id, address, threshold)
+    if _watch_store is not None:
+        await _watch_store.save(chat_id, address, threshold)
+    safe_address = escape_markdown(address, version=1)
+    detail = f" and alert at {threshold} players" if threshold is not None else ""
+    await update.message.reply_text(
+        f"👀 Watching `{safe_address}`{detail}.\nYou'll get a message when it goes offline or comes back.",
+        disable_web_page_preview=True,
+    )
+    logger.info("/watch added %s", address)
+
+
+@tracing.traced
+async def cmd_unwatch(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Usage: /unwatch <host[:port]>"""
+
+    if not update.effective_chat or not update.message:
+        return
+
+    logger.info("/unwatch called")
+    args = context.args or []
+    if _watch_scheduler is None or not args:
+        await update.message.reply_text(_message_with_affiliate_hint(WATCH_HINT_TEXT))
+        return
+
+    address = args[0].strip()
+    safe_address = escape_markdown(address, version=1)
+    if _watch_scheduler.unsubscribe(update.effective_chat.id, address):
+        if _watch_store is not None:
+            await _watch_store.delete(update.effective_chat.id, address)
+        await update.message.reply_text(f"✅ Stopped watching `{safe_address}`.")
+    else:
+        await update.message.reply_text(f"ℹ️ `{safe_address}` is not being watched in this chat.")
+
+
+# ==========================
+# History
+# ==========================
+
+def _format_span(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{max(minutes, 1)}m"
+
+
+def _history_message(address: str, series: history.Series, now: float) -> str:
+    times, latency, players = series.window()
+    since = times[0]
+    up = [value for value in latency if value != history.DOWN]
+    uptime = 100.0 * len(up) / len(latency)
+
+    latency_line = history.sparkline(
+        history.bucket_columns(times, latency, since=since, until=now, width=HISTORY_WIDTH, skip=history.DOWN)
+    )
+    players_line = history.sparkline(
+        history.bucket_columns(times, players, since=since, until=now, width=HISTORY_WIDTH)
+    )
+    latency_range = f"{min(up)}–{max(up)} ms" if up else "no replies"
+
+    return (
+        "📈 *SERVER HISTORY*\n"
+        f"🌐 `{escape_markdown(address, version=1)}`\n"
+        f"🕒 Last {_format_span(now - since)} · {len(times)} checks\n\n"
+        f"📶 `{latency_line}` {latency_range}\n"
+        f"👥 `{players_line}` peak {max(players)}\n"
+        f"🟢 *Uptime:* `{uptime:.1f}%`"
+    )
+
+
+@tracing.traced
+async def cmd_history(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Usage: /history <host[:port]>"""
+
+    if not update.effective_chat or not update.message:
+        return
+
+    chat_id = update.effective_chat.id
+    logger.info("/history called")
+
+    args = context.args or []
+    if not args:
+        await update.message.reply_text(_message_with_affiliate_hint(HISTORY_HINT_TEXT))
+        return
+
+    address = args[0].strip()
+    if not utils.is_valid_server_address(address):
+        await error_url(context, chat_id, address)
+        logger.info("Invalid server address supplied for /history")
+        return
+
+    series = _history.get(address)
+    if series is None or not len(series):
+        await update.message.reply_text(
+            f"ℹ️ No history for `{escape_markdown(address, version=1)}` yet. "
+            "Check it with /status or /watch it to start recording."
+        )
+        return
+
+    await update.message.reply_text(
+        _message_with_affiliate_hint(_history_message(address, series, time.time())),
+        disable_web_page_preview=True,
+    )
+
+
+def _uptime_message(address: str, window_text: str, report: history.Rollup) -> str:
+    lines = [
+        "📊 *UPTIME REPORT*",
+        f"🌐 `{escape_markdown(address, version=1)}`",
+        f"🕒 Last {window_text} · {_format_span(report.end - report.start)} recorded · {report.samples} checks",
+        "",
+        f"🟢 *Uptime:* `{100.0 * report.uptime:.2f}%`",
+    ]
+    if report.latency_mean is not None:
+        lines.append(
+            f"📶 *Latency:* `min {report.latency_min} · avg {report.latency_mean:.0f} · "
+            f"p95 {report.latency_p95} · max {report.latency_max} ms`"
+        )
+    lines.append(f"👥 *Peak players:* `{report.players_peak}`")
+    return "\n".join(lines)
+
+
+@tracing.traced
+async def cmd_uptime(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Usage: /uptime <host[:port]> [window]"""
+
+    if not update.effective_chat or not update.message:
+        return
+
+    chat_id = update.effective_chat.id
+    logger.info("/uptime called")
+
+    args = context.args or []
+    window_text = (args[1] if len(args) > 1 else UPTIME_DEFAULT_WINDOW).strip().lower()
+    window = utils.parse_duration(window_text)
+    if not args or window is None:
+        await update.message.reply_text(_message_with_affiliate_hint(UPTIME_HINT_TEXT))
+        return
+
+    address = args[0].strip()
+    if not utils.is_valid_server_address(address):
+        await error_url(context, chat_id, address)
+        logger.info("Invalid server address supplied for /uptime")
+        return
+
+    report = _history.summary(address, min(window, _history.retention))
+    if report is None:
+        await update.message.reply_text(
+            f"ℹ️ No history for `{escape_markdown(address, version=1)}` yet. "
+            "Check it with /status or /watch it to start recording."
+        )
+        return
+
+    await update.message.reply_text(
+        _message_with_affiliate_hint(_uptime_message(address, window_text, report)),
+        disable_web_page_preview=True,
+    )
+
+
+def setup_history(application: Application) -> None:
+    """Roll recorded probe history up into minute, hour and day buckets in the background."""
+
+    if application.job_queue is None:
+        logger.warning("Job queue unavailable; history reports will read raw samples only")
+        return
+
+    application.job_queue.run_repeating(
+        job_roll_up_history, interval=ROLLUP_INTERVAL, first=ROLLUP_INTERVAL, name="roll-up-history"
+    )
+
+
+async def job_roll_up_history(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Close finished rollup buckets for every server with history."""
+
+    closed = _history.roll_up()
+    logger.debug("Closed %d history rollup buckets", closed)
+
+
+# ==========================
+# Inline queries
+# ==========================
+
+_INLINE_TLD_PATTERN = re.compile(r"\.[a-z]{2,}$", re.IGNORECASE)
+
+
+def _inline_address(text: str) -> str | None:
+    """Return the address in an inline query once it looks fully typed, else ``None``.
+
+    ``play.exa`` passes too, but ``play.`` or ``pl`` do not, which skips most
+    keystroke-by-keystroke queries before any probe is considered.
+    """
+
+    parts = text.split()
+    if not parts or not utils.is_valid_server_address(parts[0]):
+        return None
+
+    address = parts[0]
+    host, _ = utils.parse_address(address)
+    if host.lower() == "localhost":
+        return address
+    try:
+        ipaddress.ip_address(host)
+        return address
+    except ValueError:
+        pass
+    return address if _INLINE_TLD_PATTERN.search(host.rstrip(".")) else None
+
+
+def _inline_results(address: str, snapshot: ServerSnapshot | None) -> list[InlineQueryResultArticle]:
+    normalized = utils.normalize_address(address)
+    no_preview = LinkPreviewOptions(is_disabled=True)
+
+    if snapshot is None:
+        safe_address = escape_markdown(address, version=1)
+        return [
+            InlineQueryResultArticle(
+                id=f"offline:{normalized}",
+                title=f"🔴 {address}",
+                description="Not responding",
+                input_message_content=InputTextMessageContent(
+                    _message_with_affiliate_hint(
+                        "🔴 *SERVER OFFLINE*\n"
+                        f"🌐 `{safe_address}`\n\n"
+                        "⚙️ _Could not connect to the Minecraft server. Verify the address or port._"
+                    ),
+                    link_preview_options=no_preview,
+                ),
+            )
+        ]
+
+    capacity = _capacity_info(snapshot.players_online, snapshot.players_max)
+    players_text = (
+        _players_message(snapshot)
+        if snapshot.query_available or snapshot.player_names
+        else _players_fallback_message(snapshot)
+    )
+    return [
+        InlineQueryResultArticle(
+            id=f"status:{normalized}",
+            title=f"🟢 {address}",
+            description=f"{capacity} players · {snapshot.latency_ms} ms · {snapshot.version_name}",
+            input_message_content=InputTextMessageContent(_status_message(snapshot), link_preview_options=no_preview),
+        ),
+        InlineQueryResultArticle(
+            id=f"players:{normalized}",
+            title=f"👥 Players on {address}",
+            description=f"{capacity} online",
+            input_message_content=InputTextMessageContent(players_text, link_preview_options=no_preview),
+        ),
+    ]
+
+
+async def _answer_inline(inline_query: InlineQuery, address: str, snapshot: ServerSnapshot | None) -> None:
+    try:
+        await inline_query.answer(_inline_results(address, snapshot), cache_time=INLINE_CACHE_TIME)
+    except BadRequest as exc:
+        # The user kept typing or closed the picker; the query id has expired.
+        logger.debug("Inline answer for %s dropped (%s)", address, exc)
+
+
+async def _refresh_inline_snapshot(address: str) -> None:
+    try:
+        await _build_snapshot(address, include_query=False, budget=Deadline(DEADLINES["inline"]))
+    except Exception as exc:
+        logger.debug("Background inline refresh failed for %s (%s)", address, exc)
+
+
+async def _probe_and_answer_inline(
+    inline_query: InlineQuery, user_data: dict[str, Any], address: str
+) -> None:
+    await asyncio.sleep(INLINE_DEBOUNCE)
+    if user_data.get(INLINE_QUERY_KEY) != inline_query.id:
+        return  # superseded by a newer keystroke
+
+    try:
+        snapshot: ServerSnapshot | None = await _build_snapshot(
+            address, include_query=False, budget=Deadline(DEADLINES["inline"])
+        )
+    except Exception as exc:
+        logger.info("Inline probe failed for %s (%s)", address, exc)
+        snapshot = None
+
+    if user_data.get(INLINE_QUERY_KEY) == inline_query.id:
+        await _answer_inline(inline_query, address, snapshot)
+
+
+@tracing.traced
+async def inline_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Usage: @bot <host[:port]>
+
+    Answers straight from the freshest cached snapshot (refreshing it in the
+    background when stale); only an uncached address is probed, after a short
+    debounce so intermediate keystrokes are dropped.
+    """
+
+    inline_query = update.inline_query
+    if inline_query is None:
+        return
+
+    address = _inline_address(inline_query.query)
+    if address is None:
+        return
+
+    user_data = cast(dict[str, Any], context.user_data)
+    user_data[INLINE_QUERY_KEY] = inline_query.id
+
+    latest = _snapshot_cache.latest(address)
+    if latest is not None:
+        age, snapshot = latest
+        in_flight = _probe_flights.in_flight((utils.normalize_address(address), "status"))
+        if age >= SNAPSHOT_CACHE_STATUS_TTL and not in_flight:
+            context.application.create_task(_refresh_inline_snapshot(address), update=update)
+        if snapshot.address != address:
+            snapshot = replace(snapshot, address=address)
+        await _answer_inline(inline_query, address, snapshot)
+        return
+
+    context.application.create_task(_probe_and_answer_inline(inline_query, user_data, address), update=update)
+
+
+# ==========================
 # Callbacks
 # ==========================
 
-async def cb_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle the 'Status' inline button press."""
-    logger.info("Callback status called")
+async def _refresh_batch_status(
+    query: CallbackQuery,
+    chat_id: int,
+    message_id: int,
+    addresses: Sequence[str],
+    previous: str | None,
+    cooling: bool,
+) -> None:
+    if cooling:
+        await query.answer(NO_CHANGE_TOAST)
+        return
+
+    results = await _build_batch(addresses, Deadline(DEADLINES["callback"]))
+
+    _store_message_snapshot(chat_id, message_id, None, addresses=addresses, rendered=previous)
+    changed = await _edit_if_changed(
+        query, chat_id, message_id, previous, _batch_message(results), reply_markup=build_main_keyboard()
+    )
+    await _answer_refresh(query, changed)
+
+
+async def _gated_refresh(update: Update, context: ContextTypes.DEFAULT_TYPE, refresh) -> None:
+    """Run ``refresh`` for the pressed message, telling it whether the message is cooling down.
+
+    Presses on one chat already run one at a time, so presses made while a
+    refresh runs arrive right after it and reuse its result.
+    """
 
     query = update.callback_query
     if not query or not update.effective_chat:
@@ -613,9 +2037,38 @@ async def cb_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await query.answer()
         return
 
-    message_id = message.message_id
+    chat_id = update.effective_chat.id
+    key = (chat_id, message.message_id)
+    cooling = _refresh_gate.press(key)
+    try:
+        await refresh(update, context, query, chat_id, message.message_id, cooling)
+    finally:
+        _refresh_gate.finish(key)
+
+
+@tracing.traced
+async def cb_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle the 'Status' inline button press."""
+    logger.info("Callback status called")
+    await _gated_refresh(update, context, _refresh_status)
+
+
+async def _refresh_status(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    query: CallbackQuery,
+    chat_id: int,
+    message_id: int,
+    cooling: bool,
+) -> None:
     chat_data = _chat_data(context)
-    entry = _get_message_context(context, message_id)
+    await _load_message_context(chat_id)
+    entry = _get_message_context(chat_id, message_id)
+    if entry and entry.addresses:
+        await _refresh_batch_status(query, chat_id, message_id, entry.addresses, entry.rendered, cooling)
+        return
+
+    previous_render = entry.rendered if entry else None
     if entry:
         address = entry.address
         previous_snapshot = entry.snapshot
@@ -626,78 +2079,76 @@ async def cb_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not address:
         chat_data.pop("last_address", None)
         chat_data.pop("last_snapshot", None)
-        try:
-            await query.edit_message_text(
-                _message_with_affiliate_hint(STATUS_HINT_TEXT),
-                reply_markup=build_main_keyboard(),
-                disable_web_page_preview=True,
-            )
-        except BadRequest as exc:
-            if "Message is not modified" in str(exc):
-                await asyncio.sleep(0.5)
-            else:
-                raise
-        _store_message_snapshot(context, message_id, None, address=None)
-        await query.answer()
+        _store_message_snapshot(chat_id, message_id, None, address=None, rendered=previous_render)
+        changed = await _edit_if_changed(
+            query,
+            chat_id,
+            message_id,
+            previous_render,
+            _message_with_affiliate_hint(STATUS_HINT_TEXT),
+            reply_markup=build_main_keyboard(),
+        )
+        await _answer_refresh(query, changed)
         return
 
     fallback_notice: str | None = None
 
     try:
-        snapshot = await _build_snapshot(address, include_query=False)
-        _store_message_snapshot(context, message_id, snapshot)
+        if cooling and previous_snapshot is not None:
+            snapshot = previous_snapshot  # refreshed moments ago; don't probe again
+        else:
+            snapshot = await _build_snapshot(
+                address, include_query=False, budget=Deadline(DEADLINES["callback"])
+            )
+        _store_message_snapshot(chat_id, message_id, snapshot, rendered=previous_render)
         chat_data["last_snapshot"] = snapshot
         chat_data["last_address"] = snapshot.address
     except Exception as exc:  # pragma: no cover - network failures
         logger.exception(exc)
         if previous_snapshot:
             snapshot = previous_snapshot
-            _store_message_snapshot(context, message_id, snapshot)
+            _store_message_snapshot(chat_id, message_id, snapshot, rendered=previous_render)
             chat_data["last_snapshot"] = snapshot
             chat_data["last_address"] = snapshot.address
             fallback_notice = "⚠️ _Showing cached data because the server timed out._"
         else:
-            await error_status_edit(update, context, address)
-            await query.answer()
+            changed = await error_status_edit(update, context, address, previous_render)
+            await _answer_refresh(query, changed)
             return
 
-    try:
-        message_text = _status_message(snapshot)
-        if fallback_notice:
-            message_text = f"{message_text}\n\n{fallback_notice}"
-
-        await query.edit_message_text(
-            message_text,
-            reply_markup=build_main_keyboard(),
-            disable_web_page_preview=True,
-        )
-    except BadRequest as exc:
-        if "Message is not modified" in str(exc):
-            await asyncio.sleep(0.5)
-            await query.answer()
-            return
-        else:
-            raise
+    message_text = _status_message(snapshot)
+    if fallback_notice:
+        message_text = f"{message_text}\n\n{fallback_notice}"
 
-    await query.answer()
+    changed = await _edit_if_changed(
+        query, chat_id, message_id, previous_render, message_text, reply_markup=build_main_keyboard()
+    )
+    await _answer_refresh(query, changed)
 
 
+@tracing.traced
 async def cb_players(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle the 'Players' inline button press."""
     logger.info("Callback players called")
+    await _gated_refresh(update, context, _refresh_players)
 
-    query = update.callback_query
-    if not query or not update.effective_chat:
-        return
 
-    message = query.message
-    if not message:
-        await query.answer()
+async def _refresh_players(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    query: CallbackQuery,
+    chat_id: int,
+    message_id: int,
+    cooling: bool,
+) -> None:
+    chat_data = _chat_data(context)
+    await _load_message_context(chat_id)
+    entry = _get_message_context(chat_id, message_id)
+    if entry and entry.addresses:
+        await query.answer("Use /players with one server to list its players.")
         return
 
-    message_id = message.message_id
-    chat_data = _chat_data(context)
-    entry = _get_message_context(context, message_id)
+    previous_render = entry.rendered if entry else None
     if entry:
         address = entry.address
         previous_snapshot = entry.snapshot
@@ -708,24 +2159,31 @@ async def cb_players(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     if not address:
         chat_data.pop("last_address", None)
         chat_data.pop("last_snapshot", None)
-        try:
-            await query.edit_message_text(
-                _message_with_affiliate_hint(PLAYERS_HINT_TEXT),
-                reply_markup=build_main_keyboard(),
-                disable_web_page_preview=True,
-            )
-        except BadRequest as exc:
-            if "Message is not modified" in str(exc):
-                await asyncio.sleep(0.5)
-            else:
-                raise
-        _store_message_snapshot(context, message_id, None, address=None)
-        await query.answer()
+        _store_message_snapshot(chat_id, message_id, None, address=None, rendered=previous_render)
+        changed = await _edit_if_changed(
+            query,
+            chat_id,
+            message_id,
+            previous_render,
+            _message_with_affiliate_hint(PLAYERS_HINT_TEXT),
+            reply_markup=build_main_keyboard(),
+        )
+        await _answer_refresh(query, changed)
         return
 
+    # Only a snapshot from a players refresh (query attempted) can be reused.
+    reusable = previous_snapshot is not None and (
+        previous_snapshot.query_available or previous_snapshot.query_error is not None
+    )
+
     try:
-        snapshot = await _build_snapshot(address, include_query=True)
-        _store_message_snapshot(context, message_id, snapshot)
+        if cooling and reusable:
+            snapshot = cast(ServerSnapshot, previous_snapshot)
+        else:
+            snapshot = await _build_snapshot(
+                address, include_query=True, budget=Deadline(DEADLINES["callback"])
+            )
+        _store_message_snapshot(chat_id, message_id, snapshot, rendered=previous_render)
         chat_data["last_snapshot"] = snapshot
         chat_data["last_address"] = snapshot.address
         message_text = _players_message(snapshot)
@@ -740,32 +2198,22 @@ async def cb_players(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
                 query_available=False,
                 query_error=error_detail,
             )
-            _store_message_snapshot(context, message_id, snapshot)
+            _store_message_snapshot(chat_id, message_id, snapshot, rendered=previous_render)
             chat_data["last_snapshot"] = snapshot
             chat_data["last_address"] = snapshot.address
             message_text = _players_fallback_message(snapshot)
         else:
-            await error_players_edit(update, context, address)
-            await query.answer()
-            return
-
-    try:
-        await query.edit_message_text(
-            message_text,
-            reply_markup=build_main_keyboard(),
-            disable_web_page_preview=True,
-        )
-    except BadRequest as exc:
-        if "Message is not modified" in str(exc):
-            await asyncio.sleep(0.5)
-            await query.answer()
+            changed = await error_players_edit(update, context, address, previous_render)
+            await _answer_refresh(query, changed)
             return
-        else:
-            raise
 
-    await query.answer()
+    changed = await _edit_if_changed(
+        query, chat_id, message_id, previous_render, message_text, reply_markup=build_main_keyboard()
+    )
+    await _answer_refresh(query, changed)
 
 
+@tracing.traced
 async def cb_about(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle the 'About' inline button press."""
     logger.info("Callback about called")
@@ -774,20 +2222,24 @@ async def cb_about(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not query:
         return
 
-    try:
-        await query.edit_message_text(
-            _message_with_affiliate_hint(ABOUT_TEXT),
-            reply_markup=build_main_keyboard(),
-        )
-    except BadRequest as exc:
-        if "Message is not modified" in str(exc):
-            await asyncio.sleep(0.5)
-            await query.answer()
-        else:
-            raise
-
+    message = query.message
+    if not message:
+        await query.answer()
+        return
 
-    await query.answer()
+    chat_id, message_id = message.chat.id, message.message_id
+    await _load_message_context(chat_id)
+    entry = _get_message_context(chat_id, message_id)
+    changed = await _edit_if_changed(
+        query,
+        chat_id,
+        message_id,
+        entry.rendered if entry else None,
+        _message_with_affiliate_hint(ABOUT_TEXT),
+        reply_markup=build_main_keyboard(),
+        disable_web_page_preview=None,
+    )
+    await _answer_refresh(query, changed)
 
 # ==========================
 # Error helpers
@@ -807,53 +2259,63 @@ async def error_status(context: ContextTypes.DEFAULT_TYPE, chat_id: int, address
         ),
         reply_markup=build_main_keyboard(),
     )
-    _store_message_snapshot(context, message.message_id, None, address=None)
+    _store_message_snapshot(chat_id, message.message_id, None, address=None)
 
 
 async def error_status_edit(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, address: str
-) -> None:
-    if not update.callback_query:
-        return
+    update: Update, context: ContextTypes.DEFAULT_TYPE, address: str, previous: str | None = None
+) -> bool:
+    query = update.callback_query
+    if not query or not query.message:
+        return False
 
     safe_address = escape_markdown(address, version=1)
     chat_data = _chat_data(context)
     chat_data.pop("last_address", None)
     chat_data.pop("last_snapshot", None)
-    message = update.callback_query.message
-    await update.callback_query.edit_message_text(
-        text=_message_with_affiliate_hint(
+    chat_id, message_id = query.message.chat.id, query.message.message_id
+    _store_message_snapshot(chat_id, message_id, None, address=None, rendered=previous)
+    return await _edit_if_changed(
+        query,
+        chat_id,
+        message_id,
+        previous,
+        _message_with_affiliate_hint(
             "🔴 *SERVER OFFLINE*\n"
             f"🌐 `{safe_address}`\n\n"
             "⚙️ _Could not connect to the Minecraft server. Verify the address or port._"
         ),
         reply_markup=build_main_keyboard(),
+        disable_web_page_preview=None,
     )
-    if message:
-        _store_message_snapshot(context, message.message_id, None, address=None)
 
 
 async def error_players_edit(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, address: str
-) -> None:
-    if not update.callback_query:
-        return
+    update: Update, context: ContextTypes.DEFAULT_TYPE, address: str, previous: str | None = None
+) -> bool:
+    query = update.callback_query
+    if not query or not query.message:
+        return False
 
     safe_address = escape_markdown(address, version=1)
     chat_data = _chat_data(context)
     chat_data.pop("last_address", None)
     chat_data.pop("last_snapshot", None)
-    message = update.callback_query.message
-    await update.callback_query.edit_message_text(
-        text=_message_with_affiliate_hint(
+    chat_id, message_id = query.message.chat.id, query.message.message_id
+    _store_message_snapshot(chat_id, message_id, None, address=None, rendered=previous)
+    return await _edit_if_changed(
+        query,
+        chat_id,
+        message_id,
+        previous,
+        _message_with_affiliate_hint(
             "⚠️ *REQUEST FAILED*\n"
             f"🌐 `{safe_address}`\n\n"
             "⚙️ _Could not connect or server queries are disabled._"
         ),
         reply_markup=build_main_keyboard(),
+        disable_web_page_preview=None,
     )
-    if message:
-        _store_message_snapshot(context, message.message_id, None, address=None)
 
 
 async def error_url(context: ContextTypes.DEFAULT_TYPE, chat_id: int, address: str) -> None:
@@ -873,7 +2335,7 @@ async def error_url(context: ContextTypes.DEFAULT_TYPE, chat_id: int, address: s
         ),
         reply_markup=build_main_keyboard(),
     )
-    _store_message_snapshot(context, message.message_id, None, address=None)
+    _store_message_snapshot(chat_id, message.message_id, None, address=None)
 
 
 async def error_incomplete(context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> None:
@@ -890,7 +2352,7 @@ async def error_incomplete(context: ContextTypes.DEFAULT_TYPE, chat_id: int) ->
         ),
         reply_markup=build_main_keyboard(),
     )
-    _store_message_snapshot(context, message.message_id, None, address=None)
+    _store_message_snapshot(chat_id, message.message_id, None, address=None)
 
 
 
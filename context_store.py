@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Global, memory-bounded store for per-message inline button context.
+
+Entries live in one process-wide structure instead of each chat's
+``chat_data``: chats form an LRU list, and each chat holds an LRU of its
+messages, so every get/put/evict is O(1). Limits apply per chat (entry
+quota), globally (approximate byte budget) and over time (idle chats are
+dropped). Values that compare equal are interned so fifty chats showing
+the same cached snapshot hold one copy.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass, field
+from typing import Generic, TypeVar
+
+import metrics
+
+__all__ = ["MessageContextStore"]
+
+V = TypeVar("V")
+
+_EVICTIONS = metrics.Counter(
+    "mcstat_message_context_evictions_total",
+    "Message context entries evicted, by reason.",
+    ("reason",),
+)
+_ENTRIES = metrics.Gauge(
+    "mcstat_message_context_entries",
+    "Message context entries held in memory.",
+)
+_BYTES = metrics.Gauge(
+    "mcstat_message_context_bytes",
+    "Approximate bytes held by the message context store.",
+)
+_CHATS = metrics.Gauge(
+    "mcstat_message_context_chats",
+    "Chats with message context held in memory.",
+)
+
+# Fixed per-entry overhead: dict slots in two OrderedDicts plus the entry object.
+_ENTRY_OVERHEAD = 200
+
+
+@dataclass(slots=True)
+class _ChatContext(Generic[V]):
+    entries: OrderedDict[int, tuple[V, Hashable | None]] = field(default_factory=OrderedDict)
+    last_access: float = 0.0
+    loaded: bool = False
+
+
+class MessageContextStore(Generic[V]):
+    """Map ``(chat_id, message_id)`` to a value under per-chat, byte and idle limits.
+
+    ``intern_key`` returns a hashable identity for the part of a value worth
+    sharing (or ``None``), and ``size_of`` estimates the bytes of that shared
+    part; it is counted once no matter how many messages reference it.
+    """
+
+    def __init__(
+        self,
+        *,
+        per_chat_limit: int,
+        max_bytes: int,
+        idle_ttl: float,
+        intern_key: Callable[[V], Hashable | None],
+        intern: Callable[[V, V], V],
+        size_of: Callable[[V], int],
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.per_chat_limit = max(1, per_chat_limit)
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._intern_key = intern_key
+        self._intern = intern
+        self._size_of = size_of
+        self._clock = clock
+        self._chats: OrderedDict[int, _ChatContext[V]] = OrderedDict()
+        # intern key -> (canonical value, reference count, bytes)
+        self._interned: dict[Hashable, tuple[V, int, int]] = {}
+        self._entries = 0
+        self._bytes = 0
+
+        _ENTRIES.set_function(lambda: self._entries)
+        _BYTES.set_function(lambda: self._bytes)
+        _CHATS.set_function(lambda: len(self._chats))
+
+    def __len__(self) -> int:
+        return self._entries
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def _touch(self, chat_id: int, *, create: bool) -> _ChatContext[V] | None:
+        now = self._clock()
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if not create:
+                return None
+            chat = _ChatContext()
+            self._chats[chat_id] = chat
+        else:
+            self._chats.move_to_end(chat_id)
+        chat.last_access = now
+        self._evict_idle(now)
+        return chat
+
+    def get(self, chat_id: int, message_id: int) -> V | None:
+        chat = self._touch(chat_id, create=False)
+        if chat is None:
+            return None
+        item = chat.entries.get(message_id)
+        if item is None:
+            return None
+        chat.entries.move_to_end(message_id)
+        return item[0]
+
+    def put(self, chat_id: int, message_id: int, value: V) -> V:
+        """Store ``value`` and return the (possibly interned) value actually kept."""
+
+        chat = self._touch(chat_id, create=True)
+        assert chat is not None
+
+        previous = chat.entries.pop(message_id, None)
+        if previous is not None:
+            self._release(previous)
+
+        value, key = self._acquire(value)
+        chat.entries[message_id] = (value, key)
+        self._entries += 1
+        self._bytes += _ENTRY_OVERHEAD
+
+        while len(chat.entries) > self.per_chat_limit:
+            _, old = chat.entries.popitem(last=False)
+            self._release(old)
+            _EVICTIONS.inc("chat_quota")
+
+        self._enforce_budget(keep=chat_id)
+        return value
+
+    def is_loaded(self, chat_id: int) -> bool:
+        chat = self._chats.get(chat_id)
+        return bool(chat and chat.loaded)
+
+    def mark_loaded(self, chat_id: int) -> None:
+        chat = self._touch(chat_id, create=True)
+        assert chat is not None
+        chat.loaded = True
+
+    def backfill(self, chat_id: int, message_id: int, value: V) -> None:
+        """Add an older entry (e.g. loaded from disk) behind the chat's newer ones."""
+
+        chat = self._touch(chat_id, create=True)
+        assert chat is not None
+        if message_id in chat.entries or len(chat.entries) >= self.per_chat_limit:
+            return
+
+        value, key = self._acquire(value)
+        chat.entries[message_id] = (value, key)
+        chat.entries.move_to_end(message_id, last=False)
+        self._entries += 1
+        self._bytes += _ENTRY_OVERHEAD
+        self._enforce_budget(keep=chat_id)
+
+    def drop_chat(self, chat_id: int) -> None:
+        chat = self._chats.pop(chat_id, None)
+        if chat is not None:
+            for item in chat.entries.values():
+                self._release(item)
+
+    def _acquire(self, value: V) -> tuple[V, Hashable | None]:
+        key = self._intern_key(value)
+        if key is None:
+            return value, None
+
+        interned = self._interned.get(key)
+        if interned is None:
+            size = self._size_of(value)
+            self._interned[key] = (value, 1, size)
+            self._bytes += size
+            return value, key
+
+        canonical, refs, size = interned
+        self._interned[key] = (canonical, refs + 1, size)
+        return self._intern(value, canonical), key
+
+    def _release(self, item: tuple[V, Hashable | None]) -> None:
+        self._entries -= 1
+        self._bytes -= _ENTRY_OVERHEAD
+        key = item[1]
+        if key is None:
+            return
+        canonical, refs, size = self._interned[key]
+        if refs <= 1:
+            del self._interned[key]
+            self._bytes -= size
+        else:
+            self._interned[key] = (canonical, refs - 1, size)
+
+    def _enforce_budget(self, *, keep: int) -> None:
+        # Evict the oldest message of the least recently used chat until under
+        # budget. ``keep`` was just touched, so it is reached last and always
+        # retains the entry that was written.
+        while self._bytes > self.max_bytes and self._chats:
+            chat_id, chat = next(iter(self._chats.items()))
+            if chat_id == keep and len(chat.entries) <= 1:
+                break
+            if chat.entries:
+                _, old = chat.entries.popitem(last=False)
+                self._release(old)
+                _EVICTIONS.inc("memory")
+            if not chat.entries:
+                del self._chats[chat_id]
+
+    def _evict_idle(self, now: float) -> None:
+        while self._chats:
+            chat_id, chat = next(iter(self._chats.items()))
+            if now - chat.last_access < self.idle_ttl:
+                break
+            del self._chats[chat_id]
+            for item in chat.entries.values():
+                self._release(item)
+                _EVICTIONS.inc("idle")
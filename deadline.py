@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Request-scoped time budgets shared by every phase of a server probe."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+__all__ = ["Deadline", "DeadlineExceeded"]
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request budget ran out; ``phase`` names the step that was running."""
+
+    def __init__(self, phase: str, budget: float) -> None:
+        super().__init__(f"{phase} ran out of time ({budget:g}s budget)")
+        self.phase = phase
+        self.budget = budget
+
+
+class Deadline:
+    """An absolute point in time that every fallback of one request must finish by."""
+
+    __slots__ = ("budget", "expires_at", "_clock")
+
+    def __init__(self, budget: float, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self.budget = budget
+        self._clock = clock
+        self.expires_at = clock() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def check(self, phase: str) -> None:
+        """Raise :class:`DeadlineExceeded` for ``phase`` if no time is left."""
+
+        if self.expired:
+            raise DeadlineExceeded(phase, self.budget)
+
+    async def run(self, phase: str, awaitable: Awaitable[T]) -> T:
+        """Await ``awaitable`` with whatever budget is left, tagging a timeout with ``phase``."""
+
+        remaining = self.remaining()
+        if remaining <= 0.0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(phase, self.budget)
+
+        try:
+            return await asyncio.wait_for(awaitable, timeout=remaining)
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError as exc:
+            if self.expired:
+                raise DeadlineExceeded(phase, self.budget) from exc
+            raise
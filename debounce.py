@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Per-message cooldown for inline button presses.
+
+:class:`~dispatch.ChatOrderedUpdateProcessor` already runs one chat's
+updates one after another, so two refreshes of the same message never
+overlap: rapid presses queue behind the running refresh. What is left to
+coalesce is the queue itself. A press that arrives less than the cooldown
+after the message last finished refreshing is flagged, so the caller can
+answer from that result instead of probing again.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+import metrics
+
+__all__ = ["RefreshGate"]
+
+_PRESSES = metrics.Counter(
+    "mcstat_button_presses_total",
+    "Inline button presses by how they were handled.",
+    ("result",),
+)
+
+
+class RefreshGate:
+    """Remember when each message last finished refreshing."""
+
+    def __init__(
+        self,
+        *,
+        cooldown: float,
+        max_entries: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.cooldown = cooldown
+        self.max_entries = max(1, max_entries)
+        self._clock = clock
+        self._finished: OrderedDict[Hashable, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._finished)
+
+    def press(self, key: Hashable) -> bool:
+        """Return whether ``key`` finished refreshing less than the cooldown ago."""
+
+        finished_at = self._finished.get(key)
+        cooling = finished_at is not None and self._clock() - finished_at < self.cooldown
+        _PRESSES.inc("cooldown" if cooling else "started")
+        return cooling
+
+    def finish(self, key: Hashable) -> None:
+        """Record that the refresh of ``key`` is done; later presses cool down from now."""
+
+        self._finished[key] = self._clock()
+        self._finished.move_to_end(key)
+        while len(self._finished) > self.max_entries:
+            self._finished.popitem(last=False)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Concurrent update processing that keeps each chat's updates in order.
+
+:class:`ChatOrderedUpdateProcessor` lets up to ``UPDATE_CONCURRENCY``
+updates run at once, so one slow ``/players`` no longer holds up every other
+chat. Updates from the same chat (or, without a chat, the same user) still
+run one after another in arrival order, so ``chat_data`` and the per-chat
+message context are never raced. A chat waiting for its turn does not hold a
+worker.
+
+At most ``UPDATE_BACKLOG`` updates wait for a worker. Beyond that the
+processor is :attr:`~ChatOrderedUpdateProcessor.saturated`: the webhook
+answers ``503`` so Telegram delivers the update again later, and updates
+that still arrive (for example from polling) are dropped and counted.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import time
+from collections.abc import Awaitable
+from typing import Any
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+import metrics
+import utils
+
+__all__ = ["ChatOrderedUpdateProcessor", "ordering_key"]
+
+logger = logging.getLogger(__name__)
+
+UPDATE_CONCURRENCY = utils.env_int("UPDATE_CONCURRENCY", 32)  # updates processed at once, across chats
+UPDATE_BACKLOG = utils.env_int("UPDATE_BACKLOG", 1000)  # updates allowed to wait for a worker
+SHED_LOG_INTERVAL = 10.0  # seconds between "shedding load" warnings
+
+_IN_PROGRESS = metrics.Gauge(
+    "mcstat_updates_in_progress",
+    "Updates currently running a handler.",
+)
+_BACKLOG = metrics.Gauge(
+    "mcstat_update_backlog",
+    "Updates waiting for a worker or for an earlier update from the same chat.",
+)
+_SHED = metrics.Counter(
+    "mcstat_updates_shed_total",
+    "Updates refused because the backlog was full, by where (webhook = deferred to Telegram, processor = dropped).",
+    ("where",),
+)
+
+
+def ordering_key(update: object) -> int | None:
+    """The chat (or, without one, the user) whose updates must run in order."""
+
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return None
+
+
+class _ChatQueue:
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()  # FIFO: waiters are woken in arrival order
+        self.users = 0
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Run updates concurrently across chats and sequentially within one."""
+
+    __slots__ = ("_workers", "_capacity", "_admitted", "_running", "_chats", "_shed_since_log", "_last_shed_log")
+
+    def __init__(self, workers: int = UPDATE_CONCURRENCY, backlog: int = UPDATE_BACKLOG) -> None:
+        # Admission is decided in do_process_update; the base class semaphore
+        # must never block, or updates would pile up behind it without bound.
+        super().__init__(max_concurrent_updates=sys.maxsize)
+        workers = max(1, workers)
+        self._workers = asyncio.Semaphore(workers)
+        self._capacity = workers + max(0, backlog)
+        self._admitted = 0  # running + waiting
+        self._running = 0
+        self._chats: dict[int, _ChatQueue] = {}
+        self._shed_since_log = 0
+        self._last_shed_log = 0.0
+        _IN_PROGRESS.set_function(lambda: self._running)
+        _BACKLOG.set_function(lambda: self._admitted - self._running)
+
+    @property
+    def saturated(self) -> bool:
+        """Whether the backlog is full and new updates would be dropped."""
+
+        return self._admitted >= self._capacity
+
+    def defer(self) -> None:
+        """Count an update the webhook turned away because of :attr:`saturated`."""
+
+        _SHED.inc("webhook")
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        if self.saturated:
+            _SHED.inc("processor")
+            self._log_shed()
+            close = getattr(coroutine, "close", None)
+            if close is not None:
+                close()
+            return
+
+        key = ordering_key(update)
+        self._admitted += 1
+        try:
+            if key is None:
+                await self._run(coroutine)
+                return
+            chat = self._chats.get(key)
+            if chat is None:
+                chat = self._chats[key] = _ChatQueue()
+            chat.users += 1
+            try:
+                async with chat.lock:
+                    await self._run(coroutine)
+            finally:
+                chat.users -= 1
+                if chat.users == 0:
+                    del self._chats[key]
+        finally:
+            self._admitted -= 1
+
+    async def _run(self, coroutine: Awaitable[Any]) -> None:
+        async with self._workers:
+            self._running += 1
+            try:
+                await coroutine
+            finally:
+                self._running -= 1
+
+    def _log_shed(self) -> None:
+        self._shed_since_log += 1
+        now = time.monotonic()
+        if now - self._last_shed_log >= SHED_LOG_INTERVAL:
+            logger.warning(
+                "Update backlog full (%d waiting); dropped %d update(s)",
+                self._admitted - self._running,
+                self._shed_since_log,
+            )
+            self._shed_since_log = 0
+            self._last_shed_log = now
+
+    async def initialize(self) -> None:
+        """Nothing to set up; workers are plain tasks of the application."""
+
+    async def shutdown(self) -> None:
+        """Nothing to release; the application waits for running updates."""
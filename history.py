@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Compact per-server probe history.
+
+Each address gets a ring buffer of parallel ``array`` columns (timestamp,
+latency, players), so a sample costs a fixed 8 bytes and no Python object.
+A latency of :data:`DOWN` marks a probe that found the server unreachable.
+
+Raw samples are periodically rolled up into 1-minute buckets, minutes into
+hours and hours into days (min/max/mean/p95 latency, peak players and
+uptime), so long reports read a few hundred buckets instead of raw samples.
+"""
+
+from __future__ import annotations
+
+import math
+import operator
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+import metrics
+import utils
+
+__all__ = ["DOWN", "HistoryStore", "Rollup", "Series", "bucket_columns", "sparkline"]
+
+DOWN = 0xFFFF  # latency sentinel for an unreachable server
+_MAX_LATENCY = DOWN - 1
+_MAX_PLAYERS = 0xFFFF
+BYTES_PER_SAMPLE = 8  # uint32 timestamp + uint16 latency + uint16 players
+
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+SPARK_GAP = "·"
+
+_SAMPLES = metrics.Counter(
+    "mcstat_history_samples_total",
+    "Probe results appended to server history, by state.",
+    ("state",),
+)
+_SERIES = metrics.Gauge(
+    "mcstat_history_series",
+    "Servers with recorded history.",
+)
+_BYTES = metrics.Gauge(
+    "mcstat_history_bytes",
+    "Bytes held by history sample and rollup columns.",
+)
+_ROLLED_BUCKETS = metrics.Counter(
+    "mcstat_history_rollup_buckets_total",
+    "Rollup buckets closed, by resolution.",
+    ("resolution",),
+)
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+_RESOLUTIONS = (("minute", MINUTE), ("hour", HOUR), ("day", DAY))
+
+# Rollup bucket columns: start, samples, up samples, latency min/max/mean/p95, peak players.
+_BUCKET_TYPECODES = "IIIHHfHH"
+_BUCKET_BYTES = sum(array(code).itemsize for code in _BUCKET_TYPECODES)
+_P95 = 0.95
+
+
+@dataclass(frozen=True, slots=True)
+class Rollup:
+    """Summary of every sample between ``start`` and ``end``."""
+
+    start: int
+    end: int
+    samples: int
+    up: int
+    latency_min: int | None
+    latency_max: int | None
+    latency_mean: float | None
+    latency_p95: int | None
+    players_peak: int
+
+    @property
+    def uptime(self) -> float:
+        return self.up / self.samples if self.samples else 0.0
+
+
+def _summarize(columns: Sequence[Sequence[int]]) -> tuple[int, int, int, int, float, int, int]:
+    """Aggregate raw ``(latency, players)`` columns into one bucket with C-level builtins.
+
+    Sorting puts :data:`DOWN` samples last, so the up count, extremes, mean
+    and p95 all come from slices of one sorted list.
+    """
+
+    latency, players = columns
+    ordered = sorted(latency)
+    up = bisect_left(ordered, DOWN)
+    peak = max(players) if players else 0
+    if not up:
+        return len(ordered), 0, DOWN, 0, 0.0, 0, peak
+    p95 = ordered[max(0, math.ceil(_P95 * up) - 1)]
+    return len(ordered), up, ordered[0], ordered[up - 1], sum(ordered[:up]) / up, p95, peak
+
+
+def _merge(columns: Sequence[Sequence[float]]) -> tuple[int, int, int, int, float, int, int]:
+    """Combine bucket columns (without ``start``) into one bucket.
+
+    Everything is exact except p95, which is the up-weighted 95th percentile
+    of the children's p95 values.
+    """
+
+    counts, ups, mins, maxes, means, p95s, peaks = columns
+    count = int(sum(counts))
+    up = int(sum(ups))
+    peak = int(max(peaks, default=0))
+    if not up:
+        return count, 0, DOWN, 0, 0.0, 0, peak
+
+    mean = sum(map(operator.mul, means, ups)) / up
+    threshold = _P95 * up
+    seen = 0.0
+    p95 = 0
+    for value, weight in sorted(zip(p95s, ups)):
+        if not weight:
+            continue
+        seen += weight
+        p95 = value
+        if seen >= threshold:
+            break
+    return count, up, int(min(mins)), int(max(maxes)), mean, int(p95), peak
+
+
+class _BucketRing:
+    """Fixed-capacity ring of rollup buckets stored as parallel arrays."""
+
+    __slots__ = ("capacity", "columns", "_start")
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self.columns = tuple(array(code) for code in _BUCKET_TYPECODES)
+        self._start = 0
+
+    def __len__(self) -> int:
+        return len(self.columns[0])
+
+    @property
+    def nbytes(self) -> int:
+        return len(self) * _BUCKET_BYTES
+
+    def append(self, start: int, values: Sequence[float]) -> None:
+        row = (start, *values)
+        if len(self) < self.capacity:
+            for column, value in zip(self.columns, row):
+                column.append(value)
+            return
+        index = self._start
+        for column, value in zip(self.columns, row):
+            column[index] = value
+        self._start = (index + 1) % self.capacity
+
+    def window(self, since: float, until: float) -> tuple[array, ...]:
+        """Columns of buckets starting in ``[since, until)``, oldest first."""
+
+        start = self._start
+        columns = tuple(column[start:] + column[:start] for column in self.columns) if start else self.columns
+        first = bisect_left(columns[0], since)
+        last = bisect_left(columns[0], until)
+        return tuple(column[first:last] for column in columns)
+
+
+def _roll(
+    starts: Sequence[int],
+    columns: Sequence[Sequence[float]],
+    width: int,
+    ring: _BucketRing,
+    aggregate: Callable[[Sequence[Sequence[float]]], Sequence[float]],
+) -> int:
+    """Group rows by ``width``-aligned bucket and append one aggregate per bucket."""
+
+    closed = 0
+    index, total = 0, len(starts)
+    while index < total:
+        bucket = starts[index] // width * width
+        end = bisect_left(starts, bucket + width, index)
+        ring.append(bucket, aggregate([column[index:end] for column in columns]))
+        index = end
+        closed += 1
+    return closed
+
+
+class _Rollups:
+    """Minute, hour and day buckets for one series plus how far each is rolled up."""
+
+    __slots__ = ("levels", "watermarks")
+
+    def __init__(self, capacities: Sequence[int]) -> None:
+        self.levels = tuple(_BucketRing(capacity) for capacity in capacities)
+        self.watermarks = [0] * len(capacities)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level.nbytes for level in self.levels)
+
+
+class Series:
+    """Fixed-capacity ring of samples for one address, oldest overwritten first."""
+
+    __slots__ = ("capacity", "times", "latency", "players", "_start", "rollups")
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        # Columns grow up to ``capacity`` and are then reused in place.
+        self.times = array("I")
+        self.latency = array("H")
+        self.players = array("H")
+        self._start = 0
+        self.rollups: _Rollups | None = None
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def nbytes(self) -> int:
+        rollups = self.rollups.nbytes if self.rollups is not None else 0
+        return len(self.times) * BYTES_PER_SAMPLE + rollups
+
+    @property
+    def last_time(self) -> int | None:
+        if not self.times:
+            return None
+        return self.times[self._start - 1]
+
+    def append(self, timestamp: int, latency_ms: int | None, players: int) -> None:
+        latency = DOWN if latency_ms is None else min(max(latency_ms, 0), _MAX_LATENCY)
+        players = min(max(players, 0), _MAX_PLAYERS)
+
+        if len(self.times) < self.capacity:
+            self.times.append(timestamp)
+            self.latency.append(latency)
+            self.players.append(players)
+            return
+
+        index = self._start
+        self.times[index] = timestamp
+        self.latency[index] = latency
+        self.players[index] = players
+        self._start = (index + 1) % self.capacity
+
+    def window(self, since: float = 0.0, until: float | None = None) -> tuple[array, array, array]:
+        """Return ``(times, latency, players)`` columns in ``[since, until)``, oldest first."""
+
+        start = self._start
+        if start:
+            times = self.times[start:] + self.times[:start]
+            latency = self.latency[start:] + self.latency[:start]
+            players = self.players[start:] + self.players[:start]
+        else:
+            times, latency, players = self.times, self.latency, self.players
+
+        first = bisect_left(times, since) if since else 0
+        last = bisect_left(times, until) if until is not None else len(times)
+        if first or last < len(times):
+            return times[first:last], latency[first:last], players[first:last]
+        return times, latency, players
+
+    def roll_up(self, now: float, capacities: Sequence[int]) -> list[int]:
+        """Close every finished bucket and return how many were closed per resolution."""
+
+        if self.rollups is None:
+            self.rollups = _Rollups(capacities)
+        rollups = self.rollups
+        closed = [0] * len(_RESOLUTIONS)
+
+        limit = int(now) // MINUTE * MINUTE
+        if limit > rollups.watermarks[0]:
+            times, latency, players = self.window(rollups.watermarks[0], limit)
+            closed[0] = _roll(times, (latency, players), MINUTE, rollups.levels[0], _summarize)
+            rollups.watermarks[0] = limit
+
+        for level in range(1, len(_RESOLUTIONS)):
+            width = _RESOLUTIONS[level][1]
+            limit = rollups.watermarks[level - 1] // width * width
+            if limit <= rollups.watermarks[level]:
+                continue
+            starts, *columns = rollups.levels[level - 1].window(rollups.watermarks[level], limit)
+            closed[level] = _roll(starts, columns, width, rollups.levels[level], _merge)
+            rollups.watermarks[level] = limit
+        return closed
+
+    def summary(self, since: float, until: float) -> Rollup | None:
+        """Summarize ``[since, until)`` from the coarsest rollups that fit, finer ones and raw samples for the tail."""
+
+        merged: list[list[float]] = [[] for _ in range(7)]
+        first: int | None = None
+        lower = since
+
+        rollups = self.rollups
+        if rollups is not None:
+            span = until - since
+            top = next(
+                (
+                    level
+                    for level, ring in enumerate(rollups.levels)
+                    if _RESOLUTIONS[level][1] * ring.capacity >= span
+                ),
+                len(rollups.levels) - 1,
+            )
+            for level in range(top, -1, -1):
+                upper = min(until, rollups.watermarks[level])
+                if upper <= lower:
+                    continue
+                starts, *columns = rollups.levels[level].window(lower, upper)
+                if len(starts):
+                    first = starts[0] if first is None else min(first, starts[0])
+                    for target, column in zip(merged, columns):
+                        target.extend(column)
+                lower = upper
+
+        times, latency, players = self.window(lower, until)
+        if len(times):
+            first = times[0] if first is None else min(first, times[0])
+            for target, value in zip(merged, _summarize((latency, players))):
+                target.append(value)
+
+        if first is None:
+            return None
+        count, up, low, high, mean, p95, peak = _merge(merged)
+        if not count:
+            return None
+        return Rollup(
+            start=int(first),
+            end=int(until),
+            samples=count,
+            up=up,
+            latency_min=low if up else None,
+            latency_max=high if up else None,
+            latency_mean=mean if up else None,
+            latency_p95=p95 if up else None,
+            players_peak=peak,
+        )
+
+
+class HistoryStore:
+    """Ring-buffer history for up to ``max_series`` addresses (least recently probed dropped).
+
+    Samples closer than ``min_interval`` seconds to the previous one are
+    skipped, so bursts of refreshes do not crowd out older history.
+    ``rollup_capacities`` sets how many minute, hour and day buckets are kept.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int,
+        min_interval: float,
+        max_series: int,
+        rollup_capacities: Sequence[int] = (360, 744, 365),
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.capacity = capacity
+        self.min_interval = min_interval
+        self.max_series = max(1, max_series)
+        self.rollup_capacities = tuple(rollup_capacities)
+        self._clock = clock
+        self._series: OrderedDict[str, Series] = OrderedDict()
+
+        _SERIES.set_function(lambda: len(self._series))
+        _BYTES.set_function(lambda: self.nbytes)
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(series.nbytes for series in self._series.values())
+
+    def get(self, address: str) -> Series | None:
+        return self._series.get(utils.normalize_address(address))
+
+    def record(self, address: str, latency_ms: int | None, players: int = 0) -> bool:
+        """Append one probe result; ``latency_ms=None`` records the server as down."""
+
+        key = utils.normalize_address(address)
+        now = self._clock()
+        series = self._series.get(key)
+        if series is None:
+            series = Series(self.capacity)
+            self._series[key] = series
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(key)
+            last = series.last_time
+            if last is not None and now - last < self.min_interval:
+                return False
+
+        series.append(int(now), latency_ms, players)
+        _SAMPLES.inc("down" if latency_ms is None else "up")
+        return True
+
+    @property
+    def retention(self) -> int:
+        """Seconds of history the coarsest rollup can hold."""
+
+        return _RESOLUTIONS[-1][1] * self.rollup_capacities[-1]
+
+    def roll_up(self) -> int:
+        """Close finished rollup buckets for every series; returns the buckets closed."""
+
+        now = self._clock()
+        totals = [0] * len(_RESOLUTIONS)
+        for series in self._series.values():
+            for level, closed in enumerate(series.roll_up(now, self.rollup_capacities)):
+                totals[level] += closed
+        for (name, _), closed in zip(_RESOLUTIONS, totals):
+            if closed:
+                _ROLLED_BUCKETS.inc(name, amount=closed)
+        return sum(totals)
+
+    def summary(self, address: str, window: float) -> Rollup | None:
+        """Summarize the last ``window`` seconds of ``address``, or ``None`` without samples."""
+
+        series = self.get(address)
+        if series is None:
+            return None
+        now = self._clock()
+        return series.summary(now - window, now + 1)
+
+
+def bucket_columns(
+    times: Sequence[int],
+    values: Sequence[int],
+    *,
+    since: float,
+    until: float,
+    width: int,
+    skip: int | None = None,
+) -> list[float | None]:
+    """Average ``values`` into ``width`` equal time buckets; empty buckets are ``None``.
+
+    Values equal to ``skip`` (for example :data:`DOWN`) are left out.
+    """
+
+    width = max(1, width)
+    span = max(until - since, 1e-9)
+    sums = [0.0] * width
+    counts = [0] * width
+    for timestamp, value in zip(times, values):
+        if value == skip or timestamp < since:
+            continue
+        column = min(int((timestamp - since) * width / span), width - 1)
+        sums[column] += value
+        counts[column] += 1
+    return [total / count if count else None for total, count in zip(sums, counts)]
+
+
+def sparkline(columns: Sequence[float | None]) -> str:
+    """Render columns as block characters scaled between their min and max."""
+
+    known = [value for value in columns if value is not None]
+    if not known:
+        return SPARK_GAP * len(columns)
+
+    low, high = min(known), max(known)
+    scale = (len(SPARK_BLOCKS) - 1) / (high - low) if high > low else 0.0
+    return "".join(
+        SPARK_GAP if value is None else SPARK_BLOCKS[int(round((value - low) * scale))] for value in columns
+    )
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Offline load-testing tools: an emulated server fleet and a fake Bot API."""
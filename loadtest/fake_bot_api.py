@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""A local stand-in for the Telegram Bot API.
+
+It answers the methods the bot uses with well-formed results, records every
+call, adds configurable latency and answers ``429 Too Many Requests`` with a
+``retry_after`` the way Telegram does when a chat exceeds its message rate
+(or at random, with ``flood_probability``). Point the bot at it with
+``build_application(token, base_url=api.base_url)``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass
+
+import tornado.netutil
+import tornado.web
+from tornado.httpserver import HTTPServer
+
+__all__ = ["FakeBotAPI", "SentMessage"]
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "MCServerStatBot", "username": "mcserverstat_load_bot"}
+# Methods that post to a chat and count against Telegram's per-chat limits.
+CHAT_METHODS = frozenset({"sendMessage", "editMessageText", "sendPhoto", "sendDocument"})
+
+
+@dataclass(frozen=True, slots=True)
+class SentMessage:
+    chat_id: int
+    message_id: int
+    text: str
+
+
+class _MethodHandler(tornado.web.RequestHandler):
+    def initialize(self, api: FakeBotAPI) -> None:
+        self._api = api
+
+    async def post(self, token: str, method: str) -> None:
+        params = {key: self.get_body_argument(key) for key in self.request.body_arguments}
+        if not params and self.request.body and self.request.headers.get("Content-Type", "").startswith(
+            "application/json"
+        ):
+            params = json.loads(self.request.body)
+        status, payload = await self._api.handle(method, params)
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(payload))
+
+    get = post
+
+
+class FakeBotAPI:
+    """Bot API server on ``127.0.0.1`` recording calls and simulating flood limits."""
+
+    def __init__(
+        self,
+        *,
+        port: int = 0,
+        latency_ms: float = 40.0,
+        jitter_ms: float = 15.0,
+        chat_rate: float = 1.0,
+        chat_burst: int = 3,
+        group_rate: float = 20 / 60,
+        flood_probability: float = 0.0,
+        retry_after: int = 1,
+        seed: int = 0,
+    ) -> None:
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chat_rate = chat_rate  # sustained messages per second in a private chat
+        self.group_rate = group_rate  # and in a group (negative chat id)
+        self.chat_burst = chat_burst
+        self.flood_probability = flood_probability
+        self.retry_after = retry_after
+        self.calls: Counter[str] = Counter()
+        self.floods: Counter[str] = Counter()
+        self.messages: dict[int, deque[SentMessage]] = defaultdict(lambda: deque(maxlen=20))
+        self.webhook_url = ""
+        self._rng = random.Random(seed)
+        self._next_message_id = 1000
+        self._chat_sends: dict[int, deque[float]] = defaultdict(deque)
+        self._server: HTTPServer | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self) -> None:
+        app = tornado.web.Application([(r"/bot([^/]+)/(\w+)", _MethodHandler, {"api": self})])
+        self._server = HTTPServer(app)
+        sockets = tornado.netutil.bind_sockets(self.port, address="127.0.0.1")
+        self.port = sockets[0].getsockname()[1]
+        self._server.add_sockets(sockets)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.stop()
+            await self._server.close_all_connections()
+            self._server = None
+
+    async def __aenter__(self) -> FakeBotAPI:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.stop()
+
+    def _flooded(self, chat_id: int) -> bool:
+        if self.flood_probability and self._rng.random() < self.flood_probability:
+            return True
+        rate = self.group_rate if chat_id < 0 else self.chat_rate
+        if rate <= 0:
+            return False
+        # Sliding window sized so ``chat_burst`` sends fit before the limit bites.
+        window = self.chat_burst / rate
+        now = time.monotonic()
+        sends = self._chat_sends[chat_id]
+        while sends and now - sends[0] > window:
+            sends.popleft()
+        if len(sends) >= self.chat_burst:
+            return True
+        sends.append(now)
+        return False
+
+    async def handle(self, method: str, params: dict[str, str]) -> tuple[int, dict]:
+        self.calls[method] += 1
+        delay = max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+        chat_id = int(params.get("chat_id", 0) or 0)
+        if method in CHAT_METHODS and self._flooded(chat_id):
+            self.floods[method] += 1
+            return 429, {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }
+
+        if method == "getMe":
+            return 200, {"ok": True, "result": BOT_USER}
+        if method == "setWebhook":
+            self.webhook_url = params.get("url", "")
+        if method == "getWebhookInfo":
+            return 200, {
+                "ok": True,
+                "result": {"url": self.webhook_url, "has_custom_certificate": False, "pending_update_count": 0},
+            }
+        if method == "sendMessage":
+            return 200, {"ok": True, "result": self._message(chat_id, params.get("text", ""))}
+        if method == "editMessageText":
+            message_id = int(params.get("message_id", 0) or 0)
+            return 200, {"ok": True, "result": self._message(chat_id, params.get("text", ""), message_id)}
+        return 200, {"ok": True, "result": True}
+
+    def _message(self, chat_id: int, text: str, message_id: int | None = None) -> dict:
+        if message_id is None:
+            self._next_message_id += 1
+            message_id = self._next_message_id
+            self.messages[chat_id].append(SentMessage(chat_id, message_id, text))
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "group" if chat_id < 0 else "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
@@ -0,0 +1,560 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Emulated fleet of Minecraft Java servers for offline load and latency tests.
+
+Every virtual server listens on its own localhost port and speaks the Server
+List Ping (handshake, status JSON, ping/pong) over TCP and the GS4 full-stat
+query over UDP. Each one has its own latency, jitter, player count, player
+list size and MOTD shape, and one of these behaviours:
+
+``normal``          answers status and query
+``query_disabled``  answers status only; the UDP port is closed
+``slow_drip``       answers, but writes each response a few bytes at a time
+``blackhole``       the ports exist but never answer (connects and reads time out)
+``closed``          nothing listens (connection refused)
+``malformed``       returns a status JSON with fields of the wrong type
+
+A small DNS responder serves ``_minecraft._tcp.sN.fleet.test`` SRV records
+(and A records for their targets) so the resolver, its SRV branch and the
+blocking-lookup fallbacks run without network access: ``nx.fleet.test``
+answers NXDOMAIN and ``servfail.fleet.test`` answers SERVFAIL.
+
+Run ``python -m loadtest.fleet --servers 2000`` from the repository root, or
+use :class:`Fleet` in-process and :func:`use_fleet_resolver` to point the
+bot's DNS lookups at the fleet.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import random
+import resource
+import socket
+import string
+import struct
+import uuid
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import dns.asyncresolver
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.resolver
+import dns.rrset
+
+__all__ = ["Fleet", "ServerSpec", "build_specs", "use_fleet_resolver", "MOTD_SHAPES", "BEHAVIOURS"]
+
+logger = logging.getLogger(__name__)
+
+HOST = "127.0.0.1"
+ZONE = "fleet.test"
+DNS_TTL = 300
+PROTOCOL_VERSION = 765
+MAX_STATUS_SAMPLE = 12  # vanilla servers never put more names in the SLP sample
+MAX_QUERY_PACKET = 65_000  # a UDP datagram must fit; longer player lists are cut
+
+BEHAVIOURS = ("normal", "query_disabled", "slow_drip", "blackhole", "closed", "malformed")
+DEFAULT_MIX = {
+    "normal": 0.80,
+    "query_disabled": 0.08,
+    "slow_drip": 0.04,
+    "blackhole": 0.03,
+    "closed": 0.03,
+    "malformed": 0.02,
+}
+
+MOTD_SHAPES: dict[str, object] = {
+    "plain": "A Minecraft Server",
+    "legacy": "§6§lSkyblock §7| §fSeason 5 §a[1.8-1.20]",
+    "component": {
+        "text": "",
+        "extra": [
+            {"text": "Hub ", "color": "gold", "bold": True},
+            {"text": "• ", "color": "gray"},
+            {"text": "now with minigames", "color": "green"},
+        ],
+    },
+    "multiline": "§bWelcome to the *best* server\n§7Line two with_underscores [brackets]",
+    "unicode": "✦ Ünïcödé Realm ✦ ⚔ 日本語",
+    "long": "§c" + "Very long description " * 12,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class ServerSpec:
+    """Configuration of one virtual server."""
+
+    index: int
+    port: int
+    behaviour: str = "normal"
+    latency_ms: float = 20.0
+    jitter_ms: float = 5.0
+    players_online: int = 10
+    players_max: int = 100
+    player_names: int = 10  # names listed by query (the status sample holds at most 12)
+    motd: str = "plain"
+    version: str = "Paper 1.20.4"
+    drip_bytes: int = 4
+    drip_interval: float = 0.05  # seconds between slow-drip chunks
+
+    @property
+    def address(self) -> str:
+        return f"{HOST}:{self.port}"
+
+    @property
+    def srv_name(self) -> str:
+        """Hostname whose SRV record points at this server (served by the fleet DNS)."""
+
+        return f"s{self.index}.{ZONE}"
+
+
+def build_specs(
+    count: int,
+    *,
+    base_port: int = 30000,
+    seed: int = 0,
+    mix: dict[str, float] | None = None,
+    latency_ms: tuple[float, float] = (5.0, 150.0),
+    jitter_ms: float = 10.0,
+    max_players: int = 500,
+    max_names: int = 200,
+) -> list[ServerSpec]:
+    """Generate ``count`` servers with a reproducible spread of behaviours and sizes.
+
+    Player counts follow a heavy-tailed distribution: most servers are small,
+    a few are crowded. Latency is uniform within ``latency_ms``.
+    """
+
+    rng = random.Random(seed)
+    weights = mix or DEFAULT_MIX
+    behaviours = list(weights)
+    shapes = list(MOTD_SHAPES)
+    specs = []
+    for index in range(count):
+        online = min(max_players, int(rng.paretovariate(1.2)) - 1)
+        specs.append(
+            ServerSpec(
+                index=index,
+                port=base_port + index,
+                behaviour=rng.choices(behaviours, weights=[weights[name] for name in behaviours])[0],
+                latency_ms=rng.uniform(*latency_ms),
+                jitter_ms=jitter_ms,
+                players_online=online,
+                players_max=max(online, rng.choice((20, 50, 100, 500, 1000))),
+                player_names=min(online, max_names),
+                motd=rng.choice(shapes),
+            )
+        )
+    return specs
+
+
+# ---------------------------------------------------------------------------
+# Wire format helpers
+# ---------------------------------------------------------------------------
+
+
+def _varint(value: int) -> bytes:
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+async def _read_varint(reader: asyncio.StreamReader) -> int:
+    result = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result
+    raise ValueError("VarInt is too long")
+
+
+async def _read_packet(reader: asyncio.StreamReader) -> bytes:
+    length = await _read_varint(reader)
+    if length > 32 * 1024:
+        raise ValueError("Packet is too long")
+    return await reader.readexactly(length)
+
+
+def _frame(payload: bytes) -> bytes:
+    return _varint(len(payload)) + payload
+
+
+def _utf(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return _varint(len(data)) + data
+
+
+@lru_cache(maxsize=4096)
+def _names(index: int, count: int) -> tuple[str, ...]:
+    rng = random.Random(index)
+    alphabet = string.ascii_letters + string.digits + "_"
+    return tuple("".join(rng.choices(alphabet, k=rng.randint(3, 16))) for _ in range(count))
+
+
+def _motd_text(motd: object) -> str:
+    if isinstance(motd, dict):
+        return str(motd.get("text", "")) + "".join(str(part.get("text", "")) for part in motd.get("extra", ()))
+    return str(motd)
+
+
+def status_payload(spec: ServerSpec) -> dict:
+    """The status JSON a real server would send for ``spec``."""
+
+    if spec.behaviour == "malformed":
+        # Wrong types rather than missing keys, which a client must validate.
+        return {"version": spec.version, "players": [], "description": MOTD_SHAPES[spec.motd]}
+
+    sample = [
+        {"name": name, "id": str(uuid.uuid3(uuid.NAMESPACE_OID, name))}
+        for name in _names(spec.index, min(spec.player_names, MAX_STATUS_SAMPLE))
+    ]
+    players: dict[str, object] = {"max": spec.players_max, "online": spec.players_online}
+    if sample:
+        players["sample"] = sample
+    return {
+        "version": {"name": spec.version, "protocol": PROTOCOL_VERSION},
+        "players": players,
+        "description": MOTD_SHAPES[spec.motd],
+        "enforcesSecureChat": False,
+    }
+
+
+def query_payload(spec: ServerSpec, session: bytes) -> bytes:
+    """GS4 full-stat response for ``spec``, trimmed to fit one datagram."""
+
+    fields = {
+        "hostname": _motd_text(MOTD_SHAPES[spec.motd]),
+        "gametype": "SMP",
+        "game_id": "MINECRAFT",
+        "version": spec.version.split()[-1],
+        "plugins": f"{spec.version}: ",
+        "map": "world",
+        "numplayers": str(spec.players_online),
+        "maxplayers": str(spec.players_max),
+        "hostport": str(spec.port),
+        "hostip": HOST,
+    }
+    body = bytearray(b"\x00" + session + b"splitnum\x00\x80\x00")
+    for key, value in fields.items():
+        body += key.encode("latin-1") + b"\x00" + value.encode("latin-1", "replace") + b"\x00"
+    body += b"\x00\x01player_\x00\x00"
+    for name in _names(spec.index, spec.player_names):
+        encoded = name.encode("latin-1", "replace") + b"\x00"
+        if len(body) + len(encoded) + 1 > MAX_QUERY_PACKET:
+            break
+        body += encoded
+    body += b"\x00"
+    return bytes(body)
+
+
+# ---------------------------------------------------------------------------
+# Servers
+# ---------------------------------------------------------------------------
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, fleet: Fleet, spec: ServerSpec) -> None:
+        self._fleet = fleet
+        self._spec = spec
+        self._transport: asyncio.DatagramTransport | None = None
+        self._challenge = random.Random(spec.index).randint(1, 2**31 - 1)
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport  # type: ignore[assignment]
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        if len(data) < 7 or data[:2] != b"\xfe\xfd":
+            return
+        kind, session = data[2], data[3:7]
+        if kind == 9:
+            reply = b"\x09" + session + str(self._challenge).encode() + b"\x00"
+            self._fleet.stats["query_handshake"] += 1
+        elif kind == 0 and len(data) >= 11 and struct.unpack("!i", data[7:11])[0] == self._challenge:
+            reply = query_payload(self._spec, session)
+            self._fleet.stats["query_full"] += 1
+        else:
+            return
+        asyncio.get_running_loop().call_later(self._fleet.delay(self._spec), self._send, reply, addr)
+
+    def _send(self, reply: bytes, addr: tuple[str, int]) -> None:
+        if self._transport is not None and not self._transport.is_closing():
+            self._transport.sendto(reply, addr)
+
+
+class Fleet:
+    """Run a set of :class:`ServerSpec` servers (and the fleet DNS) on localhost."""
+
+    def __init__(self, specs: Sequence[ServerSpec], *, dns_port: int | None = 0, seed: int = 0) -> None:
+        self.specs = list(specs)
+        self.by_index = {spec.index: spec for spec in self.specs}
+        self.dns_port = dns_port
+        self.stats: Counter[str] = Counter()
+        self._rng = random.Random(seed)
+        self._servers: list[asyncio.base_events.Server] = []
+        self._transports: list[asyncio.BaseTransport] = []
+        self._blackholes: list[socket.socket] = []
+
+    def delay(self, spec: ServerSpec) -> float:
+        return max(0.0, self._rng.gauss(spec.latency_ms, spec.jitter_ms)) / 1000
+
+    async def __aenter__(self) -> Fleet:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.stop()
+
+    async def start(self) -> None:
+        _raise_fd_limit(len(self.specs) * 2 + 256)
+        loop = asyncio.get_running_loop()
+        for spec in self.specs:
+            if spec.behaviour == "closed":
+                continue
+            if spec.behaviour == "blackhole":
+                self._blackholes.extend(_blackhole_sockets(spec.port))
+                continue
+            server = await asyncio.start_server(
+                lambda reader, writer, spec=spec: self._serve_slp(spec, reader, writer), HOST, spec.port
+            )
+            self._servers.append(server)
+            if spec.behaviour != "query_disabled":
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda spec=spec: _QueryProtocol(self, spec), local_addr=(HOST, spec.port)
+                )
+                self._transports.append(transport)
+
+        if self.dns_port is not None:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DNSProtocol(self), local_addr=(HOST, self.dns_port)
+            )
+            self.dns_port = transport.get_extra_info("sockname")[1]
+            self._transports.append(transport)
+        logger.info(
+            "Fleet of %d servers on ports %d-%d, DNS on %s",
+            len(self.specs),
+            min((spec.port for spec in self.specs), default=0),
+            max((spec.port for spec in self.specs), default=0),
+            self.dns_port,
+        )
+
+    async def stop(self) -> None:
+        for server in self._servers:
+            server.close()
+        for transport in self._transports:
+            transport.close()
+        for sock in self._blackholes:
+            sock.close()
+        for server in self._servers:
+            with contextlib.suppress(Exception):
+                await server.wait_closed()
+        self._servers.clear()
+        self._transports.clear()
+        self._blackholes.clear()
+
+    async def _serve_slp(self, spec: ServerSpec, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats["tcp_connections"] += 1
+        try:
+            handshake = await _read_packet(reader)
+            if not handshake or handshake[0] != 0x00 or handshake[-1] != 1:
+                return  # only the status intention is emulated
+            while True:
+                packet = await _read_packet(reader)
+                if packet[:1] == b"\x00":
+                    self.stats["status"] += 1
+                    body = b"\x00" + _utf(json.dumps(status_payload(spec), ensure_ascii=False))
+                elif packet[:1] == b"\x01":
+                    self.stats["ping"] += 1
+                    body = packet[:9]
+                else:
+                    return
+                await asyncio.sleep(self.delay(spec))
+                await self._write(spec, writer, _frame(body))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def _write(self, spec: ServerSpec, writer: asyncio.StreamWriter, data: bytes) -> None:
+        if spec.behaviour != "slow_drip":
+            writer.write(data)
+            await writer.drain()
+            return
+        for start in range(0, len(data), spec.drip_bytes):
+            writer.write(data[start : start + spec.drip_bytes])
+            await writer.drain()
+            await asyncio.sleep(spec.drip_interval)
+
+    def manifest(self) -> dict:
+        return {
+            "host": HOST,
+            "dns_port": self.dns_port,
+            "zone": ZONE,
+            "servers": [{**asdict(spec), "address": spec.address, "srv_name": spec.srv_name} for spec in self.specs],
+        }
+
+
+def _blackhole_sockets(port: int) -> list[socket.socket]:
+    # A listening socket that is never accepted from: once its one-slot backlog
+    # is full the kernel drops further SYNs, so connects hang like a firewalled port.
+    tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    tcp.bind((HOST, port))
+    tcp.listen(0)
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp.bind((HOST, port))  # bound but never read: queries go unanswered
+    return [tcp, udp]
+
+
+def _raise_fd_limit(wanted: int) -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < wanted:
+        target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+# ---------------------------------------------------------------------------
+# DNS
+# ---------------------------------------------------------------------------
+
+
+class _DNSProtocol(asyncio.DatagramProtocol):
+    def __init__(self, fleet: Fleet) -> None:
+        self._fleet = fleet
+        self._transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport  # type: ignore[assignment]
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        try:
+            query = dns.message.from_wire(data)
+        except Exception:
+            return
+        response = dns.message.make_response(query)
+        response.flags |= dns.flags.AA
+        for question in query.question:
+            self._answer(response, str(question.name).rstrip(".").lower(), question.rdtype)
+        self._fleet.stats["dns"] += 1
+        if self._transport is not None:
+            self._transport.sendto(response.to_wire(), addr)
+
+    def _answer(self, response: dns.message.Message, name: str, rdtype: int) -> None:
+        if not name.endswith(f".{ZONE}") or name.startswith("nx."):
+            response.set_rcode(dns.rcode.NXDOMAIN)
+            return
+        if name.startswith("servfail."):
+            response.set_rcode(dns.rcode.SERVFAIL)
+            return
+
+        label = name[: -len(ZONE) - 1]
+        srv = label.startswith("_minecraft._tcp.")
+        if srv:
+            label = label[len("_minecraft._tcp.") :]
+        spec = None
+        if label[:1] in ("s", "h") and label[1:].isdigit():
+            spec = self._fleet.by_index.get(int(label[1:]))
+        if spec is None:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+            return
+
+        if srv and rdtype == dns.rdatatype.SRV and label.startswith("s"):
+            target = f"h{spec.index}.{ZONE}."
+            response.answer.append(dns.rrset.from_text(name + ".", DNS_TTL, "IN", "SRV", f"0 5 {spec.port} {target}"))
+        elif not srv and rdtype == dns.rdatatype.A:
+            response.answer.append(dns.rrset.from_text(name + ".", DNS_TTL, "IN", "A", HOST))
+        # Anything else (AAAA, SRV on a target name) is an empty NOERROR answer.
+
+
+def use_fleet_resolver(port: int, host: str = HOST) -> None:
+    """Point dnspython's default resolvers (sync and async) at the fleet DNS."""
+
+    sync = dns.resolver.Resolver(configure=False)
+    sync.nameservers = [host]
+    sync.port = port
+    dns.resolver.default_resolver = sync
+
+    asynchronous = dns.asyncresolver.Resolver(configure=False)
+    asynchronous.nameservers = [host]
+    asynchronous.port = port
+    dns.asyncresolver.default_resolver = asynchronous
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+
+def _parse_mix(items: Iterable[str]) -> dict[str, float]:
+    mix = {}
+    for item in items:
+        name, _, weight = item.partition("=")
+        if name not in BEHAVIOURS:
+            raise argparse.ArgumentTypeError(f"unknown behaviour {name!r}; choose from {', '.join(BEHAVIOURS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    specs = build_specs(
+        args.servers,
+        base_port=args.base_port,
+        seed=args.seed,
+        mix=_parse_mix(args.mix) if args.mix else None,
+        latency_ms=(args.min_latency, args.max_latency),
+        jitter_ms=args.jitter,
+        max_players=args.max_players,
+        max_names=args.max_names,
+    )
+    async with Fleet(specs, dns_port=args.dns_port, seed=args.seed) as fleet:
+        if args.manifest:
+            Path(args.manifest).write_text(json.dumps(fleet.manifest(), indent=1), encoding="utf-8")
+            logger.info("Wrote manifest to %s", args.manifest)
+        while True:
+            await asyncio.sleep(args.report_interval)
+            logger.info("Served %s", dict(sorted(fleet.stats.items())))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Emulated Minecraft server fleet on localhost.")
+    parser.add_argument("--servers", type=int, default=1000)
+    parser.add_argument("--base-port", type=int, default=30000)
+    parser.add_argument("--dns-port", type=int, default=5353)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mix", nargs="*", metavar="BEHAVIOUR=WEIGHT", help="e.g. normal=9 blackhole=1")
+    parser.add_argument("--min-latency", type=float, default=5.0, help="milliseconds")
+    parser.add_argument("--max-latency", type=float, default=150.0, help="milliseconds")
+    parser.add_argument("--jitter", type=float, default=10.0, help="milliseconds (standard deviation)")
+    parser.add_argument("--max-players", type=int, default=500)
+    parser.add_argument("--max-names", type=int, default=200, help="longest player list returned by query")
+    parser.add_argument("--manifest", help="write the generated servers to this JSON file")
+    parser.add_argument("--report-interval", type=float, default=30.0, help="seconds between stats lines")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s", level=logging.INFO)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""End-to-end update throughput test: synthetic updates through the real bot.
+
+The application comes from ``main.build_application`` (every handler, job
+and hook, as in production) and talks to :class:`FakeBotAPI`; servers come
+from an in-process :class:`Fleet`. Updates are ``/status``, ``/players``
+and button presses on messages the bot sent earlier. They arrive at a fixed
+rate, with Zipf-distributed chat and address popularity, and go through
+``update_queue`` like webhook updates do. The report gives updates/s,
+handler latency percentiles (from enqueue to the last handler group
+finishing) and Bot API calls per update::
+
+    python -m loadtest.loadgen --rate 50 --duration 30 --chats 2000 --servers 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import bisect
+import contextlib
+import itertools
+import json
+import logging
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+
+import commands
+import main as bot_main
+from loadtest.fake_bot_api import BOT_USER, FakeBotAPI
+from loadtest.fleet import Fleet, build_specs, use_fleet_resolver
+
+__all__ = ["Workload", "run"]
+
+TOKEN = "123456:LOADTEST"
+LAST_GROUP = 1_000_000  # after every real handler group
+
+
+@dataclass
+class Workload:
+    rate: float = 20.0  # updates per second
+    duration: float = 30.0  # seconds of generated load
+    chats: int = 1000
+    group_fraction: float = 0.2  # share of chats that are groups
+    zipf_chats: float = 1.1
+    zipf_addresses: float = 1.2
+    status_weight: float = 0.5
+    players_weight: float = 0.2
+    callback_weight: float = 0.3
+    seed: int = 0
+
+
+@dataclass
+class Report:
+    sent: int = 0
+    completed: int = 0
+    errors: Counter[str] = field(default_factory=Counter)
+    kinds: Counter[str] = field(default_factory=Counter)
+    latencies: list[float] = field(default_factory=list)
+    elapsed: float = 0.0
+    api_calls: Counter[str] = field(default_factory=Counter)
+    floods: Counter[str] = field(default_factory=Counter)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def as_dict(self) -> dict[str, Any]:
+        calls = sum(self.api_calls.values())
+        return {
+            "updates_sent": self.sent,
+            "updates_completed": self.completed,
+            "updates_per_second": round(self.completed / self.elapsed, 2) if self.elapsed else 0.0,
+            "latency_ms": {
+                name: round(self.percentile(fraction) * 1000, 1)
+                for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+            },
+            "bot_api_calls_per_update": round(calls / self.completed, 2) if self.completed else 0.0,
+            "bot_api_calls": dict(self.api_calls.most_common()),
+            "flood_waits": dict(self.floods),
+            "handler_errors": dict(self.errors.most_common()),
+            "kinds": dict(self.kinds),
+        }
+
+
+class _Zipf:
+    """Draw ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s."""
+
+    def __init__(self, n: int, s: float, rng: random.Random) -> None:
+        self._cumulative = list(itertools.accumulate(1 / (rank + 1) ** s for rank in range(n)))
+        self._rng = rng
+
+    def draw(self) -> int:
+        return bisect.bisect_left(self._cumulative, self._rng.random() * self._cumulative[-1])
+
+
+class _Generator:
+    def __init__(self, workload: Workload, addresses: list[str], api: FakeBotAPI, bot: Any) -> None:
+        self.workload = workload
+        self.api = api
+        self.bot = bot
+        self.rng = random.Random(workload.seed)
+        # Shuffle so popular chats are not all groups (or all private).
+        chat_ids = [
+            -(10**12) - index if index < workload.chats * workload.group_fraction else 10_000 + index
+            for index in range(workload.chats)
+        ]
+        self.rng.shuffle(chat_ids)
+        self.chat_ids = chat_ids
+        self.addresses = addresses
+        self.chat_rank = _Zipf(len(chat_ids), workload.zipf_chats, self.rng)
+        self.address_rank = _Zipf(len(addresses), workload.zipf_addresses, self.rng)
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+
+    def next_update(self) -> tuple[str, Update]:
+        chat_id = self.chat_ids[self.chat_rank.draw()]
+        kind = self.rng.choices(
+            ("status", "players", "callback"),
+            weights=(self.workload.status_weight, self.workload.players_weight, self.workload.callback_weight),
+        )[0]
+        sent = self.api.messages.get(chat_id)
+        if kind == "callback" and sent:
+            message = self.rng.choice(sent)
+            data = self.rng.choice((commands.CallbackData.STATUS.value, commands.CallbackData.PLAYERS.value))
+            return kind, self._callback(chat_id, message.message_id, message.text, data)
+        if kind == "callback":
+            kind = "status"
+        address = self.addresses[self.address_rank.draw()]
+        return kind, self._command(chat_id, f"/{kind}", address)
+
+    def _user(self, chat_id: int) -> dict[str, Any]:
+        user_id = abs(chat_id) % 10**9 + (self.rng.randrange(50) if chat_id < 0 else 0)
+        return {"id": user_id, "is_bot": False, "first_name": "Load"}
+
+    def _chat(self, chat_id: int) -> dict[str, Any]:
+        return {"id": chat_id, "type": "group" if chat_id < 0 else "private", "title": "Load"}
+
+    def _command(self, chat_id: int, command: str, address: str) -> Update:
+        data = {
+            "update_id": next(self.update_ids),
+            "message": {
+                "message_id": next(self.message_ids),
+                "date": int(time.time()),
+                "chat": self._chat(chat_id),
+                "from": self._user(chat_id),
+                "text": f"{command} {address}",
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+            },
+        }
+        return Update.de_json(data, self.bot)
+
+    def _callback(self, chat_id: int, message_id: int, text: str, data: str) -> Update:
+        payload = {
+            "update_id": next(self.update_ids),
+            "callback_query": {
+                "id": str(self.rng.getrandbits(63)),
+                "from": self._user(chat_id),
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": self._chat(chat_id),
+                    "from": BOT_USER,
+                    "text": text,
+                },
+            },
+        }
+        return Update.de_json(payload, self.bot)
+
+
+async def _drive(application: Application, generator: _Generator, workload: Workload) -> Report:
+    report = Report()
+    enqueued: dict[int, float] = {}
+    finished = asyncio.Event()
+
+    async def completed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        started = enqueued.pop(update.update_id, None)
+        if started is not None:
+            report.latencies.append(time.perf_counter() - started)
+            report.completed += 1
+        if report.completed >= report.sent and sending_done:
+            finished.set()
+
+    async def failed(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+        report.errors[type(context.error).__name__] += 1
+
+    application.add_handler(TypeHandler(Update, completed), group=LAST_GROUP)
+    application.add_error_handler(failed)
+
+    sending_done = False
+    interval = 1 / workload.rate
+    started = time.perf_counter()
+    next_at = started
+    while time.perf_counter() - started < workload.duration:
+        kind, update = generator.next_update()
+        enqueued[update.update_id] = time.perf_counter()
+        report.kinds[kind] += 1
+        report.sent += 1
+        await application.update_queue.put(update)
+        next_at += interval
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+    sending_done = True
+
+    # Let the backlog drain, but do not wait forever on a stuck handler.
+    if report.completed < report.sent:
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(finished.wait(), timeout=max(30.0, workload.duration))
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+async def run(
+    workload: Workload, *, servers: int = 500, base_port: int = 40000, api: FakeBotAPI | None = None
+) -> Report:
+    """Run ``workload`` against a fresh application, fake API and server fleet."""
+
+    api = api or FakeBotAPI(seed=workload.seed)
+    specs = build_specs(servers, base_port=base_port, seed=workload.seed)
+    async with Fleet(specs, dns_port=0, seed=workload.seed) as fleet, api:
+        use_fleet_resolver(fleet.dns_port)
+        # SRV names for half the servers so the resolver path is exercised too.
+        addresses = [spec.srv_name if spec.index % 2 else spec.address for spec in specs]
+
+        application = bot_main.build_application(TOKEN, base_url=api.base_url)
+        await application.initialize()
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        try:
+            generator = _Generator(workload, addresses, api, application.bot)
+            report = await _drive(application, generator, workload)
+        finally:
+            await application.stop()
+            await application.shutdown()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+
+        report.api_calls = Counter(api.calls)
+        report.api_calls.pop("getMe", None)
+        report.floods = Counter(api.floods)
+        return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Feed synthetic updates through the bot against a fake Bot API.")
+    parser.add_argument("--rate", type=float, default=20.0, help="updates per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--chats", type=int, default=1000)
+    parser.add_argument("--groups", type=float, default=0.2, help="fraction of chats that are groups")
+    parser.add_argument("--servers", type=int, default=500)
+    parser.add_argument("--base-port", type=int, default=40000, help="first port of the emulated fleet")
+    parser.add_argument("--zipf-chats", type=float, default=1.1)
+    parser.add_argument("--zipf-addresses", type=float, default=1.2)
+    parser.add_argument("--mix", default="0.5,0.2,0.3", help="status,players,callback weights")
+    parser.add_argument("--api-latency", type=float, default=40.0, help="fake Bot API latency in ms")
+    parser.add_argument("--flood-probability", type=float, default=0.0, help="extra random 429 answers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the bot's warnings and errors")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        level=logging.WARNING if args.verbose else logging.CRITICAL,
+    )
+    status_weight, players_weight, callback_weight = (float(part) for part in args.mix.split(","))
+    workload = Workload(
+        rate=args.rate,
+        duration=args.duration,
+        chats=args.chats,
+        group_fraction=args.groups,
+        zipf_chats=args.zipf_chats,
+        zipf_addresses=args.zipf_addresses,
+        status_weight=status_weight,
+        players_weight=players_weight,
+        callback_weight=callback_weight,
+        seed=args.seed,
+    )
+    api = FakeBotAPI(latency_ms=args.api_latency, flood_probability=args.flood_probability, seed=args.seed)
+    report = asyncio.run(run(workload, servers=args.servers, base_port=args.base_port, api=api)).as_dict()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"updates          {report['updates_completed']}/{report['updates_sent']} completed")
+    print(f"throughput       {report['updates_per_second']} updates/s")
+    latency = report["latency_ms"]
+    print(f"handler latency  p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms")
+    print(f"Bot API calls    {report['bot_api_calls_per_update']} per update {report['bot_api_calls']}")
+    print(f"flood waits      {report['flood_waits']}")
+    print(f"handler errors   {report['handler_errors']}")
+
+
+if __name__ == "__main__":
+    main()
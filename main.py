@@ -2,9 +2,12 @@
 # Guillermo Siesto
 # github.com/GSiesto
 
+import boot  # first, so boot timing includes the imports below
+
 import logging
 import os
 import sys
+import threading
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
@@ -15,9 +18,17 @@ from telegram.ext import (
     CommandHandler,
     ContextTypes,
     Defaults,
+    InlineQueryHandler,
 )
 
 import commands
+import dispatch
+import telemetry
+import utils
+import webserver
+
+METRICS_PORT = utils.env_int("METRICS_PORT", 0)  # side port for /metrics (e.g. polling mode); 0 disables it
+SHARD_ROLE = (os.getenv("SHARD_ROLE") or "").strip().lower()  # "router", "worker" or empty for a single process
 
 
 def setup_logging() -> None:
@@ -52,26 +63,36 @@ def setup_logging() -> None:
     logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
-def main() -> None:
-    """Entry point for the Telegram bot."""
-
-    setup_logging()
+def build_application(token: str, *, base_url: str | None = None) -> Application:
+    """Create the application with every handler, job and hook registered.
 
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
-    if not token:
-        logging.error("Environment variable TELEGRAM_BOT_TOKEN is not set.")
-        sys.exit(1)
+    ``base_url`` points the bot at another Bot API server (for example a
+    local one, or the fake API used by the load tests).
+    """
 
-    application = (
+    builder = (
         Application.builder()
         .token(token)
         .defaults(Defaults(parse_mode=ParseMode.MARKDOWN))
-        .build()
+        .request(telemetry.InstrumentedRequest(connection_pool_size=256))
+        .concurrent_updates(dispatch.ChatOrderedUpdateProcessor())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
     )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
 
     application.add_handler(CommandHandler("start", commands.cmd_start))
     application.add_handler(CommandHandler("status", commands.cmd_status))
     application.add_handler(CommandHandler("players", commands.cmd_players))
+    application.add_handler(CommandHandler("statusall", commands.cmd_statusall))
+    application.add_handler(CommandHandler("watch", commands.cmd_watch))
+    application.add_handler(CommandHandler("unwatch", commands.cmd_unwatch))
+    application.add_handler(CommandHandler("history", commands.cmd_history))
+    application.add_handler(CommandHandler("uptime", commands.cmd_uptime))
+
+    application.add_handler(InlineQueryHandler(commands.inline_status))
 
     application.add_handler(
         CallbackQueryHandler(
@@ -92,32 +113,81 @@ def main() -> None:
         )
     )
 
+    telemetry.install_update_counter(application, callbacks=(data.value for data in commands.CallbackData))
     application.add_error_handler(log_error)
+    commands.warm_render_cache()
+    commands.setup_watch(application)
+    commands.setup_history(application)
+    commands.setup_persistence(application)
+    commands.setup_shared_cache(application)
+    return application
+
+
+def main() -> None:
+    """Entry point for the Telegram bot."""
+
+    setup_logging()
+
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    if not token:
+        logging.error("Environment variable TELEGRAM_BOT_TOKEN is not set.")
+        sys.exit(1)
 
+    boot.mark("imports")
     webhook_url = os.getenv("WEBHOOK_URL")
     is_cloud_run = bool(os.getenv("K_SERVICE"))
+    port = int(os.getenv("PORT", "8080"))
+    secret_token = os.getenv("WEBHOOK_SECRET", "")
+
+    # Telegram API strictly requires an HTTPS URL when registering webhooks.
+    # If running locally or on initial Cloud Run boot before WEBHOOK_URL is assigned,
+    # fallback to a dummy HTTPS URL so Telegram API call succeeds while binding 0.0.0.0:PORT locally.
+    if webhook_url and webhook_url.startswith("https://"):
+        effective_webhook_url = f"{webhook_url.rstrip('/')}/webhook"
+    else:
+        effective_webhook_url = "https://example.com/webhook"
+
+    if SHARD_ROLE == "router":
+        # Sharded mode: this process only owns the webhook and forwards updates to the workers.
+        workers = [url.strip() for url in os.getenv("SHARD_WORKERS", "").split(",") if url.strip()]
+        if not workers:
+            logging.error("SHARD_ROLE=router needs SHARD_WORKERS (comma-separated worker URLs).")
+            sys.exit(1)
+        # Imported here: only the router needs it (and tornado's HTTP client).
+        import shard
+
+        logging.info("Starting shard router on port %d (Webhook URL: %s)", port, effective_webhook_url)
+        shard.run_router(
+            token=token,
+            listen="0.0.0.0",
+            port=port,
+            url_path="webhook",
+            webhook_url=effective_webhook_url,
+            secret_token=secret_token or None,
+            workers=workers,
+            shared_cache_url=commands.SHARED_CACHE,
+        )
+        return
 
-    if webhook_url or is_cloud_run:
+    application = build_application(token)
+    boot.mark("build")
+
+    if webhook_url or is_cloud_run or SHARD_ROLE == "worker":
         # Webhook mode — for Cloud Run and other serverless platforms.
         # The container receives HTTP POSTs from Telegram and scales to zero when idle.
-        port = int(os.getenv("PORT", "8080"))
-        secret_token = os.getenv("WEBHOOK_SECRET", "")
-
-        # Telegram API strictly requires an HTTPS URL when registering webhooks.
-        # If running locally or on initial Cloud Run boot before WEBHOOK_URL is assigned,
-        # fallback to a dummy HTTPS URL so Telegram API call succeeds while binding 0.0.0.0:PORT locally.
-        if webhook_url and webhook_url.startswith("https://"):
-            effective_webhook_url = f"{webhook_url.rstrip('/')}/webhook"
-        else:
-            effective_webhook_url = "https://example.com/webhook"
-
+        # A shard worker serves the same route but the router registers the webhook.
         logging.info("Starting HTTP server on port %d (Webhook URL: %s)", port, effective_webhook_url)
-        application.run_webhook(
+        # mcstatus and dnspython are imported lazily; load them while the
+        # event loop waits on Telegram so the first probe does not pay for it.
+        threading.Thread(target=commands.preload_probe_modules, name="preload", daemon=True).start()
+        webserver.run_webhook(
+            application,
             listen="0.0.0.0",
             port=port,
             url_path="webhook",
             webhook_url=effective_webhook_url,
             secret_token=secret_token or None,
+            register=SHARD_ROLE != "worker",
         )
     else:
         # Polling mode — for local development and always-on VMs.
@@ -125,6 +195,21 @@ def main() -> None:
         application.run_polling()
 
 
+async def post_init(application: Application) -> None:
+    """Runs inside the event loop before the first update is processed."""
+
+    telemetry.install_executor()
+    if METRICS_PORT:
+        webserver.start_metrics_server(METRICS_PORT)
+
+
+async def post_shutdown(application: Application) -> None:
+    """Runs after the application has shut down."""
+
+    await commands.shutdown_persistence(application)
+    await commands.shutdown_shared_cache(application)
+
+
 async def log_error(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log any uncaught exceptions raised while handling updates."""
 
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""In-process metric counters, gauges and histograms for MCServerStatBot.
+
+Metrics are plain Python objects registered in a module-level registry so any
+module can update them cheaply; :func:`collect` returns a point-in-time view
+for logging and :func:`exposition` renders the Prometheus text format.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+
+__all__ = ["Counter", "Gauge", "Histogram", "collect", "exposition", "CONTENT_TYPE", "REGISTRY"]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Sample = tuple[str, tuple[tuple[str, str], ...], float]
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Sequence[object]) -> tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(label) for label in labels)
+
+    def samples(self) -> Iterator[tuple[tuple[str, ...], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        yield from items
+
+    def value(self, *labels: object) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def exposition_samples(self) -> Iterator[Sample]:
+        """Yield ``(sample name, label pairs, value)`` rows for export."""
+
+        for labels, value in self.samples():
+            yield self.name, tuple(zip(self.labelnames, labels)), value
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def inc(self, *labels: object, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be read from a callback on collection."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float, *labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, *labels: object, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels: object, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the (unlabelled) gauge value from ``function`` at collection time."""
+
+        self._function = function
+
+    def samples(self) -> Iterator[tuple[tuple[str, ...], float]]:
+        if self._function is not None:
+            yield (), float(self._function())
+            return
+        yield from super().samples()
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, optionally split by labels."""
+
+    kind = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets if not math.isinf(bound)))
+        # Per label set: observation count per bucket (last slot is +Inf) and their sum.
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labels: object) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, *labels: object) -> Iterator[None]:
+        """Observe the wall-clock seconds spent in the ``with`` body."""
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def value(self, *labels: object) -> float:
+        """Number of observations for ``labels``."""
+
+        return float(sum(self._counts.get(self._key(labels), ())))
+
+    def samples(self) -> Iterator[tuple[tuple[str, ...], float]]:
+        with self._lock:
+            items = [(key, sum(counts)) for key, counts in self._counts.items()]
+        for key, count in items:
+            yield key, float(count)
+
+    def exposition_samples(self) -> Iterator[Sample]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for key, counts, total in items:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (("le", bound),), float(cumulative)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, float(cumulative)
+
+
+class _Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def metrics(self) -> list[_Metric]:
+        return list(self._metrics.values())
+
+
+REGISTRY = _Registry()
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _render_labels(labels: Sequence[tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def collect() -> dict[str, float]:
+    """Return a flat ``{"name{label=value}": value}`` view of every metric."""
+
+    result: dict[str, float] = {}
+    for metric in REGISTRY.metrics():
+        for name, labels, value in metric.exposition_samples():
+            result[f"{name}{_render_labels(labels)}"] = value
+    return result
+
+
+def exposition() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+
+    lines: list[str] = []
+    for metric in REGISTRY.metrics():
+        documentation = metric.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {metric.name} {documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.exposition_samples():
+            lines.append(f"{name}{_render_labels(labels)} {_format_value(value)}")
+    lines.append("")
+    return "\n".join(lines)
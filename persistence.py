@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Durable SQLite backing for per-message inline button context and watches.
+
+Message context writes are buffered in memory and flushed in batches by a
+background job (write-behind), so recording a message never touches the
+disk on the hot path. Chats are loaded lazily, the first time a button is
+pressed in them after a restart.
+
+``/watch`` subscriptions change only on a command, so they are written
+through at once and all loaded when the bot starts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import metrics
+import utils
+
+__all__ = ["SQLiteContextStore", "SQLiteWatchStore"]
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS message_context (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (chat_id, message_id)
+)
+"""
+
+_WATCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watch_subscription (
+    chat_id INTEGER NOT NULL,
+    server TEXT NOT NULL,
+    address TEXT NOT NULL,
+    threshold INTEGER,
+    PRIMARY KEY (chat_id, server)
+)
+"""
+
+_FLUSHED_ROWS = metrics.Counter(
+    "mcstat_context_store_flushed_rows_total",
+    "Message context rows written to the durable store.",
+)
+_LOADED_CHATS = metrics.Counter(
+    "mcstat_context_store_loaded_chats_total",
+    "Chats whose message context was loaded from the durable store.",
+)
+_PENDING_ROWS = metrics.Gauge(
+    "mcstat_context_store_pending_rows",
+    "Message context rows waiting to be flushed.",
+)
+
+
+class SQLiteContextStore:
+    """Write-behind store of ``(chat_id, message_id) -> value``.
+
+    Values are kept as-is until flushed and only then turned into text with
+    ``encode`` (off the event loop); ``None`` deletes the row. Each chat keeps
+    at most ``per_chat_limit`` newest rows on disk.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        encode: Callable[[Any], str],
+        per_chat_limit: int,
+        flush_threshold: int = 500,
+    ) -> None:
+        self.path = Path(path).expanduser()
+        self.encode = encode
+        self.per_chat_limit = per_chat_limit
+        self.flush_threshold = flush_threshold
+        self._pending: dict[tuple[int, int], tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._flushing: asyncio.Task[int] | None = None
+        # One flush at a time, from the swap to the commit: an older batch
+        # written after a newer one would overwrite the newer rows.
+        self._flush_lock = asyncio.Lock()
+
+    def open(self) -> None:
+        if self.path.parent and not self.path.parent.exists():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(_SCHEMA)
+        self._connection = connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            with self._db_lock:
+                self._connection.close()
+            self._connection = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def record(self, chat_id: int, message_id: int, value: Any) -> None:
+        """Queue a write; repeated writes to one message coalesce into the newest."""
+
+        with self._lock:
+            self._pending[(chat_id, message_id)] = (value, time.time())
+            pending = len(self._pending)
+        _PENDING_ROWS.set(pending)
+
+        if pending >= self.flush_threshold and (self._flushing is None or self._flushing.done()):
+            try:
+                self._flushing = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass  # no running loop; the periodic flush will pick it up
+
+    async def load_chat(self, chat_id: int) -> list[tuple[int, str]]:
+        """Return ``(message_id, payload)`` rows for a chat, oldest first."""
+
+        if self._connection is None:
+            return []
+        rows = await asyncio.to_thread(self._load_chat, chat_id)
+        _LOADED_CHATS.inc()
+        return rows
+
+    def _load_chat(self, chat_id: int) -> list[tuple[int, str]]:
+        assert self._connection is not None
+        with self._db_lock:
+            cursor = self._connection.execute(
+                "SELECT message_id, payload FROM message_context WHERE chat_id = ? "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (chat_id, self.per_chat_limit),
+            )
+            return list(reversed(cursor.fetchall()))
+
+    async def flush(self) -> int:
+        """Write every queued change in one transaction; returns the rows written."""
+
+        async with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            _PENDING_ROWS.set(0)
+            if not batch or self._connection is None:
+                return 0
+
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception:
+                logger.exception("Failed to flush %d message context rows", len(batch))
+                with self._lock:
+                    # Rows recorded since the swap are newer; keep them.
+                    for key, value in batch.items():
+                        self._pending.setdefault(key, value)
+                    pending = len(self._pending)
+                _PENDING_ROWS.set(pending)
+                return 0
+
+        _FLUSHED_ROWS.inc(amount=len(batch))
+        return len(batch)
+
+    def _write(self, batch: dict[tuple[int, int], tuple[Any, float]]) -> None:
+        assert self._connection is not None
+        deletes = [key for key, (value, _) in batch.items() if value is None]
+        upserts = [
+            (chat, message, self.encode(value), at)
+            for (chat, message), (value, at) in batch.items()
+            if value is not None
+        ]
+        chats = [(chat, chat, self.per_chat_limit) for chat in {chat for chat, _ in batch}]
+
+        with self._db_lock:
+            connection = self._connection
+            connection.execute("BEGIN")
+            try:
+                connection.executemany(
+                    "DELETE FROM message_context WHERE chat_id = ? AND message_id = ?", deletes
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO message_context (chat_id, message_id, payload, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    upserts,
+                )
+                connection.executemany(
+                    "DELETE FROM message_context WHERE chat_id = ? AND message_id NOT IN ("
+                    "SELECT message_id FROM message_context WHERE chat_id = ? "
+                    "ORDER BY updated_at DESC LIMIT ?)",
+                    chats,
+                )
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+
+class SQLiteWatchStore:
+    """Write-through store of ``/watch`` subscriptions, one row per chat and server."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path).expanduser()
+        self._db_lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+
+    def open(self) -> None:
+        if self.path.parent and not self.path.parent.exists():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(_WATCH_SCHEMA)
+        self._connection = connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            with self._db_lock:
+                self._connection.close()
+            self._connection = None
+
+    def load(self) -> list[tuple[int, str, int | None]]:
+        """Return every ``(chat_id, address, threshold)``; called once at startup."""
+
+        if self._connection is None:
+            return []
+        with self._db_lock:
+            cursor = self._connection.execute("SELECT chat_id, address, threshold FROM watch_subscription")
+            return cursor.fetchall()
+
+    async def save(self, chat_id: int, address: str, threshold: int | None) -> None:
+        await self._execute(
+            "INSERT OR REPLACE INTO watch_subscription (chat_id, server, address, threshold) VALUES (?, ?, ?, ?)",
+            (chat_id, utils.normalize_address(address), address, threshold),
+        )
+
+    async def delete(self, chat_id: int, address: str) -> None:
+        await self._execute(
+            "DELETE FROM watch_subscription WHERE chat_id = ? AND server = ?",
+            (chat_id, utils.normalize_address(address)),
+        )
+
+    async def delete_chat(self, chat_id: int) -> None:
+        await self._execute("DELETE FROM watch_subscription WHERE chat_id = ?", (chat_id,))
+
+    async def _execute(self, sql: str, parameters: tuple[Any, ...]) -> None:
+        if self._connection is None:
+            return
+        try:
+            await asyncio.to_thread(self._locked_execute, sql, parameters)
+        except Exception:
+            # The in-memory watch still works; it is only lost on the next restart.
+            logger.exception("Failed to update the watch store")
+
+    def _locked_execute(self, sql: str, parameters: tuple[Any, ...]) -> None:
+        assert self._connection is not None
+        with self._db_lock:
+            self._connection.execute(sql, parameters)
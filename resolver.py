@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Caching SRV/A/AAAA resolver for Minecraft Java server addresses.
+
+Mirrors the Minecraft client's address field: an explicit ``:port`` is used
+as-is, otherwise ``_minecraft._tcp.<host>`` is consulted and the default port
+is used when no SRV record exists. Results are kept for the DNS record TTL,
+clamped to a configurable floor and ceiling, and definitive negative answers
+(NXDOMAIN, no SRV record) are cached for a short time as well.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import json
+import socket
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+import metrics
+import utils
+
+if TYPE_CHECKING:
+    from shared_cache import SharedCache
+
+__all__ = ["ResolvedEndpoint", "ResolutionError", "ResolverCache", "preload"]
+
+_RESOLVER_LOOKUPS = metrics.Counter(
+    "mcstat_resolver_cache_lookups_total",
+    "Resolver cache lookups by result (hit, negative_hit, miss).",
+    ("result",),
+)
+
+
+def preload() -> None:
+    """Import dnspython now instead of on the first lookup."""
+
+    import dns.asyncresolver  # noqa: F401
+    import dns.resolver  # noqa: F401
+
+
+def _cache_key(address: str) -> str:
+    # ``host`` and ``host:25565`` stay distinct: only the former consults SRV records.
+    return utils.normalize_address(address)
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+@dataclass(frozen=True, slots=True)
+class ResolvedEndpoint:
+    """Where a server address actually lives after SRV and A/AAAA resolution."""
+
+    host: str
+    port: int
+    ips: tuple[str, ...]
+    srv: bool
+
+
+class ResolutionError(LookupError):
+    """The address definitively does not resolve (cached negative answer)."""
+
+
+def _encode_shared(value: ResolvedEndpoint | ResolutionError, ttl: float) -> str:
+    data = {"error": str(value)} if isinstance(value, ResolutionError) else asdict(value)
+    data["expires_at"] = time.time() + ttl
+    return json.dumps(data, separators=(",", ":"))
+
+
+def _decode_shared(payload: str) -> tuple[ResolvedEndpoint | ResolutionError, float] | None:
+    try:
+        data = json.loads(payload)
+        ttl = float(data.pop("expires_at")) - time.time()
+        if "error" in data:
+            return ResolutionError(data["error"]), ttl
+        data["ips"] = tuple(data["ips"])
+        return ResolvedEndpoint(**data), ttl
+    except (TypeError, ValueError, KeyError):
+        return None
+
+
+class ResolverCache:
+    """Resolve Minecraft addresses with an in-process, TTL-honouring cache.
+
+    With :attr:`shared` set, local misses consult the cluster's shared cache
+    before asking DNS, and fresh answers are written back to it.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        min_ttl: float,
+        max_ttl: float,
+        negative_ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max(0, max_entries)
+        self.min_ttl = min_ttl
+        self.max_ttl = max(min_ttl, max_ttl)
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, ResolvedEndpoint | ResolutionError]] = OrderedDict()
+        self.shared: SharedCache | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _clamp(self, ttl: float) -> float:
+        return min(self.max_ttl, max(self.min_ttl, ttl))
+
+    def get(self, address: str) -> ResolvedEndpoint | None:
+        """Return a cached endpoint, raise a cached :class:`ResolutionError`, or return ``None``."""
+
+        key = _cache_key(address)
+        item = self._entries.get(key)
+        if item is None:
+            _RESOLVER_LOOKUPS.inc("miss")
+            return None
+
+        expires_at, value = item
+        if self._clock() >= expires_at:
+            del self._entries[key]
+            _RESOLVER_LOOKUPS.inc("miss")
+            return None
+
+        self._entries.move_to_end(key)
+        if isinstance(value, ResolutionError):
+            _RESOLVER_LOOKUPS.inc("negative_hit")
+            raise ResolutionError(*value.args)
+
+        _RESOLVER_LOOKUPS.inc("hit")
+        return value
+
+    def _put(self, address: str, value: ResolvedEndpoint | ResolutionError, ttl: float) -> None:
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+
+        key = _cache_key(address)
+        self._entries[key] = (self._clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def resolve(self, address: str, *, lifetime: float) -> ResolvedEndpoint:
+        """Resolve ``address``, answering from the cache when possible.
+
+        Transient DNS failures (timeouts, SERVFAIL) propagate uncached so the
+        caller can fall back to other strategies.
+        """
+
+        cached = self.get(address)
+        if cached is not None:
+            return cached
+
+        if self.shared is not None:
+            payload = await self.shared.get(f"resolve:{_cache_key(address)}")
+            shared = _decode_shared(payload) if payload is not None else None
+            if shared is not None and shared[1] > 0:
+                value, ttl = shared
+                self._put(address, value, ttl)
+                if isinstance(value, ResolutionError):
+                    raise value
+                return value
+
+        try:
+            endpoint, ttl = await self._resolve_uncached(address, lifetime=lifetime)
+        except ResolutionError as exc:
+            self._put(address, exc, self.negative_ttl)
+            await self._share(address, exc, self.negative_ttl)
+            raise
+
+        self._put(address, endpoint, ttl)
+        await self._share(address, endpoint, ttl)
+        return endpoint
+
+    async def _share(self, address: str, value: ResolvedEndpoint | ResolutionError, ttl: float) -> None:
+        if self.shared is not None and ttl > 0:
+            await self.shared.set(f"resolve:{_cache_key(address)}", _encode_shared(value, ttl), ttl)
+
+    async def _resolve_uncached(self, address: str, *, lifetime: float) -> tuple[ResolvedEndpoint, float]:
+        # dnspython is imported here rather than at module level to keep boot fast.
+        import dns.asyncresolver
+        import dns.resolver
+        from dns.rdatatype import RdataType
+
+        host, port = utils.parse_address(address.strip())
+        host = host.rstrip(".")
+        ttls: list[float] = []
+        srv = False
+        srv_checked = ":" not in address and not _is_ip(host)
+
+        if srv_checked:
+            try:
+                answer = await dns.asyncresolver.resolve(
+                    f"_minecraft._tcp.{host}", RdataType.SRV, lifetime=lifetime, search=True
+                )
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+                pass
+            else:
+                record = answer[0]
+                host = str(record.target).rstrip(".")
+                port = int(record.port)
+                if answer.rrset is not None:
+                    ttls.append(answer.rrset.ttl)
+                srv = True
+
+        if _is_ip(host):
+            ips: tuple[str, ...] = (str(ipaddress.ip_address(host)),)
+        else:
+            ips = await self._resolve_ips(host, port, lifetime=lifetime, ttls=ttls)
+
+        ttl = self._clamp(min(ttls)) if ttls else self.min_ttl
+        if srv_checked and not srv:
+            # A missing SRV record is a negative answer: re-check it sooner.
+            ttl = min(ttl, self.negative_ttl)
+        return ResolvedEndpoint(host=host, port=port, ips=ips, srv=srv), ttl
+
+    async def _resolve_ips(self, host: str, port: int, *, lifetime: float, ttls: list[float]) -> tuple[str, ...]:
+        import dns.asyncresolver
+        import dns.resolver
+        from dns.rdatatype import RdataType
+
+        results = await asyncio.gather(
+            dns.asyncresolver.resolve(host, RdataType.A, lifetime=lifetime, search=True),
+            dns.asyncresolver.resolve(host, RdataType.AAAA, lifetime=lifetime, search=True),
+            return_exceptions=True,
+        )
+
+        ips: list[str] = []
+        transient: BaseException | None = None
+        for result in results:
+            if isinstance(result, (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)):
+                continue
+            if isinstance(result, BaseException):
+                transient = result
+                continue
+            ips.extend(str(record).rstrip(".") for record in result)
+            if result.rrset is not None:
+                ttls.append(result.rrset.ttl)
+
+        if ips:
+            return tuple(ips)
+        if transient is not None:
+            raise transient
+
+        # Names such as ``localhost`` or /etc/hosts entries never reach DNS.
+        try:
+            infos = await asyncio.wait_for(
+                asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM),
+                timeout=lifetime,
+            )
+        except socket.gaierror as exc:
+            raise ResolutionError(f"{host} has no A or AAAA records") from exc
+        return tuple(dict.fromkeys(str(info[4][0]) for info in infos))
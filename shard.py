@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Run several bot workers behind one webhook.
+
+The router owns the public webhook: it checks the secret token, picks a
+worker for each update by consistent hashing on the chat id (the same key
+:func:`dispatch.ordering_key` orders by), and forwards the request body
+unchanged. Each chat's ``chat_data`` therefore lives on one worker, and
+adding or removing a worker only moves about ``1/N`` of the chats. Workers
+are ordinary webhook-mode bots started with ``SHARD_ROLE=worker``; they
+share probe results through ``SHARED_CACHE`` (see :mod:`shared_cache`),
+and a ``unix://`` shared cache is served by the router.
+
+On one host, ``python -m shard --workers 4`` starts the router on ``PORT``
+and four workers on the ports after it, and restarts any that exit.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import bisect
+import contextlib
+import hashlib
+import hmac
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import tornado.web
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.httpserver import HTTPServer
+from telegram import Bot, Update
+
+import dispatch
+import metrics
+import shared_cache
+import utils
+import webserver
+
+__all__ = ["HashRing", "run_router"]
+
+logger = logging.getLogger(__name__)
+
+SHARD_REPLICAS = utils.env_int("SHARD_REPLICAS", 160)  # points per worker on the hash ring
+SHARD_FORWARD_TIMEOUT = utils.env_float("SHARD_FORWARD_TIMEOUT", 10.0)  # seconds to hand an update to a worker
+RESTART_DELAY = 1.0  # seconds before restarting a worker that exited
+
+_FORWARDED = metrics.Counter(
+    "mcstat_router_updates_total",
+    "Updates forwarded by the shard router, by worker and outcome (the worker's HTTP status or error).",
+    ("worker", "outcome"),
+)
+_FORWARD_SECONDS = metrics.Histogram(
+    "mcstat_router_forward_seconds",
+    "Time for a worker to accept a forwarded update.",
+    ("worker",),
+)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to nodes, ``replicas`` points per node."""
+
+    def __init__(self, nodes: Sequence[str], *, replicas: int = SHARD_REPLICAS) -> None:
+        if not nodes:
+            raise ValueError("A hash ring needs at least one node")
+        points = sorted((_hash(f"{node}#{index}"), node) for node in nodes for index in range(max(1, replicas)))
+        self.nodes = tuple(nodes)
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: object) -> str:
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._nodes[index]
+
+
+def _route_key(data: dict) -> object:
+    key = dispatch.ordering_key(Update.de_json(data, None))
+    # Updates without a chat or user need no ordering; spread them evenly.
+    return key if key is not None else f"update:{data.get('update_id')}"
+
+
+class _RouterHandler(tornado.web.RequestHandler):
+    def initialize(self, ring: HashRing, url_path: str, secret_token: str | None) -> None:
+        self._ring = ring
+        self._url_path = url_path
+        self._secret_token = secret_token
+
+    async def post(self) -> None:
+        received = self.request.headers.get(webserver.SECRET_HEADER, "")
+        if self._secret_token is not None and not hmac.compare_digest(
+            received.encode(), self._secret_token.encode()
+        ):
+            raise tornado.web.HTTPError(403)
+
+        try:
+            data = json.loads(self.request.body)
+            key = _route_key(data)
+        except (ValueError, TypeError, KeyError) as exc:
+            raise tornado.web.HTTPError(400) from exc
+
+        worker = self._ring.node_for(key)
+        request = HTTPRequest(
+            f"{worker}/{self._url_path}",
+            method="POST",
+            body=self.request.body,
+            headers={"Content-Type": "application/json", webserver.SECRET_HEADER: received},
+            request_timeout=SHARD_FORWARD_TIMEOUT,
+        )
+        started = time.perf_counter()
+        try:
+            response = await AsyncHTTPClient().fetch(request, raise_error=False)
+        except Exception as exc:  # noqa: BLE001 - connection refused, timeout
+            _FORWARDED.inc(worker, type(exc).__name__)
+            logger.warning("Worker %s did not take update %s (%s)", worker, data.get("update_id"), exc)
+            # Telegram delivers the update again later, by when the worker may be back.
+            self.set_status(503)
+        else:
+            _FORWARDED.inc(worker, str(response.code))
+            self.set_status(response.code)
+            if "Retry-After" in response.headers:
+                self.set_header("Retry-After", response.headers["Retry-After"])
+        finally:
+            _FORWARD_SECONDS.observe(time.perf_counter() - started, worker)
+        self.finish()
+
+    def log_exception(self, typ, value, tb) -> None:  # noqa: ANN001 - tornado signature
+        if isinstance(value, tornado.web.HTTPError):
+            return
+        logger.error("Router handler failed", exc_info=(typ, value, tb))
+
+
+async def _serve_router(
+    bot: Bot,
+    *,
+    listen: str,
+    port: int,
+    url_path: str,
+    webhook_url: str,
+    secret_token: str | None,
+    workers: Sequence[str],
+    cache_socket: str | None,
+) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGABRT):
+        with contextlib.suppress(NotImplementedError, RuntimeError):
+            loop.add_signal_handler(sig, stop.set)
+
+    ring = HashRing([worker.rstrip("/") for worker in workers])
+    routes = [
+        (
+            rf"/{url_path.strip('/')}/?",
+            _RouterHandler,
+            {"ring": ring, "url_path": url_path.strip("/"), "secret_token": secret_token},
+        )
+    ]
+    AsyncHTTPClient.configure(None, max_clients=256)
+    cache_server = await shared_cache.serve(cache_socket) if cache_socket else None
+    server: HTTPServer = tornado.web.Application(routes + webserver.metrics_routes(secret_token)).listen(port, address=listen)
+    logger.info("Routing updates on port %d to %d worker(s): %s", port, len(ring.nodes), ", ".join(ring.nodes))
+    try:
+        async with bot:
+            await webserver.register_webhook(bot, webserver.fingerprinted_url(webhook_url, secret_token), secret_token)
+            await stop.wait()
+    finally:
+        server.stop()
+        await server.close_all_connections()
+        if cache_server is not None:
+            cache_server.close()
+            await cache_server.wait_closed()
+
+
+def run_router(
+    *,
+    token: str,
+    listen: str,
+    port: int,
+    url_path: str,
+    webhook_url: str,
+    secret_token: str | None,
+    workers: Sequence[str],
+    shared_cache_url: str = "",
+) -> None:
+    """Register the webhook and forward its updates to ``workers`` until SIGINT/SIGTERM.
+
+    A ``unix://`` ``shared_cache_url`` is served by this process.
+    """
+
+    parts = urlsplit(shared_cache_url)
+    cache_socket = parts.netloc + parts.path if parts.scheme == "unix" else None
+    asyncio.run(
+        _serve_router(
+            Bot(token),
+            listen=listen,
+            port=port,
+            url_path=url_path,
+            webhook_url=webhook_url,
+            secret_token=secret_token,
+            workers=workers,
+            cache_socket=cache_socket,
+        )
+    )
+
+
+# ---------------------------------------------------------------------------
+# Single-host launcher
+# ---------------------------------------------------------------------------
+
+
+def _spawn(role: str, port: int, env: dict[str, str]) -> subprocess.Popen:
+    child_env = {**env, "SHARD_ROLE": role, "PORT": str(port)}
+    if role == "worker" and env.get("WATCH_DB"):
+        # Every watch in the file is loaded at startup, so each worker keeps its own.
+        path = Path(env["WATCH_DB"])
+        child_env["WATCH_DB"] = str(path.with_name(f"{path.stem}-{port}{path.suffix}"))
+    return subprocess.Popen([sys.executable, str(Path(__file__).with_name("main.py"))], env=child_env)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the shard router and N bot workers on this host.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="worker processes")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")), help="public webhook port")
+    parser.add_argument("--worker-port", type=int, default=0, help="first worker port (default: --port + 1)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s", level=logging.INFO)
+
+    first_port = args.worker_port or args.port + 1
+    worker_ports = [first_port + index for index in range(max(1, args.workers))]
+    env = dict(os.environ)
+    env["SHARD_WORKERS"] = ",".join(f"http://127.0.0.1:{port}" for port in worker_ports)
+    env.setdefault("SHARED_CACHE", f"unix://{tempfile.gettempdir()}/mcstat-shared-cache-{os.getpid()}.sock")
+
+    stopping = False
+
+    def request_stop(signum: int, frame: object) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    children = {("router", args.port): _spawn("router", args.port, env)}
+    children.update({("worker", port): _spawn("worker", port, env) for port in worker_ports})
+    while not stopping:
+        time.sleep(0.5)
+        for (role, port), child in list(children.items()):
+            if child.poll() is not None and not stopping:
+                logger.warning("%s on port %d exited with %s; restarting", role, port, child.returncode)
+                time.sleep(RESTART_DELAY)
+                children[(role, port)] = _spawn(role, port, env)
+
+    for child in children.values():
+        if child.poll() is None:
+            child.send_signal(signal.SIGTERM)
+    for child in children.values():
+        try:
+            child.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            child.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
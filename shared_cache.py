@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Cache shared by every worker of a sharded deployment.
+
+Workers keep their in-process caches and consult this one only on a local
+miss, so it is off the hot path. Values are short text (JSON) with a TTL.
+:meth:`SharedCache.claim` takes a short lease on a key; the worker holding
+the lease probes a server while the others wait for its result, so a
+popular server is probed once per cluster rather than once per worker.
+
+Two backends, both local to one host and needing no external service:
+
+``sqlite:///path/to/cache.db``
+    A SQLite database in WAL mode that every worker opens.
+``unix:///path/to/cache.sock``
+    A small in-memory cache service (:func:`serve`) on a Unix socket,
+    hosted by the shard router.
+
+Backend failures are logged and treated as misses (and as granted leases),
+so a worker keeps serving on its own when the shared cache is unavailable.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Protocol
+from urllib.parse import urlsplit
+
+import metrics
+
+__all__ = ["SharedCache", "SQLiteSharedCache", "UnixSocketSharedCache", "open_shared_cache", "serve"]
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024  # one request or response line on the socket
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS shared_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS shared_lease (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)",
+)
+PURGE_EVERY = 500  # writes between sweeps of expired SQLite rows
+
+_LOOKUPS = metrics.Counter(
+    "mcstat_shared_cache_lookups_total",
+    "Shared cache lookups by result (hit, miss, error).",
+    ("result",),
+)
+_CLAIMS = metrics.Counter(
+    "mcstat_shared_cache_claims_total",
+    "Probe leases requested from the shared cache, by result (granted, held, error).",
+    ("result",),
+)
+
+
+class SharedCache(Protocol):
+    async def get(self, key: str) -> str | None: ...
+
+    async def set(self, key: str, value: str, ttl: float) -> None: ...
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        """Take the lease on ``key`` for ``ttl`` seconds unless another worker holds it."""
+        ...
+
+    async def release(self, key: str) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+def _owner() -> str:
+    return f"{os.getpid()}-{os.urandom(4).hex()}"
+
+
+class SQLiteSharedCache:
+    """Shared cache in a SQLite WAL database; queries run in a worker thread."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path).expanduser()
+        self.owner = _owner()
+        self._lock = threading.Lock()
+        self._writes = 0
+        if self.path.parent and not self.path.parent.exists():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=1.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            connection.execute(statement)
+        self._connection: sqlite3.Connection | None = connection
+
+    async def _call(self, function: Any, *args: Any) -> Any:
+        return await asyncio.to_thread(self._locked, function, *args)
+
+    def _locked(self, function: Any, *args: Any) -> Any:
+        with self._lock:
+            if self._connection is None:
+                raise RuntimeError("shared cache is closed")
+            return function(self._connection, *args)
+
+    async def get(self, key: str) -> str | None:
+        try:
+            value = await self._call(_sqlite_get, key, time.time())
+        except Exception as exc:  # noqa: BLE001 - a broken shared cache is a miss
+            logger.debug("Shared cache get failed (%s)", exc)
+            _LOOKUPS.inc("error")
+            return None
+        _LOOKUPS.inc("miss" if value is None else "hit")
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._writes += 1
+        purge = self._writes % PURGE_EVERY == 0
+        try:
+            await self._call(_sqlite_set, key, value, time.time(), ttl, purge)
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("Shared cache set failed (%s)", exc)
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        try:
+            granted = await self._call(_sqlite_claim, key, self.owner, time.time(), ttl)
+        except Exception as exc:  # noqa: BLE001 - probe locally rather than wait on nobody
+            logger.debug("Shared cache claim failed (%s)", exc)
+            _CLAIMS.inc("error")
+            return True
+        _CLAIMS.inc("granted" if granted else "held")
+        return granted
+
+    async def release(self, key: str) -> None:
+        try:
+            await self._call(_sqlite_release, key, self.owner)
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("Shared cache release failed (%s)", exc)
+
+    async def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def _sqlite_get(connection: sqlite3.Connection, key: str, now: float) -> str | None:
+    row = connection.execute(
+        "SELECT value FROM shared_cache WHERE key = ? AND expires_at > ?", (key, now)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _sqlite_set(connection: sqlite3.Connection, key: str, value: str, now: float, ttl: float, purge: bool) -> None:
+    connection.execute(
+        "INSERT OR REPLACE INTO shared_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl)
+    )
+    if purge:
+        connection.execute("DELETE FROM shared_cache WHERE expires_at <= ?", (now,))
+        connection.execute("DELETE FROM shared_lease WHERE expires_at <= ?", (now,))
+
+
+def _sqlite_claim(connection: sqlite3.Connection, key: str, owner: str, now: float, ttl: float) -> bool:
+    cursor = connection.execute(
+        "INSERT INTO shared_lease (key, owner, expires_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+        "WHERE shared_lease.expires_at <= ? OR shared_lease.owner = excluded.owner",
+        (key, owner, now + ttl, now),
+    )
+    return cursor.rowcount == 1
+
+
+def _sqlite_release(connection: sqlite3.Connection, key: str, owner: str) -> None:
+    connection.execute("DELETE FROM shared_lease WHERE key = ? AND owner = ?", (key, owner))
+
+
+class UnixSocketSharedCache:
+    """Client of the :func:`serve` cache service; one connection, one request at a time."""
+
+    def __init__(self, path: str | Path, *, timeout: float = 1.0) -> None:
+        self.path = str(Path(path).expanduser())
+        self.timeout = timeout
+        self.owner = _owner()
+        self._lock = asyncio.Lock()
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def _request(self, request: dict[str, Any]) -> dict[str, Any]:
+        async with self._lock:
+            try:
+                return await asyncio.wait_for(self._roundtrip(request), self.timeout)
+            except BaseException:
+                # A half-read reply would desynchronise the next request.
+                await self._disconnect()
+                raise
+
+    async def _roundtrip(self, request: dict[str, Any]) -> dict[str, Any]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_unix_connection(self.path, limit=MAX_MESSAGE_BYTES)
+        assert self._reader is not None
+        self._writer.write(json.dumps(request, separators=(",", ":")).encode() + b"\n")
+        await self._writer.drain()
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("shared cache service closed the connection")
+        return json.loads(line)
+
+    async def _disconnect(self) -> None:
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:  # noqa: BLE001 - already broken
+                pass
+
+    async def get(self, key: str) -> str | None:
+        try:
+            value = (await self._request({"op": "get", "key": key})).get("value")
+        except Exception as exc:  # noqa: BLE001 - a broken shared cache is a miss
+            logger.debug("Shared cache get failed (%s)", exc)
+            _LOOKUPS.inc("error")
+            return None
+        _LOOKUPS.inc("miss" if value is None else "hit")
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        try:
+            await self._request({"op": "set", "key": key, "value": value, "ttl": ttl})
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("Shared cache set failed (%s)", exc)
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        try:
+            granted = bool((await self._request({"op": "claim", "key": key, "ttl": ttl, "owner": self.owner})).get("ok"))
+        except Exception as exc:  # noqa: BLE001 - probe locally rather than wait on nobody
+            logger.debug("Shared cache claim failed (%s)", exc)
+            _CLAIMS.inc("error")
+            return True
+        _CLAIMS.inc("granted" if granted else "held")
+        return granted
+
+    async def release(self, key: str) -> None:
+        try:
+            await self._request({"op": "release", "key": key, "owner": self.owner})
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("Shared cache release failed (%s)", exc)
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._disconnect()
+
+
+def open_shared_cache(url: str) -> SharedCache:
+    """Open the backend named by ``url`` (``sqlite:///path`` or ``unix:///path``)."""
+
+    parts = urlsplit(url)
+    path = parts.netloc + parts.path
+    if not path:
+        raise ValueError(f"Shared cache URL has no path: {url!r}")
+    if parts.scheme == "sqlite":
+        return SQLiteSharedCache(path)
+    if parts.scheme == "unix":
+        return UnixSocketSharedCache(path)
+    raise ValueError(f"Unsupported shared cache URL {url!r}; use sqlite:///path or unix:///path")
+
+
+# ---------------------------------------------------------------------------
+# Unix socket service
+# ---------------------------------------------------------------------------
+
+
+class _Store:
+    """The service's state: an LRU of ``key -> (expires_at, value)`` plus leases."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.leases: dict[str, tuple[float, str]] = {}
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        op = request.get("op")
+        key = str(request.get("key", ""))
+        now = time.monotonic()
+        if op == "get":
+            item = self.entries.get(key)
+            if item is None or item[0] <= now:
+                self.entries.pop(key, None)
+                return {"value": None}
+            self.entries.move_to_end(key)
+            return {"value": item[1]}
+        if op == "set":
+            self.entries[key] = (now + float(request["ttl"]), str(request["value"]))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return {"ok": True}
+        if op == "claim":
+            lease = self.leases.get(key)
+            if lease is not None and lease[0] > now and lease[1] != request.get("owner"):
+                return {"ok": False}
+            self.leases[key] = (now + float(request["ttl"]), str(request.get("owner")))
+            if len(self.leases) > self.max_entries:
+                self.leases = {k: v for k, v in self.leases.items() if v[0] > now}
+            return {"ok": True}
+        if op == "release":
+            lease = self.leases.get(key)
+            if lease is not None and lease[1] == request.get("owner"):
+                del self.leases[key]
+            return {"ok": True}
+        return {"error": f"unknown op {op!r}"}
+
+
+async def serve(path: str | Path, *, max_entries: int = 50_000) -> asyncio.AbstractServer:
+    """Start the in-memory cache service on a Unix socket at ``path``."""
+
+    store = _Store(max_entries)
+    path = Path(path).expanduser()
+    if path.exists():
+        path.unlink()  # left over from a previous run
+
+    async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    reply = store.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError) as exc:
+                    reply = {"error": str(exc)}
+                writer.write(json.dumps(reply, separators=(",", ":")).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError) as exc:  # ValueError: line over the read limit
+            logger.debug("Shared cache client dropped (%s)", exc)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(handle_client, path, limit=MAX_MESSAGE_BYTES)
+    logger.info("Serving the shared cache on %s", path)
+    return server
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Asyncio client for the Minecraft Java Server List Ping.
+
+:func:`status` runs handshake, status request and ping/pong on one TCP
+connection on the event loop, and cancelling it (a deadline, a timeout)
+closes the socket at once. Given an ``ip`` no worker thread is involved;
+without one, ``asyncio.open_connection`` looks the host up with
+``getaddrinfo`` on the default executor. Replies are
+decoded as they arrive: VarInts a byte at a time, the status JSON chunk by
+chunk through an incremental UTF-8 decoder. Every length the server sends is
+checked against :data:`MAX_RESPONSE_BYTES` before anything is read, so a
+broken or hostile server cannot make the bot buffer more than that.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import contextlib
+import json
+import os
+import struct
+import time
+from dataclasses import dataclass
+
+import utils
+
+__all__ = ["StatusResponse", "ProtocolError", "status"]
+
+MAX_RESPONSE_BYTES = utils.env_int("SLP_MAX_RESPONSE", 1 << 20)  # largest status packet accepted
+PROTOCOL_VERSION = 47  # what mcstatus announces; servers answer status for any version
+READ_CHUNK = 16 * 1024
+MAX_SAMPLE = 100  # player names kept from the sample
+MAX_COMPONENT_DEPTH = 32  # nesting allowed in a chat-component description
+PING_TIMEOUT = 1.0  # seconds to wait for the pong once the status is in hand
+
+
+class ProtocolError(OSError):
+    """The server answered, but not with a valid Server List Ping reply."""
+
+
+@dataclass(frozen=True, slots=True)
+class StatusResponse:
+    """The parts of a status reply the bot uses; ``latency`` is in milliseconds."""
+
+    description: str
+    version_name: str
+    version_protocol: int
+    players_online: int
+    players_max: int
+    player_names: tuple[str, ...]
+    latency: float
+
+
+def _varint(value: int) -> bytes:
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _frame(payload: bytes) -> bytes:
+    return _varint(len(payload)) + payload
+
+
+def _handshake(host: str, port: int) -> bytes:
+    encoded = host.encode("utf-8")
+    return _frame(
+        b"\x00" + _varint(PROTOCOL_VERSION) + _varint(len(encoded)) + encoded + struct.pack(">H", port) + b"\x01"
+    )
+
+
+async def _read_varint(reader: asyncio.StreamReader) -> tuple[int, int]:
+    """Return a VarInt from the stream and how many bytes it took."""
+
+    result = 0
+    for index in range(5):
+        byte = (await reader.readexactly(1))[0]
+        result |= (byte & 0x7F) << (7 * index)
+        if not byte & 0x80:
+            return result, index + 1
+    raise ProtocolError("VarInt is longer than 5 bytes")
+
+
+async def _read_text(reader: asyncio.StreamReader, size: int) -> str:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts: list[str] = []
+    while size:
+        chunk = await reader.read(min(size, READ_CHUNK))
+        if not chunk:
+            raise ProtocolError("Connection closed in the middle of the status reply")
+        size -= len(chunk)
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+async def _read_status_json(reader: asyncio.StreamReader, limit: int) -> dict:
+    length, _ = await _read_varint(reader)
+    if length > limit:
+        raise ProtocolError(f"Status packet of {length} bytes exceeds the {limit} byte limit")
+    packet_id, id_size = await _read_varint(reader)
+    if packet_id != 0x00:
+        raise ProtocolError(f"Expected a status response, got packet {packet_id:#04x}")
+    size, size_size = await _read_varint(reader)
+    if size != length - id_size - size_size:
+        raise ProtocolError("Status JSON length does not match its packet")
+    try:
+        data = json.loads(await _read_text(reader, size))
+    except (UnicodeDecodeError, ValueError, RecursionError) as exc:
+        raise ProtocolError(f"Status reply is not valid JSON: {exc}") from exc
+    if not isinstance(data, dict):
+        raise ProtocolError("Status JSON is not an object")
+    return data
+
+
+async def _ping(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> float:
+    token = int.from_bytes(os.urandom(8), "big", signed=True)
+    started = time.perf_counter()
+    writer.write(_frame(b"\x01" + struct.pack(">q", token)))
+    await writer.drain()
+    length, _ = await _read_varint(reader)
+    if length != 9:
+        raise ProtocolError(f"Pong packet of {length} bytes, expected 9")
+    packet = await reader.readexactly(9)
+    if packet[0] != 0x01 or struct.unpack(">q", packet[1:])[0] != token:
+        raise ProtocolError("Pong does not echo the ping")
+    return (time.perf_counter() - started) * 1000
+
+
+def _component_text(value: object, depth: int = 0) -> str:
+    """Flatten a chat component (string, object with ``extra`` or list) to text."""
+
+    if depth > MAX_COMPONENT_DEPTH:
+        raise ProtocolError("Description nests too deeply")
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "".join(_component_text(part, depth + 1) for part in value)
+    if isinstance(value, dict):
+        extra = value.get("extra")
+        text = _component_text(value.get("text", ""), depth + 1)
+        return text + _component_text(extra, depth + 1) if isinstance(extra, list) else text
+    if value is None:
+        return ""
+    return str(value)
+
+
+def _int_field(data: dict, key: str) -> int:
+    value = data.get(key)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ProtocolError(f"Status field {key!r} is not an integer")
+    return value
+
+
+def _parse(data: dict, latency: float) -> StatusResponse:
+    players = data.get("players")
+    version = data.get("version")
+    if not isinstance(players, dict):
+        raise ProtocolError("Status field 'players' is not an object")
+    if not isinstance(version, dict):
+        raise ProtocolError("Status field 'version' is not an object")
+
+    sample = players.get("sample")
+    names: list[str] = []
+    if isinstance(sample, list):
+        for entry in sample[:MAX_SAMPLE]:
+            name = entry.get("name") if isinstance(entry, dict) else None
+            if isinstance(name, str) and name:
+                names.append(name)
+
+    protocol = version.get("protocol")
+    return StatusResponse(
+        description=_component_text(data.get("description", "")),
+        version_name=str(version.get("name", "Unknown")),
+        version_protocol=protocol if isinstance(protocol, int) else -1,
+        players_online=_int_field(players, "online"),
+        players_max=_int_field(players, "max"),
+        player_names=tuple(names),
+        latency=latency,
+    )
+
+
+async def status(
+    host: str,
+    port: int,
+    *,
+    ip: str | None = None,
+    timeout: float,
+    max_bytes: int = MAX_RESPONSE_BYTES,
+) -> StatusResponse:
+    """Ping ``host:port`` and return its status.
+
+    ``ip`` skips the name lookup when the address is already resolved; the
+    handshake still names ``host`` so proxies route by it. ``timeout`` bounds
+    the whole exchange; a missing pong only costs :data:`PING_TIMEOUT`. Raises :class:`OSError` (including
+    :class:`ProtocolError`) or :class:`TimeoutError`.
+    """
+
+    async with asyncio.timeout(timeout) as scope:
+        reader, writer = await asyncio.open_connection(ip or host, port, limit=READ_CHUNK)
+        try:
+            started = time.perf_counter()
+            writer.write(_handshake(host, port) + _frame(b"\x00"))
+            await writer.drain()
+            try:
+                data = await _read_status_json(reader, max_bytes)
+            except asyncio.IncompleteReadError as exc:
+                raise ProtocolError("Connection closed before the status reply") from exc
+            latency = (time.perf_counter() - started) * 1000
+            # Never let the pong cost the status already in hand: wait at most
+            # PING_TIMEOUT, and at most half of what is left of ``timeout``.
+            remaining = scope.when() - asyncio.get_running_loop().time()
+            try:
+                async with asyncio.timeout(min(PING_TIMEOUT, remaining / 2)):
+                    latency = await _ping(reader, writer)
+            except (asyncio.IncompleteReadError, ConnectionError, ProtocolError, TimeoutError):
+                # Some proxies hang up after the status, or never answer the
+                # ping; the status round trip is close enough.
+                pass
+            return _parse(data, latency)
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
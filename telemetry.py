@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Bot-side instrumentation: Bot API latency, update counts and the worker pool.
+
+Everything here only touches :mod:`metrics` objects, so it is cheap enough to
+stay enabled in production.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, ContextTypes, TypeHandler
+from telegram.request import HTTPXRequest
+
+import boot
+import metrics
+import tracing
+
+__all__ = ["CountingExecutor", "InstrumentedRequest", "install_executor", "install_update_counter"]
+
+_BOT_API_SECONDS = metrics.Histogram(
+    "mcstat_bot_api_seconds",
+    "Telegram Bot API request latency by method and outcome.",
+    ("method", "outcome"),
+)
+_UPDATES = metrics.Counter(
+    "mcstat_updates_total",
+    "Updates received, by kind (command, callback, inline, other) and name.",
+    ("kind", "name"),
+)
+_THREAD_POOL_QUEUE = metrics.Gauge(
+    "mcstat_thread_pool_queue_depth",
+    "Blocking calls waiting for a worker thread.",
+)
+_THREAD_POOL_BUSY = metrics.Gauge(
+    "mcstat_thread_pool_busy",
+    "Worker threads running a blocking call.",
+)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """:class:`HTTPXRequest` that records the latency of every Bot API call."""
+
+    async def do_request(self, url: str, method: str, request_data=None, **kwargs: Any) -> tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        with tracing.span(f"bot.{endpoint}"):
+            try:
+                code, payload = await super().do_request(url, method, request_data, **kwargs)
+            except BaseException as exc:
+                _BOT_API_SECONDS.observe(time.perf_counter() - started, endpoint, type(exc).__name__)
+                raise
+            # Error statuses (429 flood waits, 400s) become exceptions later, in the caller.
+            outcome = "ok" if code < 400 else f"http_{code}"
+            _BOT_API_SECONDS.observe(time.perf_counter() - started, endpoint, outcome)
+            tracing.annotate(status_code=code)
+        return code, payload
+
+
+def install_update_counter(application: Application, *, callbacks: Iterable[str]) -> None:
+    """Count every update by command / callback name before the real handlers run.
+
+    The first update counted also closes the boot timeline (see :mod:`boot`).
+
+    Call this after the command handlers are registered; commands and callback
+    data outside the known set are counted as ``other`` to bound label values.
+    """
+
+    known_commands = frozenset(
+        command
+        for handlers in application.handlers.values()
+        for handler in handlers
+        if isinstance(handler, CommandHandler)
+        for command in handler.commands
+    )
+    known_callbacks = frozenset(callbacks)
+
+    async def count(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        boot.first_update()
+        if update.callback_query is not None:
+            data = update.callback_query.data or ""
+            _UPDATES.inc("callback", data if data in known_callbacks else "other")
+        elif update.inline_query is not None:
+            _UPDATES.inc("inline", "query")
+        elif update.message is not None and (update.message.text or "").startswith("/"):
+            command = update.message.text[1:].split("@", 1)[0].split(maxsplit=1)
+            name = command[0].lower() if command else ""
+            _UPDATES.inc("command", name if name in known_commands else "other")
+        else:
+            _UPDATES.inc("other", "other")
+
+    application.add_handler(TypeHandler(Update, count), group=-1)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    """:class:`ThreadPoolExecutor` that counts its queued and running calls itself."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._counts_lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+
+    def submit(self, fn, /, *args: Any, **kwargs: Any):  # noqa: ANN001, ANN201 - Executor signature
+        with self._counts_lock:
+            self.queued += 1
+
+        def call() -> Any:
+            with self._counts_lock:
+                self.queued -= 1
+                self.running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._counts_lock:
+                    self.running -= 1
+
+        try:
+            return super().submit(call)
+        except BaseException:
+            with self._counts_lock:
+                self.queued -= 1
+            raise
+
+
+def install_executor(max_workers: int | None = None) -> CountingExecutor:
+    """Give the running loop a default executor whose backlog is exported as a gauge.
+
+    ``asyncio.to_thread`` and the sync mcstatus lookup and query fallbacks run here.
+    """
+
+    executor = CountingExecutor(max_workers=max_workers, thread_name_prefix="mcstat")
+    asyncio.get_running_loop().set_default_executor(executor)
+    _THREAD_POOL_QUEUE.set_function(lambda: executor.queued)
+    _THREAD_POOL_BUSY.set_function(lambda: executor.running)
+    return executor
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+import breaker
+import commands
+from commands import BatchMiss
+from deadline import Deadline
+
+
+def _snapshot(address: str) -> commands.ServerSnapshot:
+    return commands.ServerSnapshot(
+        address=address,
+        fetched_at=datetime.now(timezone.utc),
+        description="A Minecraft Server",
+        version_name="Paper 1.20.4",
+        latency_ms=42,
+        players_online=3,
+        players_max=20,
+        player_names=(),
+        query_available=False,
+        query_error=None,
+    )
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """Replace the snapshot probe with one that behaves according to the address."""
+
+    budgets = {}
+
+    async def build_snapshot(address: str, *, include_query: bool, budget: Deadline) -> commands.ServerSnapshot:
+        budgets[address] = budget.budget
+        if address.startswith("slow"):
+            await budget.run("status", asyncio.sleep(10))
+        if address.startswith("open"):
+            raise breaker.CircuitOpenError(address)
+        if address.startswith("down"):
+            raise ConnectionRefusedError(address)
+        return _snapshot(address)
+
+    monkeypatch.setattr(commands, "_build_snapshot", build_snapshot)
+    monkeypatch.setattr(commands, "BATCH_CONCURRENCY", 2)
+    return budgets
+
+
+def test_parse_address_args_splits_and_deduplicates():
+    args = ["a.example,B.example", "a.example.", " ", "c.example:25566,,b.example", "not valid!"]
+
+    assert commands._parse_address_args(args) == ["a.example", "B.example", "c.example:25566", "not valid!"]
+
+
+def test_each_probe_gets_its_own_share_of_the_budget(probes):
+    addresses = ["slow.example", "a.example", "b.example", "c.example"]
+
+    results = asyncio.run(commands._build_batch(addresses, Deadline(0.4)))
+
+    assert results[0] == ("slow.example", BatchMiss.TIMEOUT)
+    assert [type(value) for _, value in results[1:]] == [commands.ServerSnapshot] * 3
+    # Two rounds of two: the first probes may use half of what is left.
+    assert probes["slow.example"] <= 0.2
+    assert max(probes.values()) <= commands.DEADLINES["status"]
+
+
+def test_failures_are_reported_per_row(probes):
+    addresses = ["a.example", "open.example", "down.example"]
+
+    results = dict(asyncio.run(commands._build_batch(addresses, Deadline(2))))
+
+    assert results["open.example"] is BatchMiss.SKIPPED
+    assert results["down.example"] is BatchMiss.OFFLINE
+    assert isinstance(results["a.example"], commands.ServerSnapshot)
+
+
+def test_spent_budget_skips_the_remaining_probes(probes):
+    now = [0.0]
+    budget = Deadline(1.0, clock=lambda: now[0])
+    now[0] = 1.0
+
+    results = asyncio.run(commands._build_batch(["a.example", "b.example"], budget))
+
+    assert results == [("a.example", BatchMiss.SKIPPED), ("b.example", BatchMiss.SKIPPED)]
+    assert probes == {}
+
+
+def test_batch_message_counts_rows_and_notes():
+    results = [
+        ("a.example", _snapshot("a.example")),
+        ("down.example", BatchMiss.OFFLINE),
+        ("slow.example", BatchMiss.TIMEOUT),
+        ("open.example", BatchMiss.SKIPPED),
+    ]
+
+    text = commands._batch_message(results, ignored=3)
+
+    assert "`1 / 4`" in text
+    assert "3/20" in text and "42 ms" in text
+    assert "🔴" in text and "offline" in text
+    assert "🟡" in text and "timeout" in text
+    assert "⚪" in text and "not checked" in text
+    assert "2 server(s) could not be checked in time" in text
+    assert "3 more address(es) ignored" in text
+
+
+def test_batch_message_truncates_long_addresses():
+    address = "a" * (commands.BATCH_ADDRESS_WIDTH + 10) + ".example"
+
+    text = commands._batch_message([(address, BatchMiss.OFFLINE)])
+
+    assert address not in text
+    assert "a" * (commands.BATCH_ADDRESS_WIDTH - 1) + "…" in text
+    assert "ignored" not in text and "in time" not in text
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+
+import pytest
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def breaker(clock) -> CircuitBreaker:
+    return CircuitBreaker("test", failure_threshold=3, failure_window=60.0, reset_timeout=30.0, clock=clock)
+
+
+def _trip(breaker: CircuitBreaker, key: str) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(key)
+
+
+def test_opens_after_threshold_failures_within_window(breaker):
+    breaker.record_failure("a")
+    breaker.record_failure("a")
+    assert breaker.state("a") == CLOSED
+    breaker.before_call("a")
+
+    breaker.record_failure("a")
+
+    assert breaker.state("a") == OPEN
+    assert breaker.is_open("a")
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("a")
+
+
+def test_failures_outside_the_window_start_a_new_count(breaker, clock):
+    breaker.record_failure("a")
+    breaker.record_failure("a")
+
+    clock.now += 61.0
+    breaker.record_failure("a")
+
+    assert breaker.state("a") == CLOSED
+    assert breaker.failures("a") == 1
+
+
+def test_success_resets_the_endpoint(breaker):
+    breaker.record_failure("a")
+    breaker.record_failure("a")
+    breaker.record_success("a")
+    breaker.record_failure("a")
+
+    assert breaker.state("a") == CLOSED
+    assert breaker.failures("a") == 1
+
+
+def test_half_open_lets_exactly_one_probe_through(breaker, clock):
+    _trip(breaker, "a")
+
+    clock.now += 30.0
+    assert not breaker.is_open("a")
+    breaker.before_call("a")
+    assert breaker.state("a") == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("a")
+
+
+def test_failed_half_open_probe_reopens(breaker, clock):
+    _trip(breaker, "a")
+    clock.now += 30.0
+    breaker.before_call("a")
+
+    breaker.record_failure("a")
+
+    assert breaker.state("a") == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("a")
+
+
+def test_successful_half_open_probe_closes(breaker, clock):
+    _trip(breaker, "a")
+    clock.now += 30.0
+    breaker.before_call("a")
+
+    breaker.record_success("a")
+
+    assert breaker.state("a") == CLOSED
+    breaker.before_call("a")
+
+
+def test_release_frees_the_half_open_slot(breaker, clock):
+    _trip(breaker, "a")
+    clock.now += 30.0
+    breaker.before_call("a")
+
+    breaker.release("a")
+
+    breaker.before_call("a")
+
+
+def test_endpoints_are_independent(breaker):
+    _trip(breaker, "a")
+
+    breaker.before_call("b")
+    assert breaker.state("b") == CLOSED
+
+
+def test_oldest_endpoints_are_trimmed():
+    breaker = CircuitBreaker("test", failure_threshold=3, failure_window=60.0, reset_timeout=30.0, max_entries=2)
+    for key in ("a", "b", "c"):
+        breaker.record_failure(key)
+
+    assert breaker.failures("a") == 0
+    assert breaker.failures("c") == 1
+
+
+def test_guard_records_failures_and_releases_on_cancellation(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, failure_window=60.0, reset_timeout=30.0, clock=clock)
+
+    async def fail() -> None:
+        async with breaker.guard("a"):
+            raise ConnectionRefusedError
+
+    async def cancelled() -> None:
+        async with breaker.guard("a"):
+            raise asyncio.CancelledError
+
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(fail())
+    assert breaker.state("a") == OPEN
+
+    clock.now += 30.0
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancelled())
+    assert breaker.state("a") == HALF_OPEN
+    breaker.before_call("a")
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+
+import pytest
+
+import utils
+from cache import RenderCache, SingleFlight, SnapshotCache
+
+
+@pytest.fixture
+def cache(clock) -> SnapshotCache[str]:
+    return SnapshotCache(max_entries=8, status_ttl=30.0, query_ttl=60.0, clock=clock)
+
+
+@pytest.mark.parametrize(
+    ("address", "expected"),
+    [
+        ("Play.Example.NET", "play.example.net"),
+        ("play.example.net.", "play.example.net"),
+        ("  play.example.net  ", "play.example.net"),
+        ("PLAY.example.net:25566", "play.example.net:25566"),
+        ("play.example.net.:25565", "play.example.net:25565"),
+    ],
+)
+def test_normalize_address_folds_case_and_trailing_dot(address, expected):
+    assert utils.normalize_address(address) == expected
+
+
+def test_normalize_address_keeps_explicit_port_distinct_from_bare_host():
+    assert utils.normalize_address("play.example.net") != utils.normalize_address("play.example.net:25565")
+
+
+def test_status_entry_expires_after_status_ttl(cache, clock):
+    cache.put("play.example.net", "snap", include_query=False)
+
+    clock.now += 29.9
+    assert cache.get("PLAY.example.net.", include_query=False) == "snap"
+    clock.now += 0.1
+    assert cache.get("play.example.net", include_query=False) is None
+
+
+def test_query_entry_answers_status_lookups_within_status_ttl(cache, clock):
+    cache.put("play.example.net", "full", include_query=True)
+
+    clock.now += 20.0
+    assert cache.get("play.example.net", include_query=False) == "full"
+    clock.now += 20.0
+    assert cache.get("play.example.net", include_query=False) is None
+    assert cache.get("play.example.net", include_query=True) == "full"
+    clock.now += 20.0
+    assert cache.get("play.example.net", include_query=True) is None
+
+
+def test_status_entry_does_not_answer_query_lookups(cache):
+    cache.put("play.example.net", "snap", include_query=False)
+
+    assert cache.get("play.example.net", include_query=True) is None
+
+
+def test_put_age_backdates_the_entry(cache, clock):
+    cache.put("play.example.net", "snap", include_query=False, age=25.0)
+
+    clock.now += 5.0
+    assert cache.get("play.example.net", include_query=False) is None
+
+
+def test_latest_serves_stale_entries_up_to_max_stale(clock):
+    cache = SnapshotCache(max_entries=8, status_ttl=30.0, query_ttl=60.0, max_stale=120.0, clock=clock)
+    cache.put("play.example.net", "snap", include_query=False)
+
+    clock.now += 90.0
+    assert cache.get("play.example.net", include_query=False) is None
+    assert cache.latest("play.example.net") == (90.0, "snap")
+    clock.now += 30.0
+    assert cache.latest("play.example.net") is None
+
+
+def test_latest_prefers_the_newest_kind(cache, clock):
+    cache.put("play.example.net", "full", include_query=True)
+    clock.now += 10.0
+    cache.put("play.example.net", "snap", include_query=False)
+
+    assert cache.latest("play.example.net") == (0.0, "snap")
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = SnapshotCache(max_entries=2, status_ttl=30.0, query_ttl=60.0, clock=clock)
+    cache.put("a.example", "a", include_query=False)
+    cache.put("b.example", "b", include_query=False)
+    assert cache.get("a.example", include_query=False) == "a"
+
+    cache.put("c.example", "c", include_query=False)
+
+    assert len(cache) == 2
+    assert cache.get("b.example", include_query=False) is None
+    assert cache.get("a.example", include_query=False) == "a"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_zero_capacity_disables_the_cache():
+    cache = SnapshotCache(max_entries=0, status_ttl=30.0, query_ttl=60.0)
+    cache.put("play.example.net", "snap", include_query=False)
+
+    assert len(cache) == 0
+    assert cache.get("play.example.net", include_query=False) is None
+
+
+def test_single_flight_shares_one_call_between_concurrent_callers():
+    async def main() -> tuple[list[str], int, bool]:
+        flights: SingleFlight[str, str] = SingleFlight()
+        calls = []
+
+        async def probe() -> str:
+            calls.append("probe")
+            await asyncio.sleep(0.01)
+            return "snapshot"
+
+        results = await asyncio.gather(*(flights.run("play.example.net", probe) for _ in range(5)))
+        return results, len(calls), flights.in_flight("play.example.net")
+
+    results, calls, in_flight = asyncio.run(main())
+    assert results == ["snapshot"] * 5
+    assert calls == 1
+    assert not in_flight
+
+
+def test_single_flight_shares_failures_and_forgets_the_key():
+    async def main() -> int:
+        flights: SingleFlight[str, str] = SingleFlight()
+        calls = 0
+
+        async def probe() -> str:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0)
+            raise ConnectionRefusedError
+
+        for outcome in await asyncio.gather(*(flights.run("a", probe) for _ in range(3)), return_exceptions=True):
+            assert isinstance(outcome, ConnectionRefusedError)
+        with pytest.raises(ConnectionRefusedError):
+            await flights.run("a", probe)
+        return calls
+
+    assert asyncio.run(main()) == 2
+
+
+def test_single_flight_keeps_running_when_a_waiter_is_cancelled():
+    async def main() -> tuple[str, int]:
+        flights: SingleFlight[str, str] = SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def probe() -> str:
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "snapshot"
+
+        first = asyncio.create_task(flights.run("a", probe))
+        second = asyncio.create_task(flights.run("a", probe))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await second, calls
+
+    assert asyncio.run(main()) == ("snapshot", 1)
+
+
+def test_render_cache_renders_each_view_once_per_object():
+    renders = []
+
+    def render(value: tuple[str, ...]) -> str:
+        renders.append(value)
+        return ", ".join(value)
+
+    cache = RenderCache(max_entries=4)
+    value = ("Alex", "Steve")
+    assert cache.render(value, "players", render) == "Alex, Steve"
+    assert cache.render(value, "players", render) == "Alex, Steve"
+    cache.render(value, "status", render)
+    cache.render(tuple(["Alex", "Steve"]), "players", render)  # equal but not the same object
+
+    assert len(renders) == 3
+
+
+def test_render_cache_is_bounded_and_can_be_disabled():
+    cache = RenderCache(max_entries=2)
+    values = [(str(index),) for index in range(3)]
+    for value in values:
+        cache.render(value, "status", "".join)
+    assert len(cache) == 2
+
+    disabled = RenderCache(max_entries=0)
+    assert disabled.render(values[0], "status", "".join) == "0"
+    assert len(disabled) == 0
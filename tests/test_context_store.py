@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import pytest
+
+from context_store import _ENTRY_OVERHEAD, MessageContextStore
+
+# Values are ``(address, snapshot)``; equal snapshots are shared.
+SNAPSHOT_BYTES = 1000
+INTERNING = {
+    "intern_key": lambda value: value[1],
+    "intern": lambda value, canonical: canonical,
+    "size_of": lambda value: SNAPSHOT_BYTES,
+}
+
+
+@pytest.fixture
+def store(clock) -> MessageContextStore[tuple[str, str]]:
+    return MessageContextStore(per_chat_limit=3, max_bytes=1 << 20, idle_ttl=3600.0, clock=clock, **INTERNING)
+
+
+def test_get_returns_what_was_put(store):
+    store.put(1, 10, ("a.example", "snap-a"))
+
+    assert store.get(1, 10) == ("a.example", "snap-a")
+    assert store.get(1, 11) is None
+    assert store.get(2, 10) is None
+
+
+def test_per_chat_quota_evicts_the_oldest_message(store):
+    for message_id in range(5):
+        store.put(1, message_id, ("a.example", f"snap-{message_id}"))
+
+    assert len(store) == 3
+    assert store.get(1, 0) is None
+    assert store.get(1, 4) is not None
+
+
+def test_equal_values_are_interned_and_counted_once(store):
+    first = ("a.example", "snap")
+    kept = [store.put(chat_id, 1, ("a.example", "".join(["sn", "ap"]))) for chat_id in range(50)]
+    store.put(99, 1, first)
+
+    assert all(value is kept[0] for value in kept)
+    assert store.bytes == SNAPSHOT_BYTES + 51 * _ENTRY_OVERHEAD
+
+    for chat_id in (*range(50), 99):
+        store.drop_chat(chat_id)
+    assert store.bytes == 0
+    assert len(store) == 0
+
+
+def test_byte_budget_evicts_from_the_least_recently_used_chat(clock):
+    budget = 3 * (SNAPSHOT_BYTES + _ENTRY_OVERHEAD)
+    store = MessageContextStore(per_chat_limit=3, max_bytes=budget, idle_ttl=3600.0, clock=clock, **INTERNING)
+    store.put(1, 1, ("a.example", "a"))
+    store.put(2, 1, ("b.example", "b"))
+    store.put(3, 1, ("c.example", "c"))
+    store.get(1, 1)
+
+    store.put(4, 1, ("d.example", "d"))
+
+    assert store.get(2, 1) is None
+    assert store.get(1, 1) is not None
+    assert store.get(4, 1) is not None
+    assert store.bytes <= store.max_bytes
+
+
+def test_budget_never_evicts_the_entry_just_written(clock):
+    store = MessageContextStore(per_chat_limit=3, max_bytes=10, idle_ttl=3600.0, clock=clock, **INTERNING)
+    store.put(1, 1, ("a.example", "a"))
+
+    assert store.get(1, 1) == ("a.example", "a")
+
+
+def test_idle_chats_are_dropped(clock):
+    store = MessageContextStore(per_chat_limit=3, max_bytes=1 << 20, idle_ttl=60.0, clock=clock, **INTERNING)
+    store.put(1, 1, ("a.example", "a"))
+    clock.now += 30
+    store.put(2, 1, ("b.example", "b"))
+    clock.now += 40
+
+    assert store.get(2, 1) is not None
+    assert store.get(1, 1) is None
+    assert len(store) == 1
+
+
+def test_backfill_keeps_newer_entries_first(clock):
+    store = MessageContextStore(per_chat_limit=2, max_bytes=1 << 20, idle_ttl=3600.0, clock=clock, **INTERNING)
+    store.put(1, 5, ("a.example", "new"))
+    store.backfill(1, 3, ("a.example", "old"))
+    store.backfill(1, 5, ("a.example", "ignored"))
+    store.backfill(1, 2, ("a.example", "over quota"))
+    store.mark_loaded(1)
+
+    store.put(1, 6, ("a.example", "newest"))
+
+    assert store.get(1, 3) is None
+    assert store.get(1, 2) is None
+    assert store.get(1, 5) == ("a.example", "new")
+    assert store.is_loaded(1)
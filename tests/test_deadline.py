@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded
+
+
+def test_remaining_counts_down_and_never_goes_negative(clock):
+    budget = Deadline(5.0, clock=clock)
+    assert budget.remaining() == 5.0
+
+    clock.now += 2.0
+    assert budget.remaining() == 3.0
+    assert not budget.expired
+
+    clock.now += 10.0
+    assert budget.remaining() == 0.0
+    assert budget.expired
+
+
+def test_check_names_the_phase(clock):
+    budget = Deadline(1.0, clock=clock)
+    budget.check("lookup")
+
+    clock.now += 1.0
+    with pytest.raises(DeadlineExceeded) as excinfo:
+        budget.check("lookup")
+    assert excinfo.value.phase == "lookup"
+    assert excinfo.value.budget == 1.0
+
+
+def test_deadline_exceeded_is_a_timeout_error():
+    assert issubclass(DeadlineExceeded, asyncio.TimeoutError)
+
+
+def test_run_returns_the_result_within_budget():
+    async def main() -> str:
+        async def work() -> str:
+            await asyncio.sleep(0)
+            return "ok"
+
+        return await Deadline(1.0).run("status", work())
+
+    assert asyncio.run(main()) == "ok"
+
+
+def test_run_turns_the_timeout_into_deadline_exceeded():
+    async def main() -> None:
+        await Deadline(0.05).run("status", asyncio.sleep(5))
+
+    with pytest.raises(DeadlineExceeded) as excinfo:
+        asyncio.run(main())
+    assert excinfo.value.phase == "status"
+
+
+def test_run_on_expired_budget_closes_the_coroutine(clock):
+    budget = Deadline(1.0, clock=clock)
+    clock.now += 1.0
+    started = []
+
+    async def work() -> None:
+        started.append(True)
+
+    coro = work()
+    with pytest.raises(DeadlineExceeded) as excinfo:
+        asyncio.run(budget.run("query", coro))
+    assert excinfo.value.phase == "query"
+    assert not started
+    assert coro.cr_frame is None
+
+
+def test_run_passes_through_inner_timeouts_while_budget_remains():
+    async def main() -> None:
+        async def work() -> None:
+            raise asyncio.TimeoutError
+
+        await Deadline(5.0).run("status", work())
+
+    with pytest.raises(asyncio.TimeoutError) as excinfo:
+        asyncio.run(main())
+    assert not isinstance(excinfo.value, DeadlineExceeded)
+
+
+def test_shared_budget_shrinks_across_phases():
+    async def main() -> None:
+        budget = Deadline(0.2)
+        await budget.run("lookup", asyncio.sleep(0.15))
+        await budget.run("status", asyncio.sleep(0.15))
+
+    with pytest.raises(DeadlineExceeded) as excinfo:
+        asyncio.run(main())
+    assert excinfo.value.phase == "status"
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+from debounce import RefreshGate
+
+
+def test_first_press_is_not_cooling(clock):
+    gate = RefreshGate(cooldown=5.0, clock=clock)
+
+    assert gate.press((1, 10)) is False
+
+
+def test_presses_within_the_cooldown_reuse_the_last_refresh(clock):
+    gate = RefreshGate(cooldown=5.0, clock=clock)
+    gate.press((1, 10))
+    clock.now += 2.0  # the refresh itself takes time
+    gate.finish((1, 10))
+
+    clock.now += 4.9
+    assert gate.press((1, 10)) is True
+    clock.now += 0.1
+    assert gate.press((1, 10)) is False
+
+
+def test_cooldown_counts_from_the_latest_finish(clock):
+    gate = RefreshGate(cooldown=5.0, clock=clock)
+    gate.finish((1, 10))
+    clock.now += 4.0
+    gate.press((1, 10))
+    gate.finish((1, 10))
+
+    clock.now += 4.0
+    assert gate.press((1, 10)) is True
+
+
+def test_messages_cool_down_independently(clock):
+    gate = RefreshGate(cooldown=5.0, clock=clock)
+    gate.finish((1, 10))
+
+    assert gate.press((1, 11)) is False
+    assert gate.press((2, 10)) is False
+
+
+def test_oldest_messages_are_forgotten(clock):
+    gate = RefreshGate(cooldown=5.0, max_entries=2, clock=clock)
+    for message_id in range(3):
+        gate.finish((1, message_id))
+
+    assert len(gate) == 2
+    assert gate.press((1, 0)) is False
+    assert gate.press((1, 2)) is True
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+from datetime import datetime, timezone
+
+from telegram import Chat, Message, Update, User
+
+import dispatch
+from dispatch import ChatOrderedUpdateProcessor
+
+
+def _update(update_id: int, chat_id: int) -> Update:
+    message = Message(
+        message_id=update_id,
+        date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        chat=Chat(chat_id, Chat.PRIVATE),
+        from_user=User(chat_id, "Steve", is_bot=False),
+        text="/status",
+    )
+    return Update(update_id, message=message)
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_ordering_key_prefers_the_chat_then_the_user():
+    assert dispatch.ordering_key(_update(1, 42)) == 42
+    assert dispatch.ordering_key(Update(2, inline_query=None)) is None
+    assert dispatch.ordering_key("not an update") is None
+
+
+def test_updates_from_one_chat_run_in_arrival_order():
+    async def main() -> list[int]:
+        processor = ChatOrderedUpdateProcessor(workers=8, backlog=10)
+        order = []
+
+        async def handler(update_id: int, delay: float) -> None:
+            await asyncio.sleep(delay)
+            order.append(update_id)
+
+        delays = [0.03, 0.0, 0.02, 0.0]
+        await asyncio.gather(
+            *(processor.do_process_update(_update(index, 7), handler(index, delay)) for index, delay in enumerate(delays))
+        )
+        return order
+
+    assert asyncio.run(main()) == [0, 1, 2, 3]
+
+
+def test_different_chats_run_concurrently():
+    async def main() -> int:
+        processor = ChatOrderedUpdateProcessor(workers=4, backlog=10)
+        release = asyncio.Event()
+        peak = 0
+        running = 0
+
+        async def handler() -> None:
+            nonlocal peak, running
+            running += 1
+            peak = max(peak, running)
+            await release.wait()
+            running -= 1
+
+        tasks = [asyncio.create_task(processor.do_process_update(_update(i, i), handler())) for i in range(6)]
+        await _settle()
+        release.set()
+        await asyncio.gather(*tasks)
+        return peak
+
+    assert asyncio.run(main()) == 4
+
+
+def test_waiting_chat_does_not_hold_a_worker():
+    async def main() -> list[int]:
+        processor = ChatOrderedUpdateProcessor(workers=1, backlog=10)
+        release = asyncio.Event()
+        done = []
+
+        async def blocked(update_id: int) -> None:
+            await release.wait()
+            done.append(update_id)
+
+        async def quick(update_id: int) -> None:
+            done.append(update_id)
+
+        first = asyncio.create_task(processor.do_process_update(_update(1, 7), blocked(1)))
+        await _settle()
+        second = asyncio.create_task(processor.do_process_update(_update(2, 7), quick(2)))
+        await _settle()
+        assert processor._running == 1
+        release.set()
+        await asyncio.gather(first, second)
+        return done
+
+    assert asyncio.run(main()) == [1, 2]
+
+
+def test_saturated_processor_drops_and_closes_updates():
+    async def main() -> tuple[bool, list[int], bool]:
+        processor = ChatOrderedUpdateProcessor(workers=1, backlog=1)
+        release = asyncio.Event()
+        ran = []
+
+        async def handler(update_id: int) -> None:
+            await release.wait()
+            ran.append(update_id)
+
+        tasks = [asyncio.create_task(processor.do_process_update(_update(i, i), handler(i))) for i in range(2)]
+        await _settle()
+        saturated = processor.saturated
+
+        dropped = handler(99)
+        await processor.do_process_update(_update(99, 99), dropped)
+        release.set()
+        await asyncio.gather(*tasks)
+        return saturated, ran, dropped.cr_frame is None and processor._chats == {}
+
+    saturated, ran, cleaned_up = asyncio.run(main())
+    assert saturated
+    assert sorted(ran) == [0, 1]
+    assert cleaned_up
+
+
+def test_processor_recovers_after_the_backlog_drains():
+    async def main() -> bool:
+        processor = ChatOrderedUpdateProcessor(workers=1, backlog=0)
+
+        async def handler() -> None:
+            await asyncio.sleep(0)
+
+        await processor.do_process_update(_update(1, 1), handler())
+        return processor.saturated
+
+    assert asyncio.run(main()) is False
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import history
+from history import DOWN, HistoryStore, Series
+
+
+def test_series_overwrites_the_oldest_samples():
+    series = Series(3)
+    for second in range(5):
+        series.append(100 + second, second, second)
+
+    times, latency, players = series.window()
+    assert list(times) == [102, 103, 104]
+    assert list(latency) == [2, 3, 4]
+    assert series.last_time == 104
+    assert series.nbytes == 3 * history.BYTES_PER_SAMPLE
+
+
+def test_series_window_is_half_open():
+    series = Series(10)
+    for second in range(10):
+        series.append(100 + second, 5, 0)
+
+    times, _, _ = series.window(103, 106)
+    assert list(times) == [103, 104, 105]
+
+
+def test_series_clamps_values_and_marks_down():
+    series = Series(4)
+    series.append(1, None, 3)
+    series.append(2, -5, -1)
+    series.append(3, 10**6, 10**6)
+
+    _, latency, players = series.window()
+    assert list(latency) == [DOWN, 0, DOWN - 1]
+    assert list(players) == [3, 0, 0xFFFF]
+
+
+def test_store_skips_samples_inside_min_interval(clock):
+    store = HistoryStore(capacity=10, min_interval=30.0, max_series=4, clock=clock)
+
+    assert store.record("Play.Example.net", 20, 1)
+    clock.now += 10
+    assert not store.record("play.example.net", 25, 1)
+    clock.now += 30
+    assert store.record("play.example.net.", None)
+
+    times, latency, _ = store.get("play.example.net").window()
+    assert len(times) == 2
+    assert list(latency) == [20, DOWN]
+
+
+def test_store_drops_the_least_recently_probed_series(clock):
+    store = HistoryStore(capacity=4, min_interval=0.0, max_series=2, clock=clock)
+    store.record("a.example", 1)
+    store.record("b.example", 1)
+    store.record("a.example", 1)
+    store.record("c.example", 1)
+
+    assert len(store) == 2
+    assert store.get("b.example") is None
+    assert store.get("a.example") is not None
+
+
+def test_bucket_columns_averages_and_skips_down():
+    columns = history.bucket_columns(
+        [0, 1, 2, 3, 8], [10, 20, DOWN, 40, 50], since=0, until=10, width=5, skip=DOWN
+    )
+    assert columns == [15.0, 40.0, None, None, 50.0]
+
+
+def test_sparkline_scales_between_min_and_max():
+    assert history.sparkline([0, None, 7]) == "▁·█"
+    assert history.sparkline([3, 3]) == "▁▁"
+    assert history.sparkline([None, None]) == "··"
+
+
+def _brute_force(samples: list[tuple[int, int | None, int]], since: float, until: float):
+    rows = [row for row in samples if since <= row[0] < until]
+    up = [latency for _, latency, _ in rows if latency is not None]
+    return len(rows), len(up), min(up), max(up), sum(up) / len(up), max(players for _, _, players in rows)
+
+
+def _fill(clock, store: HistoryStore, hours: int) -> list[tuple[int, int | None, int]]:
+    """Probe every 10 seconds for ``hours``, rolling up every 10 minutes like the job queue does."""
+
+    samples = []
+    start = int(clock.now) // history.DAY * history.DAY
+    for step in range(hours * 360):
+        clock.now = start + step * 10
+        latency = None if step % 17 == 0 else 20 + step % 50
+        players = step % 23
+        store.record("play.example.net", latency, players)
+        samples.append((int(clock.now), latency, players))
+        if step % 60 == 59:
+            store.roll_up()
+    clock.now += 10
+    return samples
+
+
+def test_roll_up_closes_minute_hour_and_day_buckets(clock):
+    store = HistoryStore(capacity=100_000, min_interval=0.0, max_series=1, clock=clock)
+    _fill(clock, store, 25)
+    store.roll_up()
+
+    levels = store.get("play.example.net").rollups.levels
+    assert [len(level) for level in levels] == [360, 25, 1]
+    assert store.roll_up() == 0
+
+
+def test_summary_from_rollups_matches_the_raw_samples(clock):
+    store = HistoryStore(capacity=100_000, min_interval=0.0, max_series=1, clock=clock)
+    samples = _fill(clock, store, 26)
+    clock.now += 125
+    store.record("play.example.net", 33, 99)
+    samples.append((int(clock.now), 33, 99))
+    store.roll_up()
+
+    for window in (600, 3 * history.HOUR, 20 * history.HOUR):
+        since = clock.now - window
+        rollup = store.summary("play.example.net", window)
+        # Each rollup level starts at its first whole bucket inside the window.
+        assert 0 <= rollup.start - since < history.HOUR
+        count, up, low, high, mean, peak = _brute_force(samples, rollup.start, clock.now + 1)
+        assert rollup.samples == count
+        assert rollup.up == up
+        assert (rollup.latency_min, rollup.latency_max) == (low, high)
+        assert abs(rollup.latency_mean - mean) < 1e-3
+        assert rollup.players_peak == peak
+        assert low <= rollup.latency_p95 <= high
+
+
+def test_summary_of_a_down_server_has_no_latency(clock):
+    store = HistoryStore(capacity=10, min_interval=0.0, max_series=1, clock=clock)
+    store.record("play.example.net", None)
+
+    rollup = store.summary("play.example.net", 60)
+    assert rollup.samples == 1
+    assert rollup.uptime == 0.0
+    assert rollup.latency_mean is None
+    assert store.summary("other.example", 60) is None
+
+
+def test_rollup_rings_keep_only_their_capacity(clock):
+    store = HistoryStore(capacity=100_000, min_interval=0.0, max_series=1, rollup_capacities=(30, 5, 2), clock=clock)
+    _fill(clock, store, 7)
+    store.roll_up()
+
+    levels = store.get("play.example.net").rollups.levels
+    assert [len(level) for level in levels] == [30, 5, 0]
+    assert store.retention == 2 * history.DAY
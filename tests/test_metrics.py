@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import itertools
+import re
+
+import pytest
+
+import metrics
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def name() -> str:
+    """A metric name not yet in the process-wide registry."""
+
+    return f"mcstat_test_{next(_names)}"
+
+
+def _lines(name: str) -> list[str]:
+    """The exposition lines of one metric: HELP, TYPE, then its samples."""
+
+    pattern = re.compile(rf"^(# (HELP|TYPE) )?{name}(_bucket|_sum|_count)?[ {{]")
+    return [line for line in metrics.exposition().splitlines() if pattern.match(line)]
+
+
+def test_counter_exposition(name):
+    counter = metrics.Counter(name, "Things done.\nBy kind.", ("kind",))
+    counter.inc("a")
+    counter.inc("a")
+    counter.inc('q"uote', amount=0.5)
+
+    assert _lines(name) == [
+        f"# HELP {name} Things done.\\nBy kind.",
+        f"# TYPE {name} counter",
+        f'{name}{{kind="a"}} 2',
+        f'{name}{{kind="q\\"uote"}} 0.5',
+    ]
+
+
+def test_unlabelled_counter_is_exported_before_its_first_increment(name):
+    metrics.Counter(name, "Never incremented.")
+
+    assert _lines(name)[-1] == f"{name} 0"
+
+
+def test_gauge_reads_its_function_at_collection(name):
+    depth = [3]
+    gauge = metrics.Gauge(name, "Queue depth.")
+    gauge.set_function(lambda: depth[0])
+
+    assert _lines(name)[1:] == [f"# TYPE {name} gauge", f"{name} 3"]
+    depth[0] = 7
+    assert _lines(name)[-1] == f"{name} 7"
+    assert metrics.collect()[name] == 7.0
+
+
+def test_labelled_gauge_goes_up_and_down(name):
+    gauge = metrics.Gauge(name, "In flight.", ("phase",))
+    gauge.inc("status", amount=2)
+    gauge.dec("status")
+    gauge.set(4, "query")
+
+    assert _lines(name)[2:] == [f'{name}{{phase="status"}} 1', f'{name}{{phase="query"}} 4']
+
+
+def test_histogram_buckets_sum_and_count(name):
+    histogram = metrics.Histogram(name, "Latency.", ("phase",), buckets=(0.1, 1.0, float("inf")))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "status")
+
+    assert _lines(name) == [
+        f"# HELP {name} Latency.",
+        f"# TYPE {name} histogram",
+        f'{name}_bucket{{phase="status",le="0.1"}} 2',
+        f'{name}_bucket{{phase="status",le="1"}} 3',
+        f'{name}_bucket{{phase="status",le="+Inf"}} 4',
+        f'{name}_sum{{phase="status"}} 3.65',
+        f'{name}_count{{phase="status"}} 4',
+    ]
+    assert histogram.value("status") == 4.0
+
+
+def test_wrong_labels_and_duplicate_names_are_rejected(name):
+    counter = metrics.Counter(name, "Things done.", ("kind",))
+
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        metrics.Counter(name, "Again.")
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+import threading
+
+import pytest
+
+from persistence import SQLiteContextStore, SQLiteWatchStore
+
+
+@pytest.fixture
+def context_store(tmp_path):
+    store = SQLiteContextStore(tmp_path / "context.db", encode=str, per_chat_limit=10, flush_threshold=3)
+    store.open()
+    yield store
+    store.close()
+
+
+def _gate_writes(store: SQLiteContextStore, *, fail: bool = False) -> threading.Event:
+    """Hold the next write in its worker thread until the returned event is set."""
+
+    release = threading.Event()
+    write = store._write
+    calls = 0
+
+    def gated(batch):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            release.wait(5)
+            if fail:
+                raise OSError("disk full")
+        write(batch)
+
+    store._write = gated
+    return release
+
+
+def test_writes_to_one_message_coalesce(context_store):
+    async def main() -> tuple[int, list]:
+        context_store.record(1, 10, "first")
+        context_store.record(1, 10, "second")
+        context_store.record(1, 11, "other")
+        written = await context_store.flush()
+        return written, await context_store.load_chat(1)
+
+    written, rows = asyncio.run(main())
+    assert written == 2
+    assert sorted(rows) == [(10, "second"), (11, "other")]
+
+
+def test_none_deletes_the_row(context_store):
+    async def main() -> list:
+        context_store.record(1, 10, "value")
+        await context_store.flush()
+        context_store.record(1, 10, None)
+        await context_store.flush()
+        return await context_store.load_chat(1)
+
+    assert asyncio.run(main()) == []
+
+
+def test_reaching_the_threshold_starts_a_flush(context_store):
+    async def main() -> list:
+        for message_id in range(3):
+            context_store.record(1, message_id, f"value{message_id}")
+        assert context_store._flushing is not None
+        await context_store._flushing
+        assert context_store.pending == 0
+        return await context_store.load_chat(1)
+
+    assert len(asyncio.run(main())) == 3
+
+
+def test_concurrent_flushes_write_in_order(context_store):
+    release = _gate_writes(context_store)
+
+    async def main() -> list:
+        context_store.record(1, 10, "older")
+        older = asyncio.create_task(context_store.flush())
+        await asyncio.sleep(0.05)  # the older batch is now held in its thread
+        context_store.record(1, 10, "newer")
+        newer = asyncio.create_task(context_store.flush())
+        await asyncio.sleep(0.05)
+        release.set()
+        await asyncio.gather(older, newer)
+        return await context_store.load_chat(1)
+
+    assert asyncio.run(main()) == [(10, "newer")]
+
+
+def test_failed_write_is_queued_again_without_clobbering_newer_rows(context_store):
+    release = _gate_writes(context_store, fail=True)
+
+    async def main() -> list:
+        context_store.record(1, 10, "older")
+        context_store.record(1, 11, "kept")
+        failing = asyncio.create_task(context_store.flush())
+        await asyncio.sleep(0.05)
+        context_store.record(1, 10, "newer")
+        release.set()
+        assert await failing == 0
+        assert context_store.pending == 2
+        assert await context_store.flush() == 2
+        return await context_store.load_chat(1)
+
+    assert sorted(asyncio.run(main())) == [(10, "newer"), (11, "kept")]
+
+
+def test_each_chat_keeps_its_newest_rows(tmp_path):
+    store = SQLiteContextStore(tmp_path / "context.db", encode=str, per_chat_limit=2)
+    store.open()
+
+    async def main() -> list:
+        for message_id in range(4):
+            store.record(1, message_id, f"value{message_id}")
+            await store.flush()
+        return await store.load_chat(1)
+
+    try:
+        assert asyncio.run(main()) == [(2, "value2"), (3, "value3")]
+    finally:
+        store.close()
+
+
+def test_watch_store_round_trips_subscriptions(tmp_path):
+    path = tmp_path / "watch.db"
+
+    async def write() -> None:
+        store = SQLiteWatchStore(path)
+        store.open()
+        await store.save(1, "Play.Example.net", None)
+        await store.save(1, "mc.example.com:25566", 10)
+        await store.save(2, "play.example.net", 5)
+        await store.save(1, "play.example.net.", 3)  # same server, new threshold
+        await store.delete(2, "PLAY.example.net")
+        store.close()
+
+    asyncio.run(write())
+
+    reopened = SQLiteWatchStore(path)
+    reopened.open()
+    try:
+        assert sorted(reopened.load()) == [(1, "mc.example.com:25566", 10), (1, "play.example.net.", 3)]
+    finally:
+        reopened.close()
+
+
+def test_watch_store_forgets_a_whole_chat(tmp_path):
+    async def main() -> list[tuple[int, str, int | None]]:
+        store = SQLiteWatchStore(tmp_path / "watch.db")
+        store.open()
+        await store.save(1, "a.example", None)
+        await store.save(1, "b.example", None)
+        await store.save(2, "a.example", None)
+        await store.delete_chat(1)
+        rows = store.load()
+        store.close()
+        return rows
+
+    assert asyncio.run(main()) == [(2, "a.example", None)]
+
+
+def test_unopened_watch_store_is_a_no_op(tmp_path):
+    store = SQLiteWatchStore(tmp_path / "watch.db")
+
+    asyncio.run(store.save(1, "a.example", None))
+
+    assert store.load() == []
+    assert not (tmp_path / "watch.db").exists()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+
+import pytest
+
+import commands
+from deadline import Deadline
+
+
+def test_cancelled_caller_cancels_the_query_leg(monkeypatch):
+    cancelled: list[str] = []
+
+    async def hang(name: str) -> None:
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+
+    async def probe_status(address: str, *, include_query: bool, budget: Deadline) -> None:
+        await hang("status")
+
+    async def query_leg(address: str, budget: Deadline) -> None:
+        await hang("query")
+
+    monkeypatch.setattr(commands, "_probe_once_per_cluster", probe_status)
+    monkeypatch.setattr(commands, "_query_leg", query_leg)
+
+    async def main() -> None:
+        caller = asyncio.create_task(commands._probe_query_snapshot("cancel.example.net", Deadline(5)))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        assert cancelled == ["query"]
+        # The status probe runs in a shared flight and keeps going for its other callers.
+        assert commands._probe_flights.in_flight(("cancel.example.net", "status"))
+
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+
+import pytest
+
+import resolver
+import shared_cache
+from resolver import ResolutionError, ResolvedEndpoint, ResolverCache
+
+ENDPOINT = ResolvedEndpoint(host="mc.example.net", port=25570, ips=("203.0.113.7",), srv=True)
+
+
+def _resolver(clock, answers: dict, calls: list) -> ResolverCache:
+    """A cache whose DNS lookups answer from ``answers`` (address -> (endpoint or error, ttl))."""
+
+    cache = ResolverCache(max_entries=8, min_ttl=10.0, max_ttl=600.0, negative_ttl=30.0, clock=clock)
+
+    async def resolve_uncached(address: str, *, lifetime: float):
+        calls.append(address)
+        value, ttl = answers[address]
+        if isinstance(value, ResolutionError):
+            raise value
+        return value, ttl
+
+    cache._resolve_uncached = resolve_uncached
+    return cache
+
+
+def test_answers_are_cached_for_their_ttl(clock):
+    calls = []
+    cache = _resolver(clock, {"play.example.net": (ENDPOINT, 60.0)}, calls)
+
+    async def main() -> None:
+        assert await cache.resolve("play.example.net", lifetime=1.0) == ENDPOINT
+        clock.now += 59
+        assert await cache.resolve("PLAY.example.net.", lifetime=1.0) == ENDPOINT
+        clock.now += 1
+        assert await cache.resolve("play.example.net", lifetime=1.0) == ENDPOINT
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_negative_answers_are_cached_for_the_negative_ttl(clock):
+    calls = []
+    cache = _resolver(clock, {"nope.example": (ResolutionError("nope.example has no A or AAAA records"), 0)}, calls)
+
+    async def main() -> None:
+        for _ in range(2):
+            with pytest.raises(ResolutionError):
+                await cache.resolve("nope.example", lifetime=1.0)
+        clock.now += 30
+        with pytest.raises(ResolutionError):
+            await cache.resolve("nope.example", lifetime=1.0)
+
+    asyncio.run(main())
+    assert calls == ["nope.example", "nope.example"]
+
+
+def test_explicit_port_is_cached_apart_from_the_bare_host(clock):
+    calls = []
+    direct = ResolvedEndpoint(host="play.example.net", port=25565, ips=("198.51.100.1",), srv=False)
+    cache = _resolver(clock, {"play.example.net": (ENDPOINT, 60.0), "play.example.net:25565": (direct, 60.0)}, calls)
+
+    async def main() -> tuple[ResolvedEndpoint, ResolvedEndpoint]:
+        return (
+            await cache.resolve("play.example.net", lifetime=1.0),
+            await cache.resolve("play.example.net:25565", lifetime=1.0),
+        )
+
+    assert asyncio.run(main()) == (ENDPOINT, direct)
+    assert len(cache) == 2
+
+
+def test_ip_literals_resolve_without_dns():
+    cache = ResolverCache(max_entries=8, min_ttl=10.0, max_ttl=600.0, negative_ttl=30.0)
+
+    endpoint = asyncio.run(cache.resolve("127.0.0.1:25566", lifetime=1.0))
+
+    assert endpoint == ResolvedEndpoint(host="127.0.0.1", port=25566, ips=("127.0.0.1",), srv=False)
+
+
+@pytest.mark.parametrize("value", [ENDPOINT, ResolutionError("gone")])
+def test_shared_encoding_round_trips(value):
+    decoded, ttl = resolver._decode_shared(resolver._encode_shared(value, 60.0))
+
+    assert 59 < ttl <= 60
+    if isinstance(value, ResolutionError):
+        assert isinstance(decoded, ResolutionError)
+        assert decoded.args == value.args
+    else:
+        assert decoded == value
+
+
+def test_unreadable_shared_payload_is_ignored():
+    assert resolver._decode_shared("{}") is None
+    assert resolver._decode_shared("not json") is None
+
+
+def test_other_workers_answers_are_reused(tmp_path, clock):
+    first_calls, second_calls = [], []
+    answers = {"play.example.net": (ENDPOINT, 60.0)}
+    first, second = _resolver(clock, answers, first_calls), _resolver(clock, answers, second_calls)
+
+    async def main() -> ResolvedEndpoint:
+        first.shared = shared_cache.SQLiteSharedCache(tmp_path / "cache.db")
+        second.shared = shared_cache.SQLiteSharedCache(tmp_path / "cache.db")
+        try:
+            await first.resolve("play.example.net", lifetime=1.0)
+            return await second.resolve("play.example.net", lifetime=1.0)
+        finally:
+            await first.shared.close()
+            await second.shared.close()
+
+    assert asyncio.run(main()) == ENDPOINT
+    assert (first_calls, second_calls) == (["play.example.net"], [])
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+from collections import Counter
+
+import pytest
+
+import shard
+from shard import HashRing
+
+NODES = ("http://127.0.0.1:8101", "http://127.0.0.1:8102", "http://127.0.0.1:8103")
+
+
+def test_ring_needs_a_node():
+    with pytest.raises(ValueError):
+        HashRing([])
+
+
+def test_ring_is_deterministic_across_instances():
+    first, second = HashRing(NODES), HashRing(list(reversed(NODES)))
+
+    assert all(first.node_for(chat) == second.node_for(chat) for chat in range(2000))
+
+
+def test_ring_spreads_keys_over_every_node():
+    ring = HashRing(NODES, replicas=64)
+    load = Counter(ring.node_for(chat) for chat in range(30_000))
+
+    assert set(load) == set(NODES)
+    assert min(load.values()) > 30_000 / len(NODES) * 0.6
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    before = HashRing(NODES, replicas=64)
+    after = HashRing((*NODES, "http://127.0.0.1:8104"), replicas=64)
+
+    moved = [chat for chat in range(20_000) if before.node_for(chat) != after.node_for(chat)]
+    assert all(after.node_for(chat) == "http://127.0.0.1:8104" for chat in moved)
+    assert len(moved) < 20_000 * 0.4
+
+
+def test_route_key_follows_the_chat_and_spreads_chatless_updates():
+    message = {
+        "update_id": 5,
+        "message": {"message_id": 1, "date": 1_700_000_000, "chat": {"id": -100123, "type": "group"}, "text": "/status"},
+    }
+    assert shard._route_key(message) == -100123
+    assert shard._route_key({"update_id": 6}) == "update:6"
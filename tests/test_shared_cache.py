@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+import json
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+
+import pytest
+
+import breaker
+import cache
+import commands
+import shared_cache
+from deadline import Deadline, DeadlineExceeded
+
+BACKENDS = ("sqlite", "unix")
+
+
+def _run_with_backend(backend: str, tmp_path, body: Callable[..., Awaitable[None]]) -> None:
+    """Run ``body(first, second)`` with two clients (two workers) of one shared cache."""
+
+    async def main() -> None:
+        server = None
+        if backend == "unix":
+            server = await shared_cache.serve(tmp_path / "cache.sock")
+        url = f"{backend}://{tmp_path / ('cache.db' if backend == 'sqlite' else 'cache.sock')}"
+        first, second = shared_cache.open_shared_cache(url), shared_cache.open_shared_cache(url)
+        try:
+            await body(first, second)
+        finally:
+            await first.close()
+            await second.close()
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_values_are_shared_until_they_expire(backend, tmp_path):
+    async def body(first, second) -> None:
+        await first.set("snapshot:status:play.example.net", '{"ok":1}', 0.2)
+        assert await second.get("snapshot:status:play.example.net") == '{"ok":1}'
+        assert await second.get("snapshot:status:other.example") is None
+        await asyncio.sleep(0.25)
+        assert await second.get("snapshot:status:play.example.net") is None
+
+    _run_with_backend(backend, tmp_path, body)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_lease_is_exclusive_until_released_or_expired(backend, tmp_path):
+    async def body(first, second) -> None:
+        assert await first.claim("probe:a", 5.0)
+        assert await first.claim("probe:a", 5.0)  # the holder may renew
+        assert not await second.claim("probe:a", 5.0)
+        await second.release("probe:a")  # not the holder: no effect
+        assert not await second.claim("probe:a", 5.0)
+
+        await first.release("probe:a")
+        assert await second.claim("probe:a", 0.1)
+        await asyncio.sleep(0.15)
+        assert await first.claim("probe:a", 5.0)
+
+    _run_with_backend(backend, tmp_path, body)
+
+
+def test_unavailable_backend_is_a_miss_and_grants_leases(tmp_path):
+    async def main() -> None:
+        client = shared_cache.UnixSocketSharedCache(tmp_path / "missing.sock", timeout=0.2)
+        assert await client.get("key") is None
+        await client.set("key", "value", 1.0)
+        assert await client.claim("probe:key", 1.0)
+        await client.release("probe:key")
+
+        closed = shared_cache.SQLiteSharedCache(tmp_path / "cache.db")
+        await closed.close()
+        assert await closed.get("key") is None
+        assert await closed.claim("probe:key", 1.0)
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("url", ["redis://localhost/0", "sqlite://"])
+def test_open_shared_cache_rejects_bad_urls(url):
+    with pytest.raises(ValueError):
+        shared_cache.open_shared_cache(url)
+
+
+# ---------------------------------------------------------------------------
+# One probe per cluster
+# ---------------------------------------------------------------------------
+
+
+def _snapshot(address: str) -> commands.ServerSnapshot:
+    return commands.ServerSnapshot(
+        address=address,
+        fetched_at=datetime.now(timezone.utc),
+        description="A Minecraft Server",
+        version_name="Paper 1.20.4",
+        latency_ms=42,
+        players_online=3,
+        players_max=20,
+        player_names=("Alex", "Steve", "Herobrine"),
+        query_available=False,
+        query_error=None,
+    )
+
+
+@pytest.fixture
+def cluster(monkeypatch, tmp_path):
+    """Point ``commands`` at a shared SQLite cache and count status probes."""
+
+    calls = []
+    outcome = {"result": None}
+
+    async def probe(address: str, budget: Deadline) -> commands.ServerSnapshot:
+        calls.append(address)
+        result = outcome["result"]
+        if isinstance(result, BaseException):
+            raise result
+        return _snapshot(address)
+
+    def fresh_local_cache() -> None:
+        monkeypatch.setattr(commands, "_snapshot_cache", cache.SnapshotCache(max_entries=16, status_ttl=30, query_ttl=30))
+
+    fresh_local_cache()
+    monkeypatch.setattr(commands, "_probe_status_snapshot", probe)
+    monkeypatch.setattr(commands, "SHARED_PROBE_POLL", 0.01)
+    path = tmp_path / "cache.db"
+    monkeypatch.setattr(commands, "_shared", shared_cache.SQLiteSharedCache(path))
+    yield calls, outcome, fresh_local_cache, path
+    asyncio.run(commands._shared.close())
+
+
+def test_published_snapshot_answers_other_workers(cluster):
+    calls, _, fresh_local_cache, _ = cluster
+
+    async def main() -> None:
+        await commands._probe_once_per_cluster("play.example.net", include_query=False, budget=Deadline(5))
+        fresh_local_cache()
+        snapshot = await commands._probe_once_per_cluster("play.example.net", include_query=False, budget=Deadline(5))
+        assert snapshot.players_online == 3
+
+    asyncio.run(main())
+    assert calls == ["play.example.net"]
+
+
+@pytest.mark.parametrize(
+    ("failure", "expected"),
+    [
+        (ConnectionRefusedError("refused"), ConnectionError),
+        (breaker.CircuitOpenError("open"), breaker.CircuitOpenError),
+    ],
+)
+def test_failed_probe_is_shared_for_the_negative_ttl(cluster, monkeypatch, failure, expected):
+    calls, outcome, fresh_local_cache, _ = cluster
+    outcome["result"] = failure
+
+    async def main() -> None:
+        with pytest.raises(type(failure)):
+            await commands._probe_once_per_cluster("play.example.net", include_query=False, budget=Deadline(5))
+        with pytest.raises(expected):
+            await commands._probe_once_per_cluster("play.example.net", include_query=False, budget=Deadline(5))
+        assert len(calls) == 1
+
+        monkeypatch.setattr(commands, "SHARED_NEGATIVE_TTL", 0.0)
+        outcome["result"] = None
+        fresh_local_cache()
+        await commands._probe_once_per_cluster("play.example.net", include_query=False, budget=Deadline(5))
+        assert len(calls) == 2
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("failure", [DeadlineExceeded("status", 0.05), TimeoutError()])
+def test_timeouts_are_not_shared(cluster, failure):
+    calls, outcome, _, _ = cluster
+
+    async def main() -> commands.ServerSnapshot:
+        # A batch share of a fraction of a second runs out ...
+        outcome["result"] = failure
+        with pytest.raises(type(failure)):
+            await commands._probe_once_per_cluster("play.example.net", include_query=False, budget=Deadline(0.05))
+        assert await commands._shared.get(commands._shared_snapshot_key("play.example.net", False)) is None
+        # ... and a caller with its full budget still gets to probe.
+        outcome["result"] = None
+        return await commands._probe_once_per_cluster("play.example.net", include_query=False, budget=Deadline(5))
+
+    assert asyncio.run(main()).players_online == 3
+    assert len(calls) == 2
+
+
+def test_negative_status_entry_does_not_fail_query_probes(cluster, monkeypatch):
+    calls, outcome, _, _ = cluster
+    outcome["result"] = ConnectionRefusedError("refused")
+
+    async def probe_query(address: str, budget: Deadline) -> commands.ServerSnapshot:
+        calls.append(f"query:{address}")
+        return _snapshot(address)
+
+    monkeypatch.setattr(commands, "_probe_query_snapshot", probe_query)
+
+    async def main() -> None:
+        with pytest.raises(ConnectionRefusedError):
+            await commands._probe_once_per_cluster("play.example.net", include_query=False, budget=Deadline(5))
+        payload = await commands._shared.get(commands._shared_snapshot_key("play.example.net", False))
+        assert json.loads(payload)["error"] == "offline"
+        await commands._probe_once_per_cluster("play.example.net", include_query=True, budget=Deadline(5))
+
+    asyncio.run(main())
+    assert calls == ["play.example.net", "query:play.example.net"]
+
+
+def test_waiter_takes_the_lease_holders_result(cluster):
+    calls, _, _, path = cluster
+
+    async def main() -> commands.ServerSnapshot:
+        other = shared_cache.SQLiteSharedCache(path)
+        key = commands._shared_snapshot_key("play.example.net", False)
+        assert await other.claim(f"probe:{key}", 5.0)
+        waiter = asyncio.create_task(
+            commands._probe_once_per_cluster("play.example.net", include_query=False, budget=Deadline(5))
+        )
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        payload = json.dumps(commands._snapshot_to_dict(_snapshot("play.example.net")))
+        await other.set(key, payload, 30)
+        await other.release(f"probe:{key}")
+        await other.close()
+        return await waiter
+
+    assert asyncio.run(main()).players_max == 20
+    assert calls == []
+
+
+def test_lease_ttl_is_capped_at_the_probe_deadline(cluster, monkeypatch):
+    calls, _, _, _ = cluster
+    ttls = []
+    claim = commands._shared.claim
+
+    async def spy(key: str, ttl: float) -> bool:
+        ttls.append(ttl)
+        return await claim(key, ttl)
+
+    monkeypatch.setattr(commands._shared, "claim", spy)
+    monkeypatch.setitem(commands.DEADLINES, "status", 2.0)
+    asyncio.run(commands._probe_once_per_cluster("play.example.net", include_query=False, budget=Deadline(60)))
+
+    assert ttls == [2.0]
+    assert calls == ["play.example.net"]
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+import json
+import struct
+import time
+
+import pytest
+
+import slp
+from slp import ProtocolError
+
+STATUS = {
+    "version": {"name": "Paper 1.20.4", "protocol": 765},
+    "players": {"online": 2, "max": 20, "sample": [{"name": "Alex", "id": "0"}, {"name": "Steve", "id": "1"}]},
+    "description": {"text": "§aHello", "extra": [{"text": " world"}]},
+}
+
+
+def _status_packet(body: bytes) -> bytes:
+    return slp._frame(b"\x00" + slp._varint(len(body)) + body)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    length, _ = await slp._read_varint(reader)
+    return await reader.readexactly(length)
+
+
+def _exchange(reply: bytes, *, pong: str = "echo", host: str = "play.example.net", timeout: float = 2.0, **kwargs):
+    """Run :func:`slp.status` against a local fake server sending ``reply``.
+
+    ``pong`` is ``"echo"``, ``"wrong"`` (a different token), ``"close"``
+    (hang up right after the reply) or ``"silent"`` (read the ping, never answer).
+    Returns the status and the handshake the server received.
+    """
+
+    seen = {}
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            seen["handshake"] = await _read_frame(reader)
+            seen["request"] = await _read_frame(reader)
+            writer.write(reply)
+            await writer.drain()
+            if pong == "close":
+                return
+            ping = await _read_frame(reader)
+            if pong == "silent":
+                await reader.read()
+                return
+            if pong == "echo":
+                writer.write(slp._frame(ping))
+            else:
+                writer.write(slp._frame(b"\x01" + struct.pack(">q", 7)))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await slp.status(host, port, ip="127.0.0.1", timeout=timeout, **kwargs), seen, port
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 25565, 2**31 - 1])
+def test_varint_round_trips(value):
+    async def main() -> tuple[int, int]:
+        reader = asyncio.StreamReader()
+        reader.feed_data(slp._varint(value))
+        reader.feed_eof()
+        return await slp._read_varint(reader)
+
+    assert asyncio.run(main()) == (value, len(slp._varint(value)))
+
+
+def test_varint_encodes_negative_numbers_in_five_bytes():
+    assert slp._varint(-1) == b"\xff\xff\xff\xff\x0f"
+
+
+def test_status_reads_reply_and_pong():
+    response, seen, port = _exchange(_status_packet(json.dumps(STATUS).encode()))
+
+    assert response == slp.StatusResponse(
+        description="§aHello world",
+        version_name="Paper 1.20.4",
+        version_protocol=765,
+        players_online=2,
+        players_max=20,
+        player_names=("Alex", "Steve"),
+        latency=response.latency,
+    )
+    assert response.latency >= 0
+    assert seen["request"] == b"\x00"
+    # The handshake names the host even though the connection went to ``ip``.
+    assert seen["handshake"] == slp._handshake("play.example.net", port)[1:]
+    assert b"play.example.net" in seen["handshake"]
+
+
+@pytest.mark.parametrize("pong", ["close", "wrong"])
+def test_bad_or_missing_pong_falls_back_to_the_status_round_trip(pong):
+    response, _, _ = _exchange(_status_packet(json.dumps(STATUS).encode()), pong=pong)
+
+    assert response.players_online == 2
+    assert response.latency >= 0
+
+
+def test_silent_pong_keeps_the_status(monkeypatch):
+    monkeypatch.setattr(slp, "PING_TIMEOUT", 0.1)
+    started = time.perf_counter()
+
+    response, _, _ = _exchange(_status_packet(json.dumps(STATUS).encode()), pong="silent")
+
+    assert response.players_online == 2
+    assert time.perf_counter() - started < 1.0
+
+
+def test_silent_pong_waits_at_most_half_the_remaining_timeout():
+    response, _, _ = _exchange(_status_packet(json.dumps(STATUS).encode()), pong="silent", timeout=0.3)
+
+    assert response.players_online == 2
+
+
+def test_multibyte_text_split_across_reads_is_decoded(monkeypatch):
+    monkeypatch.setattr(slp, "READ_CHUNK", 3)
+    status = dict(STATUS, description="§6Ünïcödé ✓ サーバー")
+
+    response, _, _ = _exchange(_status_packet(json.dumps(status, ensure_ascii=False).encode()))
+
+    assert response.description == "§6Ünïcödé ✓ サーバー"
+
+
+@pytest.mark.parametrize(
+    ("reply", "message"),
+    [
+        (slp._varint(2000) + b"\x00", "exceeds"),
+        (b"\xff\xff\xff\xff\xff\x01", "longer than 5 bytes"),
+        (slp._frame(b"\x01" + slp._varint(2) + b"{}"), "Expected a status response"),
+        (slp._frame(b"\x00" + slp._varint(5) + b"{}"), "does not match"),
+        (_status_packet(b"\xff\xfe{}"), "not valid JSON"),
+        (_status_packet(b"[1, 2]"), "not an object"),
+        (_status_packet(b"{\"players\": []}"), "'players' is not an object"),
+        (_status_packet(json.dumps(dict(STATUS, players={"online": "2", "max": 20})).encode()), "'online'"),
+        (_status_packet(json.dumps(dict(STATUS, players={"online": True, "max": 20})).encode()), "'online'"),
+        (_status_packet(json.dumps(dict(STATUS, version="1.20")).encode()), "'version' is not an object"),
+        (slp._varint(20) + b"\x00", "closed"),
+        (b"", "closed before"),
+    ],
+)
+def test_malformed_replies_raise_protocol_error(reply, message):
+    with pytest.raises(ProtocolError, match=message):
+        _exchange(reply, pong="close", max_bytes=1000)
+
+
+def test_protocol_error_is_an_oserror():
+    assert issubclass(ProtocolError, OSError)
+
+
+def test_silent_server_times_out():
+    async def main() -> None:
+        async def handle(reader, writer) -> None:
+            await reader.read()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            await slp.status("localhost", port, ip="127.0.0.1", timeout=0.1)
+        finally:
+            server.close()
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(main())
+
+
+def test_parse_keeps_at_most_max_sample_names():
+    sample = [{"name": f"player{index}"} for index in range(500)] + [{"name": ""}, {"id": "x"}, "bogus"]
+    data = dict(STATUS, players={"online": 500, "max": 1000, "sample": sample})
+
+    response = slp._parse(data, 1.0)
+
+    assert len(response.player_names) == slp.MAX_SAMPLE
+    assert response.player_names[0] == "player0"
+
+
+def test_parse_skips_malformed_sample_entries_and_defaults_version():
+    data = {
+        "version": {},
+        "players": {"online": 1, "max": 5, "sample": [{"name": ""}, {"name": 7}, "Alex", {"name": "Steve"}]},
+    }
+
+    response = slp._parse(data, 1.0)
+
+    assert response.player_names == ("Steve",)
+    assert response.version_name == "Unknown"
+    assert response.version_protocol == -1
+    assert response.description == ""
+
+
+@pytest.mark.parametrize(
+    ("component", "text"),
+    [
+        ("plain", "plain"),
+        ({"text": "a", "extra": ["b", {"text": "c", "extra": [{"text": "d"}]}]}, "abcd"),
+        ([{"text": "x"}, "y", None, 3], "xy3"),
+        ({"translate": "menu.server"}, ""),
+    ],
+)
+def test_component_text_flattens_chat_components(component, text):
+    assert slp._component_text(component) == text
+
+
+def test_component_text_rejects_deep_nesting():
+    component = {"text": "x"}
+    for _ in range(slp.MAX_COMPONENT_DEPTH):
+        component = {"text": "", "extra": [component]}
+
+    with pytest.raises(ProtocolError, match="nests too deeply"):
+        slp._component_text(component)
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import tracing
+
+UPDATE = SimpleNamespace(update_id=42, effective_chat=SimpleNamespace(id=-100123))
+
+
+@pytest.fixture
+def exported(monkeypatch) -> list:
+    """Sample every trace and collect the exported ones instead of writing them."""
+
+    traces: list = []
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing, "TRACE_SLOW_MS", 0.0)
+    monkeypatch.setattr(tracing, "_export", lambda trace, duration_ms: traces.append(trace))
+    return traces
+
+
+def _spans(trace) -> dict:
+    return {item.name: item for item in trace.spans}
+
+
+def test_spans_nest_through_context_variables(exported):
+    @tracing.traced
+    async def cmd_status(update, context):
+        tracing.tag(address="play.example.net")
+        with tracing.span("lookup"):
+            with tracing.span("resolve", cached=False):
+                tracing.annotate(fallback="srv")
+        # A task copies the context, so its spans join the trace too.
+        await asyncio.create_task(_in_task())
+        return "done"
+
+    async def _in_task() -> None:
+        with tracing.span("render"):
+            pass
+
+    assert asyncio.run(cmd_status(UPDATE, None)) == "done"
+
+    (trace,) = exported
+    spans = _spans(trace)
+    root = spans["cmd_status"]
+    assert root.parent_id == 0
+    assert spans["lookup"].parent_id == root.span_id
+    assert spans["resolve"].parent_id == spans["lookup"].span_id
+    assert spans["render"].parent_id == root.span_id
+    assert spans["resolve"].attributes == {"cached": False, "fallback": "srv"}
+    assert trace.attributes == {
+        "handler": "cmd_status",
+        "update_id": 42,
+        "chat_id": -100123,
+        "address": "play.example.net",
+    }
+    assert trace.finished
+
+
+def test_spans_outside_a_trace_are_not_recorded(exported):
+    with tracing.span("lookup") as current:
+        tracing.annotate(ignored=True)
+
+    assert current is None
+    assert exported == []
+
+
+def test_traced_records_the_exception_and_reraises(exported):
+    @tracing.traced
+    async def cmd_status(update, context):
+        with tracing.span("probe"):
+            raise ConnectionRefusedError("refused")
+
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(cmd_status(UPDATE, None))
+
+    (trace,) = exported
+    spans = _spans(trace)
+    assert spans["probe"].error == "ConnectionRefusedError: refused"
+    assert spans["cmd_status"].error == "ConnectionRefusedError: refused"
+
+    payload = tracing._otlp_payload(trace)
+    statuses = {record["name"]: record["status"] for record in payload["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+    assert statuses["probe"] == {"code": 2, "message": "ConnectionRefusedError: refused"}
+
+
+def test_unsampled_fast_traces_are_dropped(exported, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SLOW_MS", 60_000.0)
+    monkeypatch.setattr(tracing.random, "random", lambda: 0.5)
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.1)
+
+    @tracing.traced
+    async def cmd_status(update, context):
+        with tracing.span("probe"):
+            pass
+
+    asyncio.run(cmd_status(UPDATE, None))
+
+    assert exported == []
+
+
+def test_disabled_tracing_calls_the_handler_directly(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(tracing, "TRACE_SLOW_MS", 0.0)
+
+    @tracing.traced
+    async def cmd_status(update, context):
+        with tracing.span("probe") as current:
+            return current
+
+    assert asyncio.run(cmd_status(UPDATE, None)) is None
+
+
+def test_otlp_payload_shape():
+    trace = tracing._Trace({"handler": "cmd_status", "chat_id": -100123, "cached": True})
+    trace.trace_id = 0x0123456789ABCDEF0123456789ABCDEF
+    trace.wall_start = 1_700_000_000_000_000_000
+    trace.perf_start = 5_000
+    root = tracing._Span("cmd_status", 0, {})
+    root.span_id, root.start, root.end = 0x1, 5_000, 9_000
+    child = tracing._Span("probe", root.span_id, {"latency": 1.5, "address": "play.example.net", "skip": None})
+    child.span_id, child.start, child.end = 0x2, 6_000, 8_000
+    child.error = "TimeoutError"
+    trace.spans = [child, root]
+
+    payload = tracing._otlp_payload(trace)
+
+    (resource,) = payload["resourceSpans"]
+    assert resource["resource"] == {
+        "attributes": [{"key": "service.name", "value": {"stringValue": tracing.SERVICE_NAME}}]
+    }
+    (scope,) = resource["scopeSpans"]
+    assert scope["scope"] == {"name": "tracing"}
+    assert scope["spans"] == [
+        {
+            "traceId": "0123456789abcdef0123456789abcdef",
+            "spanId": "0000000000000002",
+            "name": "probe",
+            "kind": 1,
+            "startTimeUnixNano": "1700000000000001000",
+            "endTimeUnixNano": "1700000000000003000",
+            "attributes": [
+                {"key": "handler", "value": {"stringValue": "cmd_status"}},
+                {"key": "chat_id", "value": {"intValue": "-100123"}},
+                {"key": "cached", "value": {"boolValue": True}},
+                {"key": "latency", "value": {"doubleValue": 1.5}},
+                {"key": "address", "value": {"stringValue": "play.example.net"}},
+            ],
+            "status": {"code": 2, "message": "TimeoutError"},
+            "parentSpanId": "0000000000000001",
+        },
+        {
+            "traceId": "0123456789abcdef0123456789abcdef",
+            "spanId": "0000000000000001",
+            "name": "cmd_status",
+            "kind": 1,
+            "startTimeUnixNano": "1700000000000000000",
+            "endTimeUnixNano": "1700000000000004000",
+            "attributes": [
+                {"key": "handler", "value": {"stringValue": "cmd_status"}},
+                {"key": "chat_id", "value": {"intValue": "-100123"}},
+                {"key": "cached", "value": {"boolValue": True}},
+            ],
+            "status": {"code": 1},
+        },
+    ]
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import pytest
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+import commands
+import persistence
+import watch
+
+
+@dataclass
+class _Status:
+    players_online: int
+
+
+def _scheduler(clock, probe, notify, **kwargs) -> watch.WatchScheduler:
+    return watch.WatchScheduler(
+        probe, notify, interval=60.0, jitter=0.0, concurrency=4, offline_after=1, clock=clock, **kwargs
+    )
+
+
+async def _round(scheduler: watch.WatchScheduler, clock) -> None:
+    """Make every address due, start its probe and wait for the notifications."""
+
+    clock.now += 120.0
+    scheduler.tick()
+    await asyncio.gather(*scheduler._tasks)
+
+
+def _went_offline(clock, notify, chat_ids) -> watch.WatchScheduler:
+    """Watch one server from ``chat_ids`` and take it offline after the baseline poll."""
+
+    online = True
+
+    async def probe(address: str) -> _Status:
+        if not online:
+            raise ConnectionError("refused")
+        return _Status(players_online=3)
+
+    scheduler = _scheduler(clock, probe, notify)
+
+    async def main() -> None:
+        nonlocal online
+        for chat_id in chat_ids:
+            scheduler.subscribe(chat_id, "play.example.net")
+        await _round(scheduler, clock)
+        online = False
+        await _round(scheduler, clock)
+
+    asyncio.run(main())
+    return scheduler
+
+
+def test_a_failing_notify_does_not_stop_the_other_subscribers(clock):
+    delivered: list[int] = []
+
+    async def notify(event: watch.WatchEvent) -> None:
+        if event.subscription.chat_id == 1:
+            raise RuntimeError("send failed")
+        delivered.append(event.subscription.chat_id)
+
+    scheduler = _went_offline(clock, notify, (1, 2, 3))
+
+    assert sorted(delivered) == [2, 3]
+    assert not any(server.probing for server in scheduler._servers.values())
+
+
+def test_notifications_are_paced_across_servers(clock):
+    sent: list[float] = []
+
+    players = 0
+
+    async def probe(address: str) -> _Status:
+        return _Status(players_online=players)
+
+    async def notify(event: watch.WatchEvent) -> None:
+        sent.append(asyncio.get_running_loop().time())
+
+    scheduler = _scheduler(clock, probe, notify, send_rate=50.0)
+
+    async def main() -> None:
+        nonlocal players
+        for chat_id in range(3):
+            scheduler.subscribe(chat_id, "a.example.net", threshold=5)
+            scheduler.subscribe(chat_id, "b.example.net", threshold=5)
+        await _round(scheduler, clock)
+        players = 10
+        await _round(scheduler, clock)
+
+    asyncio.run(main())
+
+    assert len(sent) == 6
+    gaps = [later - earlier for earlier, later in zip(sent, sent[1:])]
+    assert min(gaps) >= 0.02 - 0.005
+
+
+class _StubBot:
+    """Raise the queued errors from ``send_message`` in turn, then succeed."""
+
+    def __init__(self, *errors: Exception) -> None:
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def send_message(self, **kwargs) -> None:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+@pytest.fixture
+def watched(clock, monkeypatch):
+    """A scheduler installed in ``commands`` with chat 7 watching one server."""
+
+    async def idle(address: str) -> None:
+        return None
+
+    async def notify(event: watch.WatchEvent) -> None:
+        return None
+
+    scheduler = _scheduler(clock, idle, notify)
+    scheduler.subscribe(7, "play.example.net")
+    monkeypatch.setattr(commands, "_watch_scheduler", scheduler)
+    monkeypatch.setattr(commands, "_watch_store", None)
+    monkeypatch.setattr(commands, "WATCH_RETRY_DELAY", 0.0)
+    return scheduler
+
+
+def _deliver(bot: _StubBot, scheduler: watch.WatchScheduler) -> None:
+    snapshot = commands.ServerSnapshot(
+        address="play.example.net",
+        fetched_at=datetime.now(timezone.utc),
+        description="",
+        version_name="1.21",
+        latency_ms=20,
+        players_online=3,
+        players_max=20,
+        player_names=(),
+        query_available=False,
+        query_error=None,
+    )
+    (subscription,) = scheduler.subscriptions(7)
+    event = watch.WatchEvent(watch.CAME_ONLINE, subscription, snapshot)
+    asyncio.run(commands._deliver_watch_event(bot, event))
+
+
+@pytest.mark.parametrize("error", [RetryAfter(0), NetworkError("connection reset")])
+def test_delivery_is_retried_once(watched, error):
+    bot = _StubBot(error)
+    _deliver(bot, watched)
+
+    assert bot.calls == 2
+    assert watched.subscriptions(7)
+
+
+def test_delivery_gives_up_after_the_retry(watched):
+    bot = _StubBot(NetworkError("connection reset"), NetworkError("connection reset"))
+
+    with pytest.raises(NetworkError):
+        _deliver(bot, watched)
+    assert bot.calls == 2
+
+
+def test_long_flood_waits_are_not_slept_through(watched, monkeypatch):
+    monkeypatch.setattr(commands, "WATCH_INTERVAL", 60.0)
+    bot = _StubBot(RetryAfter(600))
+
+    with pytest.raises(RetryAfter):
+        _deliver(bot, watched)
+    assert bot.calls == 1
+
+
+@pytest.mark.parametrize(
+    "error", [Forbidden("Forbidden: bot was blocked by the user"), BadRequest("Chat not found")]
+)
+def test_gone_chats_lose_their_watches(watched, monkeypatch, tmp_path, error):
+    store = persistence.SQLiteWatchStore(tmp_path / "watches.db")
+    store.open()
+    asyncio.run(store.save(7, "play.example.net", None))
+    monkeypatch.setattr(commands, "_watch_store", store)
+    bot = _StubBot(error)
+    try:
+        _deliver(bot, watched)
+        assert bot.calls == 1
+        assert watched.subscriptions(7) == []
+        assert store.load() == []
+    finally:
+        store.close()
+
+
+def test_other_bad_requests_are_raised(watched):
+    bot = _StubBot(BadRequest("Message is too long"))
+
+    with pytest.raises(BadRequest):
+        _deliver(bot, watched)
+    assert watched.subscriptions(7)
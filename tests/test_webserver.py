@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+import asyncio
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import tornado.web
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+
+import webserver
+
+URL = "https://bot.example.net/webhook"
+
+
+def test_fingerprint_is_stable_and_hides_the_secret():
+    url = webserver.fingerprinted_url(URL, "s3cret")
+
+    assert url == webserver.fingerprinted_url(URL, "s3cret")
+    assert url != webserver.fingerprinted_url(URL, "other")
+    assert url.startswith(URL + "?v=")
+    assert "s3cret" not in url
+
+
+def test_fingerprint_keeps_the_existing_query():
+    url = webserver.fingerprinted_url(URL + "?shard=2", "s3cret")
+
+    query = parse_qs(urlsplit(url).query)
+    assert query["shard"] == ["2"]
+    assert len(query["v"]) == 1
+
+
+def test_no_secret_leaves_the_url_alone():
+    assert webserver.fingerprinted_url(URL, None) == URL
+    assert webserver.fingerprinted_url(URL, "") == URL
+
+
+class _StubBot:
+    def __init__(self, registered: str | None = None, info_error: Exception | None = None) -> None:
+        self.registered = registered
+        self.info_error = info_error
+        self.set_calls: list[dict] = []
+
+    async def get_webhook_info(self):
+        if self.info_error is not None:
+            raise self.info_error
+        return SimpleNamespace(url=self.registered or "")
+
+    async def set_webhook(self, **kwargs) -> bool:
+        self.set_calls.append(kwargs)
+        return True
+
+
+def test_matching_webhook_is_not_registered_again():
+    url = webserver.fingerprinted_url(URL, "s3cret")
+    bot = _StubBot(registered=url)
+
+    asyncio.run(webserver.register_webhook(bot, url, "s3cret"))
+
+    assert bot.set_calls == []
+
+
+def test_changed_secret_registers_the_webhook():
+    bot = _StubBot(registered=webserver.fingerprinted_url(URL, "old"))
+    url = webserver.fingerprinted_url(URL, "new")
+
+    asyncio.run(webserver.register_webhook(bot, url, "new"))
+
+    assert bot.set_calls == [{"url": url, "secret_token": "new"}]
+
+
+def test_failed_lookup_registers_anyway():
+    bot = _StubBot(info_error=ConnectionError("unreachable"))
+
+    asyncio.run(webserver.register_webhook(bot, URL, None))
+
+    assert bot.set_calls == [{"url": URL, "secret_token": None}]
+
+
+def _get_metrics(routes: list, headers: dict[str, str]) -> int:
+    """Serve ``routes`` on a free port and return the status of ``GET /metrics``."""
+
+    async def main() -> int:
+        sock, port = bind_unused_port()
+        server = HTTPServer(tornado.web.Application(routes))
+        server.add_sockets([sock])
+        try:
+            response = await AsyncHTTPClient().fetch(
+                f"http://127.0.0.1:{port}/metrics", headers=headers, raise_error=False
+            )
+            return response.code
+        finally:
+            server.stop()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize(
+    ("headers", "code"),
+    [
+        ({"Authorization": "Bearer s3cret"}, 200),
+        ({"Authorization": "Bearer wrong"}, 403),
+        ({webserver.SECRET_HEADER: "s3cret"}, 403),
+        ({}, 403),
+    ],
+)
+def test_public_metrics_need_the_secret_as_a_bearer_token(headers, code):
+    assert _get_metrics(webserver.metrics_routes("s3cret"), headers) == code
+
+
+def test_public_metrics_are_not_served_without_a_secret():
+    assert webserver.metrics_routes(None) == []
+    assert webserver.metrics_routes("") == []
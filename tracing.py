@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Sampled per-update span tracing for the handler hot path.
+
+A handler wrapped with :func:`traced` opens a trace for its update; phases
+inside it open nested :func:`span` blocks that inherit the trace through
+``contextvars`` (so background tasks started by the handler join it too).
+A finished trace is exported when it was sampled (``TRACE_SAMPLE_RATE``) or
+took at least ``TRACE_SLOW_MS``: as OTLP/JSON lines appended to
+``TRACE_FILE``, or as one structured log record per trace when no file is
+set. With both knobs at zero, :func:`traced` is a pass-through and
+:func:`span` costs one context variable lookup.
+"""
+
+from __future__ import annotations
+
+import atexit
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Any, TypeVar
+
+import metrics
+import utils
+
+__all__ = ["annotate", "span", "tag", "traced"]
+
+logger = logging.getLogger(__name__)
+
+TRACE_SAMPLE_RATE = min(1.0, max(0.0, utils.env_float("TRACE_SAMPLE_RATE", 0.0)))  # fraction of updates
+TRACE_SLOW_MS = utils.env_float("TRACE_SLOW_MS", 0.0)  # always export traces at least this slow; 0 disables
+TRACE_FILE = (os.getenv("TRACE_FILE") or "").strip()
+SERVICE_NAME = "mcserverstatbot"
+
+_TRACES = metrics.Counter(
+    "mcstat_traces_total",
+    "Finished update traces by whether they were exported (sampled, slow) or dropped.",
+    ("result",),
+)
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+class _Span:
+    __slots__ = ("span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: int, attributes: dict[str, Any]) -> None:
+        self.span_id = random.getrandbits(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.perf_counter_ns()
+        self.end = 0
+        self.attributes = attributes
+        self.error: str | None = None
+
+
+class _Trace:
+    __slots__ = ("trace_id", "attributes", "spans", "wall_start", "perf_start", "finished")
+
+    def __init__(self, attributes: dict[str, Any]) -> None:
+        self.trace_id = random.getrandbits(128)
+        self.attributes = attributes
+        self.spans: list[_Span] = []
+        self.wall_start = time.time_ns()
+        self.perf_start = time.perf_counter_ns()
+        self.finished = False
+
+
+_current_trace: ContextVar[_Trace | None] = ContextVar("mcstat_trace", default=None)
+_current_span: ContextVar[_Span | None] = ContextVar("mcstat_span", default=None)
+
+
+def enabled() -> bool:
+    return TRACE_SAMPLE_RATE > 0 or TRACE_SLOW_MS > 0
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[_Span | None]:
+    """Record ``name`` as a child of the current span while the block runs."""
+
+    trace = _current_trace.get()
+    if trace is None or trace.finished:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = _Span(name, parent.span_id if parent is not None else 0, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.error = f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+        raise
+    finally:
+        current.end = time.perf_counter_ns()
+        _current_span.reset(token)
+        if not trace.finished:
+            trace.spans.append(current)
+
+
+def annotate(**attributes: Any) -> None:
+    """Add attributes (e.g. which fallback branch ran) to the current span."""
+
+    current = _current_span.get()
+    if current is not None and _current_trace.get() is not None:
+        current.attributes.update(attributes)
+
+
+def tag(**attributes: Any) -> None:
+    """Add attributes to the whole trace; every exported span carries them."""
+
+    trace = _current_trace.get()
+    if trace is not None:
+        for key, value in attributes.items():
+            trace.attributes.setdefault(key, value)
+
+
+def traced(handler: F) -> F:
+    """Trace each call of a ``(update, context)`` handler as the root span."""
+
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(update: Any, context: Any) -> Any:
+        if not enabled():
+            return await handler(update, context)
+
+        attributes: dict[str, Any] = {"handler": name}
+        if getattr(update, "update_id", None) is not None:
+            attributes["update_id"] = update.update_id
+        chat = getattr(update, "effective_chat", None)
+        if chat is not None:
+            attributes["chat_id"] = chat.id
+
+        trace = _Trace(attributes)
+        sampled = random.random() < TRACE_SAMPLE_RATE
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        try:
+            with span(name):
+                return await handler(update, context)
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            trace.finished = True
+            duration_ms = (time.perf_counter_ns() - trace.perf_start) / 1e6
+            slow = TRACE_SLOW_MS > 0 and duration_ms >= TRACE_SLOW_MS
+            if sampled or slow:
+                _TRACES.inc("slow" if slow else "sampled")
+                _export(trace, duration_ms)
+            else:
+                _TRACES.inc("dropped")
+
+    return wrapper  # type: ignore[return-value]
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+_trace_logger: logging.Logger | None = None
+_listener: QueueListener | None = None
+
+
+def _file_logger() -> logging.Logger:
+    """Logger writing raw JSON lines to ``TRACE_FILE`` from a background thread."""
+
+    global _trace_logger, _listener
+    if _trace_logger is None:
+        path = Path(TRACE_FILE).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = RotatingFileHandler(path, maxBytes=10_000_000, backupCount=3, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        _listener = QueueListener(records, file_handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        trace_logger = logging.getLogger(f"{__name__}.export")
+        trace_logger.propagate = False
+        trace_logger.setLevel(logging.INFO)
+        trace_logger.addHandler(QueueHandler(records))
+        _trace_logger = trace_logger
+    return _trace_logger
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def _otlp_payload(trace: _Trace) -> dict[str, Any]:
+    trace_id = f"{trace.trace_id:032x}"
+    spans = []
+    for item in trace.spans:
+        record: dict[str, Any] = {
+            "traceId": trace_id,
+            "spanId": f"{item.span_id:016x}",
+            "name": item.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(trace.wall_start + item.start - trace.perf_start),
+            "endTimeUnixNano": str(trace.wall_start + item.end - trace.perf_start),
+            "attributes": _otlp_attributes({**trace.attributes, **item.attributes}),
+            "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+        }
+        if item.parent_id:
+            record["parentSpanId"] = f"{item.parent_id:016x}"
+        spans.append(record)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def _summary(trace: _Trace, duration_ms: float) -> str:
+    phases = []
+    for item in sorted((s for s in trace.spans if s.parent_id), key=lambda s: s.start):
+        extra = "".join(f" {key}={value}" for key, value in item.attributes.items())
+        error = f" error={item.error}" if item.error else ""
+        phases.append(f"{item.name}={(item.end - item.start) / 1e6:.1f}ms{extra}{error}")
+    context = " ".join(f"{key}={value}" for key, value in trace.attributes.items())
+    return f"trace {trace.trace_id:032x} {duration_ms:.1f}ms {context} | " + ", ".join(phases)
+
+
+def _export(trace: _Trace, duration_ms: float) -> None:
+    try:
+        if TRACE_FILE:
+            _file_logger().info(json.dumps(_otlp_payload(trace), separators=(",", ":")))
+        else:
+            logger.info(_summary(trace, duration_ms))
+    except Exception:  # pragma: no cover - tracing must never break a handler
+        logger.debug("Failed to export trace", exc_info=True)
@@ -6,6 +6,7 @@
 
 from __future__ import annotations
 
+import os
 import re
 
 _SERVER_ADDRESS_PATTERN = re.compile(r"^[a-zA-Z0-9.-]+(?::\d{1,5})?$")
@@ -36,4 +37,57 @@ def parse_address(address: str) -> tuple[str, int]:
             return host, int(port_str)
         except ValueError:
             pass
-    return address, 25565
\ No newline at end of file
+    return address, 25565
+
+
+def normalize_address(address: str) -> str:
+    """Return a canonical key for caching and de-duplication.
+
+    Hostnames are case-insensitive and may carry a trailing dot, so both are
+    folded away. A bare host stays bare and an explicit ``:port`` is kept:
+    only a bare host consults SRV records, so ``host`` and ``host:25565``
+    can reach different servers.
+    """
+
+    address = address.strip()
+    if ":" not in address:
+        return address.lower().rstrip(".")
+    host, port = parse_address(address)
+    return f"{host.lower().rstrip('.')}:{port}"
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer from the environment, falling back to ``default``."""
+
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return int(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float from the environment, falling back to ``default``."""
+
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return float(raw) if raw else default
+    except ValueError:
+        return default
+
+
+_DURATION_PATTERN = re.compile(r"^(\d+)([smhdw])$", re.IGNORECASE)
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(text: str | None) -> int | None:
+    """Parse a short duration such as ``90m``, ``12h`` or ``30d`` into seconds.
+
+    Returns ``None`` for anything that is not a positive number with a unit.
+    """
+
+    match = _DURATION_PATTERN.match((text or "").strip())
+    if not match:
+        return None
+    seconds = int(match.group(1)) * _DURATION_UNITS[match.group(2).lower()]
+    return seconds or None
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""Shared background polling for ``/watch`` subscriptions.
+
+Every watched address is polled once per interval no matter how many chats
+watch it, and the resulting state changes are fanned out to the subscribers.
+Each address keeps its own jittered schedule and all probes share one
+concurrency cap, so thousands of watches never fire in lock-step.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Generic, TypeVar
+
+import metrics
+import utils
+
+__all__ = ["Subscription", "WatchEvent", "WatchScheduler"]
+
+logger = logging.getLogger(__name__)
+
+S = TypeVar("S")
+
+WENT_OFFLINE = "offline"
+CAME_ONLINE = "online"
+PLAYERS_ABOVE = "players_above"
+PLAYERS_BELOW = "players_below"
+
+_WATCH_PROBES = metrics.Counter(
+    "mcstat_watch_probes_total",
+    "Background watch probes by outcome.",
+    ("outcome",),
+)
+_WATCH_EVENTS = metrics.Counter(
+    "mcstat_watch_events_total",
+    "Watch notifications fanned out to chats, by event kind.",
+    ("kind",),
+)
+
+
+@dataclass(slots=True)
+class Subscription:
+    """One chat watching one server, optionally with a player-count threshold."""
+
+    chat_id: int
+    address: str
+    threshold: int | None = None
+
+
+@dataclass(slots=True)
+class WatchEvent(Generic[S]):
+    """A state change for a watched server, addressed to one subscriber."""
+
+    kind: str
+    subscription: Subscription
+    snapshot: S | None
+
+
+@dataclass(slots=True)
+class _WatchedServer(Generic[S]):
+    address: str
+    next_due: float
+    subscribers: dict[int, Subscription] = field(default_factory=dict)
+    online: bool | None = None
+    players: int | None = None
+    failures: int = 0
+    probing: bool = False
+
+
+class WatchScheduler(Generic[S]):
+    """Poll each watched address on its own jittered schedule and report changes.
+
+    ``probe`` returns a snapshot (anything with ``players_online``) or raises
+    when the server is unreachable; ``notify`` delivers one event to one chat,
+    at most ``send_rate`` times per second across all servers.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[str], Awaitable[S]],
+        notify: Callable[[WatchEvent[S]], Awaitable[None]],
+        *,
+        interval: float,
+        jitter: float,
+        concurrency: int,
+        offline_after: int = 2,
+        send_rate: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._probe = probe
+        self._notify = notify
+        self.interval = interval
+        self.jitter = max(0.0, min(1.0, jitter))
+        self.offline_after = max(1, offline_after)
+        self._clock = clock
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._servers: dict[str, _WatchedServer[S]] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+        # Notifications from every poll share one pace (0 = unpaced).
+        self._send_interval = 1.0 / send_rate if send_rate > 0 else 0.0
+        self._send_lock = asyncio.Lock()
+        self._next_send = 0.0
+
+    def __len__(self) -> int:
+        return len(self._servers)
+
+    def _next_delay(self) -> float:
+        spread = self.interval * self.jitter
+        return self.interval + random.uniform(-spread, spread)
+
+    def subscribe(self, chat_id: int, address: str, threshold: int | None = None) -> Subscription:
+        key = utils.normalize_address(address)
+        server = self._servers.get(key)
+        if server is None:
+            # Spread first polls over one interval instead of probing immediately.
+            server = _WatchedServer(address=address, next_due=self._clock() + random.uniform(0, self.interval))
+            self._servers[key] = server
+
+        subscription = Subscription(chat_id=chat_id, address=address, threshold=threshold)
+        server.subscribers[chat_id] = subscription
+        return subscription
+
+    def unsubscribe(self, chat_id: int, address: str) -> bool:
+        key = utils.normalize_address(address)
+        server = self._servers.get(key)
+        if server is None or server.subscribers.pop(chat_id, None) is None:
+            return False
+        if not server.subscribers:
+            del self._servers[key]
+        return True
+
+    def unsubscribe_chat(self, chat_id: int) -> int:
+        removed = 0
+        for subscription in self.subscriptions(chat_id):
+            removed += self.unsubscribe(chat_id, subscription.address)
+        return removed
+
+    def subscriptions(self, chat_id: int) -> list[Subscription]:
+        return [
+            server.subscribers[chat_id] for server in self._servers.values() if chat_id in server.subscribers
+        ]
+
+    def tick(self) -> int:
+        """Start probes for every due address and return how many were started.
+
+        Probes run as background tasks, so a slow server never delays the
+        next tick; an address is not re-probed while its last probe runs.
+        """
+
+        now = self._clock()
+        started = 0
+        for key, server in self._servers.items():
+            if server.probing or server.next_due > now:
+                continue
+            server.probing = True
+            server.next_due = now + self._next_delay()
+            task = asyncio.ensure_future(self._poll(key, server))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            started += 1
+        return started
+
+    async def _poll(self, key: str, server: _WatchedServer[S]) -> None:
+        try:
+            async with self._semaphore:
+                try:
+                    snapshot: S | None = await self._probe(server.address)
+                except Exception as exc:
+                    logger.debug("Watch probe failed for %s (%s)", server.address, exc)
+                    snapshot = None
+            _WATCH_PROBES.inc("online" if snapshot is not None else "offline")
+
+            if self._servers.get(key) is not server:
+                return  # unwatched while probing
+            for event in self._diff(server, snapshot):
+                _WATCH_EVENTS.inc(event.kind)
+                await self._pace()
+                try:
+                    await self._notify(event)
+                except Exception:
+                    logger.exception("Failed to deliver watch event for %s", server.address)
+        finally:
+            server.probing = False
+
+    async def _pace(self) -> None:
+        """Wait for this notification's slot so fan-outs stay under ``send_rate`` per second."""
+
+        if not self._send_interval:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._send_lock:
+            delay = self._next_send - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_send = loop.time() + self._send_interval
+
+    def _diff(self, server: _WatchedServer[S], snapshot: S | None) -> list[WatchEvent[S]]:
+        was_online, previous_players = server.online, server.players
+
+        if snapshot is None:
+            server.failures += 1
+            if server.failures < self.offline_after and was_online is not False:
+                return []
+            server.online = False
+            if was_online:
+                return [WatchEvent(WENT_OFFLINE, sub, None) for sub in server.subscribers.values()]
+            return []
+
+        players = int(getattr(snapshot, "players_online", 0) or 0)
+        server.failures = 0
+        server.online = True
+        server.players = players
+
+        if was_online is None:
+            return []  # first observation only sets the baseline
+        if was_online is False:
+            return [WatchEvent(CAME_ONLINE, sub, snapshot) for sub in server.subscribers.values()]
+
+        events: list[WatchEvent[S]] = []
+        for sub in server.subscribers.values():
+            if sub.threshold is None or previous_players is None:
+                continue
+            if previous_players < sub.threshold <= players:
+                events.append(WatchEvent(PLAYERS_ABOVE, sub, snapshot))
+            elif players < sub.threshold <= previous_players:
+                events.append(WatchEvent(PLAYERS_BELOW, sub, snapshot))
+        return events
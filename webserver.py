@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+# Guillermo Siesto
+# github.com/GSiesto
+
+"""HTTP front end: the Telegram webhook and the Prometheus ``/metrics`` page.
+
+Webhook mode runs the application's lifecycle itself (the same steps as
+``Application.run_webhook``) so both routes share one tornado server and port.
+That port is public, so there ``/metrics`` needs the webhook secret as a
+bearer token and is not served at all without one. ``METRICS_PORT`` serves
+``/metrics`` alone, without a token, on a side port meant to stay private.
+
+With ``WEBHOOK_FAST_BOOT`` (the default) a cold start listens before it
+talks to Telegram, so the platform's health check and a pending update do
+not wait for ``getMe``, and it only calls ``setWebhook`` when Telegram's
+registered URL differs from ours. The secret token cannot be read back from
+``getWebhookInfo``, so the registered URL carries a fingerprint of it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import json
+import logging
+import signal
+from urllib.parse import urlencode, urlsplit, urlunsplit
+
+import tornado.web
+from tornado.httpserver import HTTPServer
+from telegram import Bot, Update
+from telegram.ext import Application
+
+import boot
+import dispatch
+import metrics
+import utils
+
+__all__ = ["fingerprinted_url", "metrics_routes", "register_webhook", "run_webhook", "start_metrics_server"]
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+WEBHOOK_FAST_BOOT = utils.env_int("WEBHOOK_FAST_BOOT", 1) != 0  # 0 restores setWebhook-before-serving
+
+
+class _MetricsHandler(tornado.web.RequestHandler):
+    def initialize(self, secret_token: str | None) -> None:
+        self._secret_token = secret_token
+
+    def get(self) -> None:
+        if self._secret_token is not None:
+            received = self.request.headers.get("Authorization", "")
+            if not hmac.compare_digest(received.encode(), f"Bearer {self._secret_token}".encode()):
+                raise tornado.web.HTTPError(403)
+        self.set_header("Content-Type", metrics.CONTENT_TYPE)
+        self.finish(metrics.exposition())
+
+
+class _WebhookHandler(tornado.web.RequestHandler):
+    def initialize(self, bot_app: Application, secret_token: str | None) -> None:
+        self._application = bot_app
+        self._secret_token = secret_token
+
+    async def post(self) -> None:
+        if self._secret_token is not None:
+            received = self.request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received.encode(), self._secret_token.encode()):
+                logger.debug("Rejected webhook request with a wrong secret token")
+                raise tornado.web.HTTPError(403)
+
+        processor = self._application.update_processor
+        if isinstance(processor, dispatch.ChatOrderedUpdateProcessor) and processor.saturated:
+            # Telegram keeps the update and delivers it again later.
+            processor.defer()
+            self.set_status(503)
+            self.set_header("Retry-After", "1")
+            self.finish()
+            return
+
+        try:
+            data = json.loads(self.request.body)
+        except ValueError as exc:
+            raise tornado.web.HTTPError(400) from exc
+
+        update = Update.de_json(data, self._application.bot)
+        if update is not None:
+            await self._application.update_queue.put(update)
+        self.set_status(200)
+        self.finish()
+
+    def log_exception(self, typ, value, tb) -> None:  # noqa: ANN001 - tornado signature
+        if isinstance(value, tornado.web.HTTPError):
+            return
+        logger.error("Webhook handler failed", exc_info=(typ, value, tb))
+
+
+def fingerprinted_url(url: str, secret_token: str | None) -> str:
+    """``url`` with a short, non-reversible digest of ``secret_token`` in its query.
+
+    Telegram keeps the query string, so comparing ``getWebhookInfo().url`` with
+    this value tells whether both the URL and the secret are already registered.
+    """
+
+    if not secret_token:
+        return url
+    digest = hashlib.blake2b(secret_token.encode(), digest_size=8, person=b"mcstat-webhook").hexdigest()
+    parts = urlsplit(url)
+    query = "&".join(part for part in (parts.query, urlencode({"v": digest})) if part)
+    return urlunsplit(parts._replace(query=query))
+
+
+async def register_webhook(bot: Bot, url: str, secret_token: str | None) -> None:
+    """Call ``setWebhook`` unless Telegram already has ``url`` registered."""
+
+    try:
+        info = await bot.get_webhook_info()
+        if info.url == url:
+            logger.info("Webhook already registered; skipping setWebhook")
+            return
+    except Exception:  # noqa: BLE001 - fall back to registering unconditionally
+        logger.warning("getWebhookInfo failed; registering the webhook anyway", exc_info=True)
+    await bot.set_webhook(url=url, secret_token=secret_token)
+    logger.info("Registered webhook")
+
+
+def metrics_routes(secret_token: str | None) -> list:
+    """The ``/metrics`` route for a public port: only served, as a bearer token, with ``secret_token``."""
+
+    if not secret_token:
+        return []
+    return [(r"/metrics", _MetricsHandler, {"secret_token": secret_token})]
+
+
+def start_metrics_server(port: int, listen: str = "0.0.0.0") -> HTTPServer:
+    """Serve ``/metrics`` on ``port`` from the running event loop, without a token."""
+
+    server = tornado.web.Application([(r"/metrics", _MetricsHandler, {"secret_token": None})]).listen(
+        port, address=listen
+    )
+    logger.info("Serving metrics on port %d", port)
+    return server
+
+
+async def _serve_webhook(
+    application: Application,
+    *,
+    listen: str,
+    port: int,
+    url_path: str,
+    webhook_url: str,
+    secret_token: str | None,
+    register: bool,
+) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGABRT):
+        with contextlib.suppress(NotImplementedError, RuntimeError):
+            loop.add_signal_handler(sig, stop.set)
+
+    routes = [
+        (
+            rf"/{url_path.strip('/')}/?",
+            _WebhookHandler,
+            {"bot_app": application, "secret_token": secret_token},
+        )
+    ]
+    webhook_url = fingerprinted_url(webhook_url, secret_token)
+    server: HTTPServer | None = None
+    started = False
+    registration: asyncio.Task | None = None
+    if WEBHOOK_FAST_BOOT:
+        # Updates that arrive before start() wait in update_queue.
+        server = tornado.web.Application(routes + metrics_routes(secret_token)).listen(port, address=listen)
+        boot.mark("listen")
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        boot.mark("initialize")
+        # Shard workers (register=False) leave the public webhook to the router.
+        if register and WEBHOOK_FAST_BOOT:
+            # The first update cannot arrive before registration finishes, so
+            # overlap it with start() rather than serialising the two.
+            registration = asyncio.create_task(register_webhook(application.bot, webhook_url, secret_token))
+        elif register:
+            await application.bot.set_webhook(url=webhook_url, secret_token=secret_token)
+            boot.mark("set_webhook")
+        await application.start()
+        started = True
+        if server is None:
+            server = tornado.web.Application(routes + metrics_routes(secret_token)).listen(port, address=listen)
+        boot.mark("start")
+        if registration is not None:
+            await registration
+            boot.mark("set_webhook")
+        logger.info("Ready to serve updates after %s", boot.summary())
+        await stop.wait()
+    finally:
+        if server is not None:
+            server.stop()
+            await server.close_all_connections()
+        if started:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def run_webhook(
+    application: Application,
+    *,
+    listen: str,
+    port: int,
+    url_path: str,
+    webhook_url: str,
+    secret_token: str | None = None,
+    register: bool = True,
+) -> None:
+    """Register the webhook and serve it, plus ``/metrics`` with a secret, until SIGINT/SIGTERM.
+
+    With ``register=False`` the webhook is served but left to whoever else
+    registers it (the shard router).
+    """
+
+    asyncio.run(
+        _serve_webhook(
+            application,
+            listen=listen,
+            port=port,
+            url_path=url_path,
+            webhook_url=webhook_url,
+            secret_token=secret_token,
+            register=register,
+        )
+    )